@@ -1,30 +1,46 @@
 import pandas as pd
-import numpy as np
 import os
 from sklearn.decomposition import PCA
 from sklearn.mixture import GaussianMixture
 from sklearn.preprocessing import StandardScaler
-from scipy.stats import entropy
-import networkx as nx
-from statsmodels.multivariate.factor import Factor
+from artifact_store import load_frame, has_frame, save_step, export_excel, wants_excel_export
+import flow_matrix
+import network_centrality
+from instrumentation import instrument
+from model_selection import select_gmm, wants_model_selection
+from parallel_batches import workers_option
+from analysis_scheduler import analysis, run_analyses
 
 # ==========================================
 # [설정] 입력 및 출력 경로
 # ==========================================
 BASE_DIR = "Project_HighSchool_apply_Analytics"
 INPUT_EXCEL = os.path.join(BASE_DIR, "data", "processed", "Step2_지망선호도_및_지역흐름.xlsx")
-OUTPUT_EXCEL = os.path.join(BASE_DIR, "data", "processed", "Step4_대학원수준_심층분석.xlsx")
+OUTPUT_EXCEL = os.path.join(BASE_DIR, "data", "processed", "Step4_대학원수준_심층분석.xlsx") # 엑셀 내보내기(--excel) 시
+INPUT_STEP = "step2"   # 저장소에 Step2 산출물이 있으면 엑셀 대신 사용
+STEP_NAME = "step4"
 
+# 모델 파라미터
+GMM_N_COMPONENTS = 4   # GMM 군집 수 (--select-models 사용 시 군집 수 x 공분산 형태를 BIC로 탐색)
+RANDOM_STATE = 42
+
+@instrument()
 def load_data():
     """Step 2에서 생성된 연구 데이터를 로드합니다."""
+    if has_frame(INPUT_STEP, '연구1_학교별_인기도'):
+        df_school = load_frame(INPUT_STEP, '연구1_학교별_인기도').reset_index()
+        flow = flow_matrix.load_flow(INPUT_STEP)   # 희소 동네x학교 흐름표
+        return df_school, flow
+
     if not os.path.exists(INPUT_EXCEL):
         raise FileNotFoundError(f"입력 파일을 찾을 수 없습니다: {INPUT_EXCEL}")
     
     with pd.ExcelFile(INPUT_EXCEL) as xls:
         df_school = pd.read_excel(xls, '연구1_학교별_인기도')
-        df_matrix = pd.read_excel(xls, '부록_동네_학교_전체매트릭스', index_col=0)
-    return df_school, df_matrix
+        flow = flow_matrix.from_dense(pd.read_excel(xls, '부록_동네_학교_전체매트릭스', index_col=0))
+    return df_school, flow
 
+@instrument()
 def analysis_pca_factor(df_school):
     """1. 다변량 차원 축소 및 잠재 요인 분석 (PCA/Factor Analysis)"""
     print("🔬 [1/5] 다변량 잠재 요인 분석 수행 중...")
@@ -49,106 +65,134 @@ def analysis_pca_factor(df_school):
     
     return df_school, loadings
 
-def analysis_gmm_clustering(df_school):
-    """2. 확률적 모델 기반 군집화 (Gaussian Mixture Model)"""
+@instrument()
+def analysis_gmm_clustering(df_school, select_models=False, workers=None):
+    """
+    2. 확률적 모델 기반 군집화 (Gaussian Mixture Model)
+    반환: (df_school, 모델 탐색 점수표 또는 None)
+    """
     print("🔬 [2/5] GMM 기반 확률적 학교 유형화 수행 중...")
     
     features = ['PCA_1', 'PCA_2']
-    x = df_school[features]
-    
-    # GMM 수행 (최적 군집 수는 BIC로 결정할 수 있으나 여기선 4개로 가정)
-    gmm = GaussianMixture(n_components=4, random_state=42)
-    df_school['GMM_Cluster'] = gmm.fit_predict(x)
+    x = df_school[features].to_numpy()
+    
+    # 모델 탐색 사용 시 BIC가 가장 낮은 (군집 수, 공분산 형태) 모델 - 같은 입력이면 저장된 모델 재사용
+    gmm, scores = select_gmm(x, workers=workers) if select_models else (None, None)
+    if gmm is None:
+        # GMM 수행 (군집 수는 설정값 GMM_N_COMPONENTS 사용)
+        gmm = GaussianMixture(n_components=GMM_N_COMPONENTS, random_state=RANDOM_STATE).fit(x)
+    df_school['GMM_Cluster'] = gmm.predict(x)
     df_school['GMM_Probability'] = gmm.predict_proba(x).max(axis=1) # 소속 확률
     
-    return df_school
+    return df_school, scores
 
-def analysis_entropy_diversity(df_matrix):
+@instrument(rows_in=lambda a: a['flow']['counts'])   # 동네 x 학교 흐름 행렬의 동네 수
+def analysis_entropy_diversity(flow):
     """3. 정보 엔트로피를 이용한 지망/배정 다양성 분석"""
     print("🔬 [3/5] 정보 엔트로피(Shannon Entropy) 다양성 지수 산출 중...")
     
     # 행별(동네별) 엔트로피 계산: 특정 동네 학생들이 얼마나 다양한 학교로 흩어지는가?
     # 값이 낮을수록 특정 학교로의 배정 쏠림(Segregation)이 강함
-    dong_entropy = df_matrix.apply(lambda x: entropy(x + 1e-9), axis=1) # 0 방지
+    dong_entropy = flow_matrix.entropy(flow, axis=1) # 0 방지 (희소 행렬에서 바로 계산)
     
     # 열별(학교별) 엔트로피 계산: 특정 학교가 얼마나 다양한 동네에서 학생을 받아들이는가?
-    school_entropy = df_matrix.apply(lambda x: entropy(x + 1e-9), axis=0)
+    school_entropy = flow_matrix.entropy(flow, axis=0)
     
     df_dong_entropy = pd.DataFrame({'행정동': dong_entropy.index, '엔트로피_지수': dong_entropy.values})
     df_school_entropy = pd.DataFrame({'배정고등학교': school_entropy.index, '포용성_지수': school_entropy.values})
     
     return df_dong_entropy, df_school_entropy
 
-def analysis_network_centrality(df_matrix):
+@instrument(rows_in=lambda a: a['flow']['counts'])
+def analysis_network_centrality(flow):
     """4. 네트워크 분석 (Centrality Analysis)"""
     print("🔬 [4/5] 지역-학교 네트워크 중심성 분석 중...")
     
-    # 이분 그래프(Bipartite Graph) 또는 가중치 방향 그래프 생성
-    G = nx.Graph()
-    
-    for dong in df_matrix.index:
-        for school in df_matrix.columns:
-            weight = df_matrix.loc[dong, school]
-            if weight > 0:
-                G.add_edge(dong, school, weight=weight)
-    
+    # 그래프 객체 없이 동네x학교 이분 인접 행렬(희소)에서 바로 계산
     # 고유벡터 중심성(Eigenvector Centrality): 중요도 전이 모델
-    try:
-        centrality = nx.eigenvector_centrality(G, weight='weight', max_iter=1000)
-    except:
-        centrality = nx.degree_centrality(G) # 수렴 실패 시 차수 중심성
-        
-    df_centrality = pd.DataFrame(list(centrality.items()), columns=['ID', '중심성_지수'])
+    # PageRank / HITS(동네=허브, 학교=권위)도 함께 산출하고, 수렴 여부는 진단표로 기록
+    df_centrality, df_diagnostics = network_centrality.compute_centrality(flow)
+    for _, row in df_diagnostics.iterrows():
+        status = "수렴" if row['수렴여부'] else "수렴 실패"
+        print(f"   - {row['지표']}: {row['방법']} {row['반복횟수']}회, {status}")
     
-    return df_centrality
+    return df_centrality, df_diagnostics
 
-def analysis_gravity_proxy(df_matrix):
+@instrument(rows_in=lambda a: a['flow']['counts'])
+def analysis_gravity_proxy(flow):
     """5. 공간 상호작용 프록시 분석 (Interaction Intensity)"""
     print("🔬 [5/5] 공간 상호작용 강도 모델링 중...")
     
     # 실제 거리는 데이터에 없으므로, 배정 인원의 집중도를 통해 '공간적 배타성'을 추정
     # 특정 동네 i와 학교 j 사이의 상호작용 강도 I_ij = T_ij / (sum_i * sum_j)
-    total_students = df_matrix.values.sum()
-    row_sums = df_matrix.sum(axis=1)
-    col_sums = df_matrix.sum(axis=0)
-    
-    expected = np.outer(row_sums, col_sums) / total_students
-    interaction_ratio = df_matrix.values / (expected + 1e-9)
+    # 0인 칸은 강도도 0이므로 희소 행렬에서 0이 아닌 칸만 계산한 뒤 보고용 표로 펼침
+    interaction_ratio = flow_matrix.interaction_ratio(flow)
     
-    df_interaction = pd.DataFrame(interaction_ratio, index=df_matrix.index, columns=df_matrix.columns)
+    df_interaction = pd.DataFrame(interaction_ratio.toarray(), index=flow['dongs'], columns=flow['schools'])
     
     return df_interaction
 
+# ---------------------------------------------------------
+# 분석 등록 (스케줄러가 입력이 준비된 분석부터 동시에 실행)
+# ---------------------------------------------------------
+# 각 분석은 {시트명: DataFrame}을 반환합니다. 프로세스 풀 분석도 있으므로 모듈 최상위 함수로 둡니다.
+def sheets_pca(df_school):
+    df_school, loadings = analysis_pca_factor(df_school.copy())  # 입력 DataFrame은 변경하지 않음
+    return {'1_학교_고급유형화': df_school, '1_PCA_부하량': loadings}
+
+def sheets_gmm(pca, select_models=False, workers=None):
+    df_school, scores = analysis_gmm_clustering(pca['1_학교_고급유형화'].copy(), select_models, workers)
+    frames = {'1_학교_고급유형화': df_school}
+    if scores is not None:
+        frames['1_GMM_모델선택'] = scores
+    return frames
+
+def sheets_entropy(flow):
+    df_dong_entropy, df_school_entropy = analysis_entropy_diversity(flow)
+    return {'2_지역_배정다양성': df_dong_entropy, '2_학교_수용다양성': df_school_entropy}
+
+def sheets_centrality(flow):
+    df_centrality, df_diagnostics = analysis_network_centrality(flow)
+    return {'3_네트워크_중심성': df_centrality, '3_중심성_수렴진단': df_diagnostics}
+
+def sheets_gravity(flow):
+    return {'4_공간상호작용_강도': analysis_gravity_proxy(flow)}
+
+# 입력: 'school'(Step2 학교 통계표), 'flow'(희소 흐름표) 또는 앞 분석 이름
+# 모두 numpy·BLAS / 희소 행렬-벡터 곱 연산(GIL 해제)이라 스레드에서 실행 (중심성 거듭제곱법도 희소 행렬 곱)
+ANALYSES = [
+    analysis('pca', sheets_pca, inputs=['school']),
+    analysis('gmm', sheets_gmm, inputs=['pca'], options=['select_models', 'workers']),
+    analysis('entropy', sheets_entropy, inputs=['flow']),
+    analysis('centrality', sheets_centrality, inputs=['flow']),
+    analysis('gravity', sheets_gravity, inputs=['flow']),
+]
+
+@instrument()
+def run_all_analyses(df_school, flow, select_models=False, workers=None):
+    """
+    Step2 결과 -> Step4 산출물 {시트명: DataFrame} (파일 입출력 없음)
+    등록된 분석(ANALYSES)을 서로 기다리지 않고 동시에 실행합니다. (workers: 동시 실행 수, 1이면 순차)
+    select_models: True면 GMM 군집 수 / 공분산 형태를 BIC 탐색으로 결정 (같은 workers 사용)
+    """
+    return run_analyses(ANALYSES, {'school': df_school, 'flow': flow},
+                        {'select_models': select_models, 'workers': workers}, workers)
+
+@instrument()
 def main():
     print("🚀 [Advanced Analytics Engine] 대학원 수준 심층 분석 프로세스를 시작합니다.")
     
     try:
-        df_school, df_matrix = load_data()
-        
-        # 1 & 2. PCA + GMM
-        df_school, loadings = analysis_pca_factor(df_school)
-        df_school = analysis_gmm_clustering(df_school)
-        
-        # 3. Entropy
-        df_dong_entropy, df_school_entropy = analysis_entropy_diversity(df_matrix)
-        
-        # 4. Network
-        df_centrality = analysis_network_centrality(df_matrix)
-        
-        # 5. Gravity/Interaction
-        df_interaction = analysis_gravity_proxy(df_matrix)
+        df_school, flow = load_data()
+        frames = run_all_analyses(df_school, flow, wants_model_selection(), workers_option())
         
         # 결과 저장
-        print(f"💾 결과를 저장 중입니다: {OUTPUT_EXCEL}")
-        with pd.ExcelWriter(OUTPUT_EXCEL, engine='openpyxl') as writer:
-            df_school.to_excel(writer, sheet_name='1_학교_고급유형화', index=False)
-            loadings.to_excel(writer, sheet_name='1_PCA_부하량')
-            df_dong_entropy.to_excel(writer, sheet_name='2_지역_배정다양성', index=False)
-            df_school_entropy.to_excel(writer, sheet_name='2_학교_수용다양성', index=False)
-            df_centrality.to_excel(writer, sheet_name='3_네트워크_중심성', index=False)
-            df_interaction.to_excel(writer, sheet_name='4_공간상호작용_강도')
+        save_step(STEP_NAME, frames)
+        if wants_excel_export():
+            print(f"💾 결과를 저장 중입니다: {OUTPUT_EXCEL}")
+            export_excel(frames, OUTPUT_EXCEL)
             
-        print("\n✨ 모든 분석이 완료되었습니다. 고차원 통계 지표가 Step 4 파일에 반영되었습니다.")
+        print("\n✨ 모든 분석이 완료되었습니다. 고차원 통계 지표가 Step 4 저장소에 반영되었습니다.")
         
     except Exception as e:
         print(f"❌ 분석 도중 오류 발생: {e}")
@@ -1,25 +1,42 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
-
-# 한글 폰트 설정 (Linux 환경 대응)
-plt.rcParams['font.family'] = 'NanumGothic' if os.path.exists('/usr/share/fonts/truetype/nanum/NanumGothic.ttf') else 'DejaVu Sans'
-plt.rcParams['axes.unicode_minus'] = False
+from artifact_store import load_frame, has_frame
+from instrumentation import instrument
 
 BASE_DIR = "Project_HighSchool_apply_Analytics"
 INPUT_EXCEL = os.path.join(BASE_DIR, "data", "processed", "Step4_대학원수준_심층분석.xlsx")
+INPUT_STEP = "step4"   # 저장소에 Step4 산출물이 있으면 엑셀 대신 사용
 OUTPUT_DIR = os.path.join(BASE_DIR, "output", "advanced_plots")
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
+PLOT_SHEETS = ['1_학교_고급유형화', '2_지역_배정다양성', '3_네트워크_중심성', '4_공간상호작용_강도']
+
+def plotting_libs():
+    """
+    matplotlib / seaborn은 가져오는 데 2초 이상 걸리므로 그래프를 그릴 때 처음 한 번만 가져옵니다.
+    반환: (pyplot, seaborn)
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # 한글 폰트 설정 (Linux 환경 대응)
+    plt.rcParams['font.family'] = 'NanumGothic' if os.path.exists('/usr/share/fonts/truetype/nanum/NanumGothic.ttf') else 'DejaVu Sans'
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt, sns
+
+def read_sheet(name, index_col=None):
+    """Step 4 결과를 저장소(Parquet)에서 우선 읽고, 없으면 엑셀 시트를 읽습니다."""
+    if has_frame(INPUT_STEP, name):
+        return load_frame(INPUT_STEP, name)
+    return pd.read_excel(INPUT_EXCEL, sheet_name=name, index_col=index_col)
+
+@instrument()
+def plot_results(frames, output_dir=OUTPUT_DIR):
+    """Step4 결과 {시트명: DataFrame} -> PNG 그래프 파일 (데이터 로드 없음)"""
+    plt, sns = plotting_libs()
+    os.makedirs(output_dir, exist_ok=True)
 
-def visualize_results():
-    print("🎨 고급 통계 지표 시각화를 시작합니다...")
-    xls = pd.ExcelFile(INPUT_EXCEL)
-    
     # 1. PCA & GMM Clustering Scatter Plot
-    df_school = pd.read_excel(xls, '1_학교_고급유형화')
+    df_school = frames['1_학교_고급유형화']
     plt.figure(figsize=(10, 7))
     sns.scatterplot(data=df_school, x='PCA_1', y='PCA_2', hue='GMM_Cluster', palette='viridis', s=100, alpha=0.7)
     
@@ -32,37 +49,46 @@ def visualize_results():
     plt.xlabel('PC1: 학교 규모 및 인지도 지표')
     plt.ylabel('PC2: 선호도 및 만족도 지표')
     plt.grid(True, linestyle='--', alpha=0.6)
-    plt.savefig(os.path.join(OUTPUT_DIR, '1_PCA_GMM_Cluster.png'))
+    plt.savefig(os.path.join(output_dir, '1_PCA_GMM_Cluster.png'))
     plt.close()
 
     # 2. 지역별 엔트로피 (배정 다양성) - 하위 10개 (쏠림 지역)
-    df_dong = pd.read_excel(xls, '2_지역_배정다양성')
+    df_dong = frames['2_지역_배정다양성']
     plt.figure(figsize=(12, 6))
     df_dong_sorted = df_dong.sort_values('엔트로피_지수', ascending=True).head(10)
     sns.barplot(data=df_dong_sorted, x='엔트로피_지수', y='행정동', palette='Reds_r')
     plt.title('지역별 배정 엔트로피 (지수가 낮을수록 특정 학교 쏠림 강함)')
-    plt.savefig(os.path.join(OUTPUT_DIR, '2_Dong_Entropy_Top10.png'))
+    plt.savefig(os.path.join(output_dir, '2_Dong_Entropy_Top10.png'))
     plt.close()
 
     # 3. 네트워크 중심성 Top 10
-    df_centrality = pd.read_excel(xls, '3_네트워크_중심성')
+    df_centrality = frames['3_네트워크_중심성']
     plt.figure(figsize=(12, 6))
     df_top_centrality = df_centrality.sort_values('중심성_지수', ascending=False).head(10)
     sns.barplot(data=df_top_centrality, x='중심성_지수', y='ID', palette='magma')
     plt.title('네트워크 중심성 지수 (배정 흐름의 허브 역할)')
-    plt.savefig(os.path.join(OUTPUT_DIR, '3_Network_Centrality.png'))
+    plt.savefig(os.path.join(output_dir, '3_Network_Centrality.png'))
     plt.close()
 
     # 4. 공간 상호작용 Heatmap (일부 상위 데이터만)
-    df_inter = pd.read_excel(xls, '4_공간상호작용_강도', index_col=0)
+    df_inter = frames['4_공간상호작용_강도']
     plt.figure(figsize=(14, 10))
     # 데이터가 너무 크면 일부만 슬라이싱
     sns.heatmap(df_inter.iloc[:15, :15], annot=True, fmt=".1f", cmap='YlGnBu')
     plt.title('지역-학교 공간 상호작용 강도 (1.0 기준 상회 시 밀접 관계)')
-    plt.savefig(os.path.join(OUTPUT_DIR, '4_Spatial_Interaction_Heatmap.png'))
+    plt.savefig(os.path.join(output_dir, '4_Spatial_Interaction_Heatmap.png'))
     plt.close()
 
-    print(f"✨ 시각화 완료! 결과물이 '{OUTPUT_DIR}' 폴더에 저장되었습니다.")
+    print(f"✨ 시각화 완료! 결과물이 '{output_dir}' 폴더에 저장되었습니다.")
+
+@instrument()
+def visualize_results():
+    print("🎨 고급 통계 지표 시각화를 시작합니다...")
+    frames = {
+        name: read_sheet(name, index_col=0 if name == '4_공간상호작용_강도' else None)
+        for name in PLOT_SHEETS
+    }
+    plot_results(frames)
 
 if __name__ == "__main__":
     visualize_results()
@@ -0,0 +1,245 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from assignment_classifier import find_choice_columns, classify_rank, rank_label, UNLISTED_RANK
+from artifact_store import load_frame, has_frame
+from coded_table import ensure_coded, DONG_DICT, GENDER_DICT, DICT_KEYWORDS, SCHOOL_DICT
+from flow_matrix import make_flow
+
+# ==========================================
+# [설정] 다차원 집계 큐브 (동네 x 학교 x 성별 x 순위)
+# ==========================================
+# 학생 테이블을 한 번만 훑어 코드 조합별 인원을 세고, 각 보고서는 이 큐브를 합산(roll-up)해 만듭니다.
+#   - 배정 큐브: (행정동, 배정고등학교, 성별, 분석_배정순위) -> 인원   (배정 유형 = 배정 순위 라벨)
+#   - 지원 큐브: (행정동, 지망학교, 성별, 지망순위) -> 지원 건수      (지망 컬럼 전체를 한 번에 집계)
+# 0이 아닌 조합만 긴 형식(범주형 라벨 + 인원)으로 보관하므로 학생 수가 늘어도 크기는 조합 수에 비례합니다.
+# 결측 라벨(코드 -1)도 별도 조합으로 남겨, 해당 차원으로 합산할 때만 제외됩니다. (groupby/crosstab과 동일)
+ASSIGN_CUBE = "집계큐브_배정"
+APPLY_CUBE = "집계큐브_지원"
+CUBE_FRAMES = [ASSIGN_CUBE, APPLY_CUBE]
+
+RANK_COL = "분석_배정순위"
+CHOICE_SCHOOL_COL = "지망학교"
+CHOICE_RANK_COL = "지망순위"
+COUNT_COL = "인원"
+DENSE_KEY_LIMIT = 1 << 22   # 합산 시 코드 조합 수가 이 이하면 정렬(np.unique) 대신 bincount로 바로 집계
+# ==========================================
+
+def _dim_columns(columns):
+    """큐브 차원으로 쓸 (동네, 배정학교, 성별) 컬럼명 (키워드가 포함된 첫 컬럼, 없으면 None)"""
+    first = lambda name: next((c for c in columns if DICT_KEYWORDS[name] in str(c)), None)
+    return first(DONG_DICT), first(SCHOOL_DICT), first(GENDER_DICT)
+
+def _count_combinations(code_arrays, categories, names):
+    """
+    차원별 코드 배열 -> 0이 아닌 조합별 인원 (긴 형식 DataFrame).
+    결측(-1)을 포함하도록 코드에 1을 더해 혼합 진법 키 하나로 합친 뒤 np.unique로 셉니다.
+    """
+    sizes = [len(c) + 1 for c in categories]
+    key = np.zeros(len(code_arrays[0]), dtype=np.int64)
+    for codes, size in zip(code_arrays, sizes):
+        key = key * size + (codes.astype(np.int64) + 1)
+    keys, counts = np.unique(key, return_counts=True)
+
+    columns = {}
+    for cats, size, name in zip(reversed(categories), reversed(sizes), reversed(names)):
+        keys, codes = np.divmod(keys, size)
+        columns[name] = pd.Categorical.from_codes(codes - 1, categories=cats)   # 순위 차원도 범주형(정수 라벨)
+    frame = pd.DataFrame({name: columns[name] for name in names})
+    frame[COUNT_COL] = counts.astype(np.int64)
+    return frame
+
+def _category_of(series):
+    return series.cat.categories, series.cat.codes.to_numpy()
+
+def build_cube(df):
+    """
+    학생 테이블 -> {ASSIGN_CUBE: 배정 큐브, APPLY_CUBE: 지원 큐브} (학생 단위 스캔은 여기서 한 번만)
+    배정 컬럼이 없으면 None. 동네/성별 컬럼이 없으면 해당 차원을 빼고 만듭니다.
+    """
+    df = ensure_coded(df)
+    col_dong, col_assigned, col_gender = _dim_columns(df.columns)
+    if col_assigned is None:
+        print("❌ 집계 큐브: '배정고등학교' 컬럼을 찾을 수 없습니다.")
+        return None
+    choice_cols = find_choice_columns(df.columns)
+
+    if RANK_COL in df.columns:
+        ranks = df[RANK_COL].to_numpy()
+    else:
+        ranks = classify_rank(df, col_assigned, choice_cols)
+    rank_levels = pd.Index(sorted(set(choice_cols) | {UNLISTED_RANK}))
+
+    # 공통 차원 (동네, 성별) 코드
+    common = [(col, *_category_of(df[col])) for col in (col_dong, col_gender) if col is not None]
+
+    # 1) 배정 큐브
+    school_cats, school_codes = _category_of(df[col_assigned])
+    dims = common[:1] + [(col_assigned, school_cats, school_codes)] + common[1:]
+    dims.append((RANK_COL, rank_levels, rank_levels.get_indexer(ranks)))
+    assign = _count_combinations([d[2] for d in dims], [d[1] for d in dims], [d[0] for d in dims])
+
+    # 2) 지원 큐브 (지망 컬럼들을 세로로 이어 붙인 것과 같음)
+    apply_cols = [(rank, col) for rank in choice_cols for col in choice_cols[rank]]
+    if apply_cols:
+        n = len(df)
+        choice_levels = pd.Index(sorted(choice_cols))
+        code_arrays = [np.tile(codes, len(apply_cols)) for _, _, codes in common[:1]]
+        code_arrays.append(np.concatenate([df[col].cat.codes.to_numpy() for _, col in apply_cols]))
+        code_arrays += [np.tile(codes, len(apply_cols)) for _, _, codes in common[1:]]
+        code_arrays.append(np.repeat(choice_levels.get_indexer([r for r, _ in apply_cols]), n))
+        names = [d[0] for d in common[:1]] + [CHOICE_SCHOOL_COL] + [d[0] for d in common[1:]] + [CHOICE_RANK_COL]
+        categories = [d[1] for d in common[:1]] + [school_cats] + [d[1] for d in common[1:]] + [choice_levels]
+        applied = _count_combinations(code_arrays, categories, names)
+    else:
+        applied = pd.DataFrame(columns=[CHOICE_SCHOOL_COL, CHOICE_RANK_COL, COUNT_COL])
+
+    return {ASSIGN_CUBE: assign, APPLY_CUBE: applied}
+
+def cube_frames(frames):
+    """Step1 산출물에서 큐브 2개만 골라냅니다. (없으면 None)"""
+    if frames is None or not all(name in frames for name in CUBE_FRAMES):
+        return None
+    return {name: frames[name] for name in CUBE_FRAMES}
+
+def merge_cubes(cube, other):
+    """큐브 2개를 합산합니다. (청크 단위 수집 등에서 누적할 때, 라벨 사전이 달라도 됨)"""
+    if cube is None:
+        return other
+    merged = {}
+    for name in CUBE_FRAMES:
+        a, b = cube[name], other[name]
+        dims = [c for c in a.columns if c != COUNT_COL]
+        both = pd.concat([a, b], ignore_index=True)   # 범주가 다르면 문자열로 합쳐짐
+        total = both.groupby(dims, observed=True, dropna=False, sort=False)[COUNT_COL].sum().reset_index()
+        for col in dims:
+            categories = pd.Index(pd.unique(total[col].dropna())).sort_values()
+            total[col] = pd.Categorical(total[col], categories=categories)
+        merged[name] = total
+    return merged
+
+# ---------------------------------------------------------
+# 합산 (roll-up) / 잘라보기 (slice)
+# ---------------------------------------------------------
+def _dim_codes(cube_part, dim):
+    """차원 컬럼 -> (코드 배열, 라벨 Index). 저장소 등에서 범주형이 풀렸으면 값 순서로 다시 코드화"""
+    col = cube_part[dim]
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        col = col.astype('category')
+    return col.cat.codes.to_numpy(), col.cat.categories
+
+def slice_cube(cube_part, where=None):
+    """where: {차원: 값 또는 값 목록} 조건에 맞는 조합만 남깁니다. (라벨을 코드로 바꿔 비교)"""
+    if not where:
+        return cube_part
+    mask = np.ones(len(cube_part), dtype=bool)
+    for dim, value in where.items():
+        values = value if isinstance(value, (list, tuple, set, np.ndarray)) else [value]
+        codes, labels = _dim_codes(cube_part, dim)
+        lookup = np.zeros(len(labels) + 1, dtype=bool)   # 마지막 칸 = 결측(-1)
+        wanted = labels.get_indexer(list(values))
+        lookup[wanted[wanted >= 0]] = True
+        mask &= lookup[codes]
+    return cube_part[mask]
+
+def _group_codes(cube_part, dims):
+    """
+    dims 조합별 인원 합계 (코드 단위, 결측 제외).
+    반환: ([차원별 코드 배열], 합계 배열, [차원별 라벨 Index]) - 조합은 라벨 순으로 정렬됨
+    """
+    pairs = [_dim_codes(cube_part, d) for d in dims]
+    counts = cube_part[COUNT_COL].to_numpy(dtype=np.int64)
+    valid = np.ones(len(cube_part), dtype=bool)
+    for codes, _ in pairs:
+        valid &= codes >= 0
+
+    key = np.zeros(valid.sum(), dtype=np.int64)
+    n_keys = 1
+    for codes, labels in pairs:
+        key = key * len(labels) + codes[valid]
+        n_keys *= len(labels)
+    if n_keys <= DENSE_KEY_LIMIT:
+        dense = np.bincount(key, weights=counts[valid], minlength=n_keys)
+        keys = np.flatnonzero(dense)
+        sums = dense[keys].astype(np.int64)
+    else:
+        keys, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse, weights=counts[valid], minlength=len(keys)).astype(np.int64)
+
+    group_codes = []
+    for codes, labels in reversed(pairs):
+        keys, code = np.divmod(keys, len(labels))
+        group_codes.insert(0, code)
+    return group_codes, sums, [labels for _, labels in pairs]
+
+def _level(labels, codes, name):
+    """등장한 코드만으로 라벨 Index를 만들고 (라벨 Index, 그 안의 위치)를 반환"""
+    used = np.unique(codes)
+    return pd.Index(labels[used], name=name), np.searchsorted(used, codes)
+
+def rollup(cube_part, dims, where=None):
+    """
+    큐브를 dims 차원으로 합산한 인원 Series (라벨 순, 0건 제외, 결측 라벨 제외).
+    예: rollup(cube[ASSIGN_CUBE], ['배정고등학교'], where={'분석_배정순위': 1})
+    """
+    group_codes, sums, labels = _group_codes(slice_cube(cube_part, where), dims)
+    levels = [_level(lab, codes, dim) for lab, codes, dim in zip(labels, group_codes, dims)]
+    if len(dims) == 1:
+        index = levels[0][0][levels[0][1]]
+    else:
+        index = pd.MultiIndex(levels=[lv for lv, _ in levels], codes=[pos for _, pos in levels], names=dims)
+    return pd.Series(sums, index=index, name=COUNT_COL)
+
+def labels_of(cube_part, dim):
+    """해당 차원에 실제로 등장하는 라벨 (라벨 순, 결측 제외)"""
+    return rollup(cube_part, [dim]).index
+
+def first_choice_table(assign_cube, dims, total_name, first_name):
+    """배정 큐브 -> dims별 (전체 인원, 1지망 배정 인원) 표 (groupby(dims).agg(count, sum)과 같은 모양)"""
+    total = rollup(assign_cube, dims)
+    first = rollup(assign_cube, dims, where={RANK_COL: 1}).reindex(total.index, fill_value=0)
+    return pd.DataFrame({total_name: total, first_name: first})
+
+def add_margins(table, margins_name):
+    """행/열 합계를 붙입니다. (pd.crosstab(margins=True)와 같은 모양)"""
+    table[margins_name] = table.sum(axis=1)
+    table.loc[margins_name] = table.sum(axis=0)
+    return table
+
+def cube_crosstab(cube_part, row, col, where=None, margins_name=None):
+    """큐브 -> row x col 교차표 (pd.crosstab과 같은 모양, 등장하지 않은 행/열 제외)"""
+    table = rollup(cube_part, [row, col], where).unstack(col, fill_value=0).astype(np.int64)
+    return table if margins_name is None else add_margins(table, margins_name)
+
+def rank_order(ranks):
+    """배정 순위를 보고서 순서로 정렬 (1지망, 2지망, ..., 미지망)"""
+    return sorted(ranks, key=lambda r: (r == UNLISTED_RANK, r))
+
+def type_crosstab(cube, row, margins_name=None):
+    """row x 배정 유형 교차표 (열: '1지망 배정', '2지망 배정', ..., '미지망(임의) 배정')"""
+    table = cube_crosstab(cube[ASSIGN_CUBE], row, RANK_COL)
+    table = table[rank_order(table.columns)]
+    table.columns = pd.Index([rank_label(r) for r in table.columns], name='분석_배정유형')
+    return table if margins_name is None else add_margins(table, margins_name)
+
+def type_counts(cube):
+    """배정 유형 라벨별 인원 (value_counts 대체)"""
+    counts = rollup(cube[ASSIGN_CUBE], [RANK_COL])
+    return pd.Series(counts.to_numpy(), index=[rank_label(r) for r in counts.index])
+
+def flow_from_cube(cube, col_dong, col_school):
+    """배정 큐브 -> 동네 x 학교 흐름 매트릭스 (flow_matrix.from_records와 같은 결과)"""
+    assign = cube[ASSIGN_CUBE]
+    dongs, schools = labels_of(assign, col_dong), labels_of(assign, col_school)
+    (dong_codes, school_codes), sums, (dong_labels, school_labels) = _group_codes(assign, [col_dong, col_school])
+    # 라벨 전체 코드 -> 등장한 라벨 안의 위치 (정렬된 라벨이므로 searchsorted)
+    rows = np.searchsorted(dong_labels.get_indexer(dongs), dong_codes)
+    cols = np.searchsorted(school_labels.get_indexer(schools), school_codes)
+    counts = sparse.csr_matrix((sums, (rows, cols)), shape=(len(dongs), len(schools)))
+    return make_flow(counts, dongs, schools)
+
+def load_cube(step):
+    """저장소에 기록된 큐브를 읽습니다. (없으면 None → 호출 측에서 학생 테이블로 생성)"""
+    if not all(has_frame(step, name) for name in CUBE_FRAMES):
+        return None
+    return {name: load_frame(step, name) for name in CUBE_FRAMES}
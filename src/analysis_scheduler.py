@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from instrumentation import carry_context
+from parallel_batches import pool_size
+
+# ==========================================
+# [설정] 독립 분석 동시 실행 (스케줄러)
+# ==========================================
+# 분석마다 입력(원본 데이터 이름 또는 앞 분석 이름)과 실행 방식을 선언해 두면,
+# 입력이 준비된 분석부터 풀에 넣고 끝나는 순서대로 결과를 모읍니다.
+#   - 'thread' : numpy / scipy / BLAS 연산 위주 (연산 중 GIL을 놓으므로 스레드로 충분, 입력 복사 없음)
+#   - 'process': 파이썬 반복문 위주 (GIL에 묶이므로 별도 프로세스, 입력은 pickle로 전달)
+# 모든 분석이 끝나면 결과 {시트명: DataFrame}를 등록 순서대로 합칩니다. (같은 시트명은 뒤 분석이 덮어씀)
+POOL_THREAD = "thread"
+POOL_PROCESS = "process"
+# ==========================================
+
+def analysis(name, run, inputs=(), pool=POOL_THREAD, options=()):
+    """
+    분석 1개를 선언합니다.
+    - run: (입력값..., **옵션) -> {시트명: DataFrame}. 'process' 분석은 모듈 최상위 함수여야 함
+    - inputs: 원본 데이터 이름 또는 앞에 등록된 분석 이름 (분석이면 그 결과 dict가 전달됨)
+    - options: run_analyses(options=...) 중 이 분석에 키워드 인자로 넘길 이름 (예: 'workers')
+    """
+    return {'name': name, 'run': run, 'inputs': list(inputs), 'pool': pool, 'options': list(options)}
+
+def _check(analyses, sources):
+    """입력은 원본 데이터이거나 앞에 등록된 분석이어야 합니다. (등록 순서 = 순차 실행 순서)"""
+    known = set(sources)
+    for a in analyses:
+        missing = [i for i in a['inputs'] if i not in known]
+        if missing:
+            raise ValueError(f"분석 '{a['name']}'의 입력을 찾을 수 없습니다: {missing} (앞에 등록된 분석 / 원본만 사용 가능)")
+        known.add(a['name'])
+
+def _call_args(a, values, options):
+    return [values[i] for i in a['inputs']], {k: options[k] for k in a['options'] if k in options}
+
+def _run_concurrent(analyses, values, options, workers):
+    n_process = sum(a['pool'] == POOL_PROCESS for a in analyses)
+    threads = ThreadPoolExecutor(max_workers=workers)
+    processes = ProcessPoolExecutor(max_workers=pool_size(workers, n_process)) if n_process else None
+    pending, running = list(analyses), {}
+    try:
+        while pending or running:
+            # 입력이 모두 준비된 분석을 풀에 넣음
+            for a in [a for a in pending if all(i in values for i in a['inputs'])]:
+                pending.remove(a)
+                args, kwargs = _call_args(a, values, options)
+                if a['pool'] == POOL_PROCESS:
+                    future = processes.submit(a['run'], *args, **kwargs)
+                else:
+                    future = threads.submit(carry_context(a['run']), *args, **kwargs)
+                running[future] = a['name']
+            # 끝나는 순서대로 결과 수집 (실패하면 예외를 그대로 올림)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                values[running.pop(future)] = future.result()
+    finally:
+        threads.shutdown(cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(cancel_futures=True)
+    return values
+
+def run_analyses(analyses, sources, options=None, workers=None):
+    """
+    선언된 분석을 의존 관계에 따라 동시에 실행합니다.
+    sources: {원본 이름: 값} / options: 분석별 키워드 인자 후보 {이름: 값}
+    workers: 동시에 실행할 분석 수 (기본: CPU 수, 1이면 등록 순서대로 현재 스레드에서 실행)
+    반환: {시트명: DataFrame} (등록 순서대로 합침)
+    """
+    _check(analyses, sources)
+    options = options or {}
+    values = dict(sources)
+    workers = pool_size(workers, len(analyses))
+    if workers <= 1:
+        for a in analyses:
+            args, kwargs = _call_args(a, values, options)
+            values[a['name']] = a['run'](*args, **kwargs)
+    else:
+        values = _run_concurrent(analyses, values, options, workers)
+
+    frames = {}
+    for a in analyses:
+        frames.update(values[a['name']] or {})
+    return frames
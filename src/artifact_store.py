@@ -0,0 +1,227 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+import os
+import sys
+from contextlib import contextmanager
+
+# ==========================================
+# [설정] 중간 산출물 저장소 (Step 간 데이터 전달용)
+# ==========================================
+# 엑셀(.xlsx) 대신 컬럼 기반 포맷(Parquet/Feather)으로 저장하여
+# dtype(숫자/범주형)과 인덱스를 그대로 보존하고, 읽기/쓰기 속도를 높입니다.
+STORE_DIR = os.path.join("data", "processed", "store")
+STORE_FORMAT = "parquet"   # 'parquet' 또는 'feather'
+
+FORMAT_EXT = {"parquet": ".parquet", "feather": ".feather"}
+
+# 엑셀 내보내기: 큰 시트(학생 단위 원본 등)가 있으면 openpyxl 쓰기 전용 모드로 행 단위 스트리밍
+# (셀 객체를 시트 전체만큼 만들지 않아 메모리가 시트 크기와 무관). 작은 요약 시트만 있으면 기존 방식 그대로.
+EXCEL_MAX_ROWS = 1_048_576       # 엑셀 시트당 최대 행 수 (머리글 포함) - 넘으면 '<시트>_2', '<시트>_3' ...로 나눔
+EXCEL_STREAM_ROWS = 100_000      # 이 행 수를 넘는 시트가 있으면 스트리밍 모드
+EXCEL_STREAM_CHUNK = 50_000      # 스트리밍 시 한 번에 변환하는 행 수
+EXCEL_SHEET_NAME_MAX = 31        # 엑셀 시트 이름 최대 길이
+# ==========================================
+
+def step_dir(step):
+    """Step 이름에 해당하는 저장소 폴더 경로를 반환합니다."""
+    return os.path.join(STORE_DIR, step)
+
+def _frame_path(step, name, fmt):
+    return os.path.join(step_dir(step), f"{name}{FORMAT_EXT[fmt]}")
+
+def save_frame(df, step, name, fmt=None):
+    """DataFrame 1개를 저장소에 기록합니다. (인덱스/범주형 dtype 보존)"""
+    fmt = fmt or STORE_FORMAT
+    os.makedirs(step_dir(step), exist_ok=True)
+
+    # 컬럼명이 문자열이 아니면 Arrow 스키마를 만들 수 없으므로 문자열로 통일
+    if not all(isinstance(c, str) for c in df.columns):
+        df = df.copy()
+        df.columns = [str(c) for c in df.columns]
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    path = _frame_path(step, name, fmt)
+    if fmt == "feather":
+        feather.write_feather(table, path)
+    else:
+        pq.write_table(table, path)
+
+    # 다른 포맷으로 남아 있는 이전 산출물은 제거 (읽기 시 혼동 방지)
+    for other, ext in FORMAT_EXT.items():
+        stale = os.path.join(step_dir(step), f"{name}{ext}")
+        if other != fmt and os.path.exists(stale):
+            os.remove(stale)
+    return path
+
+def load_frame(step, name, columns=None):
+    """저장소에서 DataFrame 1개를 읽어옵니다. (필요한 컬럼만 지정 가능)"""
+    for fmt, ext in FORMAT_EXT.items():
+        path = _frame_path(step, name, fmt)
+        if not os.path.exists(path):
+            continue
+        if fmt == "feather":
+            table = feather.read_table(path, columns=columns)
+        else:
+            table = pq.read_table(path, columns=columns)
+        return table.to_pandas()
+    raise FileNotFoundError(f"저장소에 산출물이 없습니다: {step}/{name}")
+
+def frame_columns(step, name):
+    """저장된 표의 컬럼명 목록 (파일 메타데이터만 읽음, 인덱스 컬럼 제외)"""
+    for fmt, ext in FORMAT_EXT.items():
+        path = _frame_path(step, name, fmt)
+        if not os.path.exists(path):
+            continue
+        schema = feather.read_table(path, memory_map=True).schema if fmt == "feather" else pq.read_schema(path)
+        index_cols = set()
+        if schema.pandas_metadata:
+            index_cols = {c for c in schema.pandas_metadata.get('index_columns', []) if isinstance(c, str)}
+        return [n for n in schema.names if n not in index_cols]
+    raise FileNotFoundError(f"저장소에 산출물이 없습니다: {step}/{name}")
+
+def has_frame(step, name):
+    return any(os.path.exists(_frame_path(step, name, fmt)) for fmt in FORMAT_EXT)
+
+def list_frames(step):
+    """Step에 저장된 산출물 이름 목록 (저장 순서 = 엑셀 시트 순서)"""
+    manifest = os.path.join(step_dir(step), "_order.txt")
+    if os.path.exists(manifest):
+        with open(manifest, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    if not os.path.isdir(step_dir(step)):
+        return []
+    return sorted(os.path.splitext(n)[0] for n in os.listdir(step_dir(step))
+                  if os.path.splitext(n)[1] in FORMAT_EXT.values())
+
+@contextmanager
+def frame_writer(step, name):
+    """
+    대용량 표를 청크 단위로 이어 쓰는 Parquet 기록기 (메모리에는 청크 1개만 유지).
+    사용법: with frame_writer('step1', '보안_RawData') as write: write(chunk_df)
+    첫 청크의 스키마(dtype)를 기준으로 이후 청크를 맞춥니다.
+    """
+    os.makedirs(step_dir(step), exist_ok=True)
+    path = _frame_path(step, name, "parquet")
+    state = {'writer': None}
+
+    def write(df):
+        if state['writer'] is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            state['writer'] = pq.ParquetWriter(path, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=state['writer'].schema, preserve_index=False)
+        state['writer'].write_table(table)
+
+    try:
+        yield write
+    finally:
+        if state['writer'] is not None:
+            state['writer'].close()
+
+    stale = _frame_path(step, name, "feather")
+    if os.path.exists(stale):
+        os.remove(stale)
+
+def save_step(step, frames, fmt=None, order=None):
+    """
+    Step 결과(시트명 -> DataFrame)를 한 번에 저장합니다.
+    order: 시트 순서 (frame_writer로 따로 기록한 산출물을 포함할 때 지정)
+    """
+    for name, df in frames.items():
+        save_frame(df, step, name, fmt=fmt)
+    os.makedirs(step_dir(step), exist_ok=True)
+    with open(os.path.join(step_dir(step), "_order.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(order or frames.keys()))
+    print(f"💾 저장소 기록 완료: {step_dir(step)} ({len(frames)}개 산출물)")
+
+def load_step(step, names=None):
+    """Step 결과를 {시트명: DataFrame} 형태로 읽어옵니다."""
+    names = names or list_frames(step)
+    return {name: load_frame(step, name) for name in names}
+
+def export_excel(frames, path, stream_rows=EXCEL_STREAM_ROWS):
+    """
+    최종 보고용 엑셀 내보내기 (선택 단계).
+    기본 RangeIndex인 표는 인덱스 없이, 의미 있는 인덱스(학교/동네 등)는 함께 기록합니다.
+    stream_rows를 넘는 시트가 있으면 쓰기 전용 스트리밍 모드로 기록하고, 엑셀 행 제한을 넘는 시트는 나눕니다.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if any(len(df) > stream_rows for df in frames.values()):
+        _export_excel_streaming(frames, path)
+    else:
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            for name, df in frames.items():
+                write_index = not isinstance(df.index, pd.RangeIndex)
+                df.to_excel(writer, sheet_name=name, index=write_index)
+    print(f"📤 엑셀 내보내기 완료: {path}")
+
+def _sheet_part_name(name, part):
+    """나눈 시트 이름: 첫 조각은 원래 이름, 이후 '<시트>_2', '<시트>_3' ... (31자 제한 안에서 자름)"""
+    if part == 1:
+        return name[:EXCEL_SHEET_NAME_MAX]
+    suffix = f"_{part}"
+    return name[:EXCEL_SHEET_NAME_MAX - len(suffix)] + suffix
+
+def _sheet_table(df):
+    """시트에 쓸 표: 의미 있는 인덱스는 컬럼으로 풀고, 다단 컬럼명은 ' / '로 이어 붙임"""
+    if not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index()
+    header = [" / ".join(map(str, c)) if isinstance(c, tuple) else c for c in df.columns]
+    return df, header
+
+def _row_chunks(df, chunk_rows=EXCEL_STREAM_CHUNK):
+    """DataFrame -> 행 목록 청크 (범주형은 값으로, 결측은 빈 칸으로)"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        yield chunk.where(chunk.notna(), None).to_numpy().tolist()
+
+def _export_excel_streaming(frames, path):
+    """쓰기 전용 통합문서에 시트를 순서대로 행 단위로 기록합니다. (시트당 데이터 행은 EXCEL_MAX_ROWS - 1까지)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    bold = Font(bold=True)
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+
+    for name, df in frames.items():
+        df, header = _sheet_table(df)
+        state = {'ws': None, 'part': 0, 'rows': rows_per_sheet}
+
+        def next_sheet():
+            state['part'] += 1
+            state['ws'] = wb.create_sheet(_sheet_part_name(name, state['part']))
+            header_cells = []
+            for col in header:
+                cell = WriteOnlyCell(state['ws'], value=col)
+                cell.font = bold
+                header_cells.append(cell)
+            state['ws'].append(header_cells)
+            state['rows'] = 0
+
+        next_sheet()
+        for rows in _row_chunks(df):
+            for row in rows:
+                if state['rows'] == rows_per_sheet:
+                    next_sheet()
+                state['ws'].append(row)
+                state['rows'] += 1
+        if state['part'] > 1:
+            print(f"   - '{name}' {len(df):,}행 -> 시트 {state['part']}개로 나눔 (엑셀 행 제한 {EXCEL_MAX_ROWS:,})")
+
+    wb.save(path)
+
+def wants_excel_export(argv=None):
+    """실행 인자에 --excel 이 있으면 엑셀 내보내기를 수행합니다."""
+    argv = sys.argv[1:] if argv is None else argv
+    return "--excel" in argv
+
+if __name__ == "__main__":
+    # 사용법: python src/artifact_store.py <step> <출력.xlsx>
+    if len(sys.argv) != 3:
+        print("사용법: python src/artifact_store.py <step> <출력.xlsx>")
+        sys.exit(1)
+    export_excel(load_step(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,78 @@
+import pandas as pd
+import numpy as np
+import re
+
+# ==========================================
+# [설정] 배정 유형 라벨
+# ==========================================
+# 배정 순위(rank) 0 = 어느 지망에도 없는 학교로 배정
+UNLISTED_RANK = 0
+UNLISTED_LABEL = "미지망(임의) 배정"
+
+# '1지망', '2지망', '3지망' ... 헤더에서 순위 숫자를 추출 ('11지망'의 '1지망' 오인 방지)
+CHOICE_PATTERN = re.compile(r"(?<!\d)(\d+)지망")
+# ==========================================
+
+def rank_label(rank):
+    """배정 순위 숫자를 보고서용 라벨로 변환합니다. (예: 1 -> '1지망 배정')"""
+    return UNLISTED_LABEL if rank == UNLISTED_RANK else f"{rank}지망 배정"
+
+def find_choice_columns(columns):
+    """헤더 목록에서 지망 컬럼을 찾아 {순위: [컬럼들]} 형태로 반환합니다."""
+    choice_cols = {}
+    for col in columns:
+        m = CHOICE_PATTERN.search(str(col))
+        if m:
+            choice_cols.setdefault(int(m.group(1)), []).append(col)
+    return dict(sorted(choice_cols.items()))
+
+def shares_categories(df, cols):
+    """컬럼들이 모두 같은 코드표(categories)를 쓰는 Categorical인지"""
+    dtypes = [df[c].dtype for c in cols]
+    return (all(isinstance(d, pd.CategoricalDtype) for d in dtypes)
+            and all(d.categories.equals(dtypes[0].categories) for d in dtypes[1:]))
+
+def classify_rank(df, col_assigned, choice_cols):
+    """
+    배정학교가 몇 지망이었는지 전체 학생을 한 번에 판별합니다.
+    choice_cols: {순위: [컬럼들]} (find_choice_columns 결과)
+    반환: 학생별 배정 순위 배열 (1, 2, 3 ... / 미지망은 0)
+    """
+    cols = [c for rank in choice_cols for c in choice_cols[rank]]
+    if not cols:
+        return np.zeros(len(df), dtype=np.int8)
+    col_ranks = np.array([rank for rank in choice_cols for _ in choice_cols[rank]], dtype=np.int16)
+
+    # 배정 컬럼 + 지망 컬럼을 같은 코드표로 정수화한 뒤 (학생 x 지망컬럼) 행렬로 비교
+    all_cols = [col_assigned] + cols
+    if shares_categories(df, all_cols):
+        # 이미 같은 학교 사전으로 코드화된 테이블(coded_table)은 코드를 그대로 사용
+        # (결측은 모두 코드 -1이므로 결측끼리 일치로 보는 것도 factorize 경로와 동일)
+        codes = np.column_stack([df[c].cat.codes.to_numpy() for c in all_cols])
+    else:
+        values = df[all_cols].to_numpy(dtype=object)
+        codes, _ = pd.factorize(values.ravel(), use_na_sentinel=False)
+        codes = codes.reshape(values.shape)
+    matches = codes[:, 1:] == codes[:, [0]]
+
+    # 일치하는 지망 중 가장 높은 순위(숫자가 작은 순위)를 채택
+    big = np.iinfo(np.int16).max
+    best = np.where(matches, col_ranks, big).min(axis=1)
+    return np.where(best == big, UNLISTED_RANK, best).astype(np.int8)
+
+def rank_to_labels(ranks, choice_ranks):
+    """배정 순위 배열을 범주형(Categorical) 라벨로 변환합니다."""
+    categories = [rank_label(r) for r in choice_ranks] + [UNLISTED_LABEL]
+    label_codes = np.where(ranks == UNLISTED_RANK, len(choice_ranks),
+                           np.searchsorted(np.asarray(choice_ranks), ranks))
+    return pd.Categorical.from_codes(label_codes, categories=categories)
+
+def classify_assignment(df, col_assigned, choice_cols=None):
+    """
+    배정 유형 분류 (1지망 / 2지망 / ... / 미지망(임의) 배정).
+    반환: (라벨 Categorical, 순위 배열)
+    """
+    if choice_cols is None:
+        choice_cols = find_choice_columns(df.columns)
+    ranks = classify_rank(df, col_assigned, choice_cols)
+    return rank_to_labels(ranks, list(choice_cols)), ranks
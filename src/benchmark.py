@@ -0,0 +1,238 @@
+import pandas as pd
+import numpy as np
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import pii_masking
+import research_analytics
+import statistical_deep_research
+import stat_reliability
+import advanced_analytics_engine
+import gender_analytics
+import final_dashboard_generator
+from pipeline import step2_inputs
+from aggregate_cube import cube_frames
+from stage_graph import hash_frame
+from synthetic_cohort import generate_cohort, write_cohort, load_cohort, RANDOM_SEED, SYNTH_DIR
+import instrumentation
+
+# ==========================================
+# [설정] Step별 성능 측정 (벤치마크)
+# ==========================================
+# 가상 데이터(synthetic_cohort)로 Step을 하나씩 실행하며 시간/메모리를 측정하고 JSON으로 기록합니다.
+# 골든(golden) 지문과 비교하여, 최적화로 인해 결과 숫자가 바뀌면 바로 알 수 있습니다.
+# 골든 지문은 저장소(git)에 함께 기록되는 benchmarks/golden_digests.json (기본 학생 수 / 시드)이므로
+# 커밋 전후 결과가 바뀌면 다른 PC에서도 불일치로 드러납니다. (측정 결과 JSON은 실행 폴더에만 기록)
+BENCH_DIR = os.path.join("data", "benchmark")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+GOLDEN_FILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "golden_digests.json"))
+DEFAULT_SIZES = [10_000, 100_000]
+
+BENCH_SALT = b"benchmark-fixed-salt"   # 가명화 토큰도 골든 비교 대상이므로 고정 키 사용
+GOLDEN_DECIMALS = 6                    # 실수는 소수점 6자리로 반올림 후 지문 계산
+REGRESSION_RATIO = 1.25                # 직전 기록 대비 이 배수 이상 느려지면 경고
+REGRESSION_MIN_SEC = 0.05              # 너무 짧은 Step은 측정 오차가 커서 경고 제외
+# ==========================================
+
+def benchmark_stages():
+    """(Step 이름, 실행 함수) 목록. 실행 함수는 앞 Step 결과가 담긴 ctx를 받습니다."""
+    return [
+        ('ingest', lambda ctx: ingest(ctx['raw_file'])),
+        ('step1', lambda ctx: pii_masking.mask_and_classify(ctx['ingest'], salt=BENCH_SALT)),
+        ('step2', lambda ctx: research_analytics.analyze_research(ctx['step1']['보안_RawData'], cube_frames(ctx['step1']))),
+        ('step3', lambda ctx: statistical_deep_research.compute_stats_final(*step2_inputs(ctx['step2']))),
+        ('step3_sub', lambda ctx: stat_reliability.compute_stats_v2(*step2_inputs(ctx['step2']))),
+        ('step4', lambda ctx: advanced_analytics_engine.run_all_analyses(*step2_inputs(ctx['step2']))),
+        ('gender', lambda ctx: gender_analytics.analyze_gender(ctx['step1']['보안_RawData'], cube_frames(ctx['step1']))),
+        ('dashboard', lambda ctx: final_dashboard_generator.build_dashboard_html(ctx['step3'])),
+    ]
+
+def cohort_file(n_students, seed=RANDOM_SEED):
+    """
+    측정용 원본 파일 (학생 수 / 시드별로 처음 한 번만 생성해 SYNTH_DIR에 보관, 생성 시간은 측정에서 제외)
+    엑셀 행 제한을 넘는 규모는 Parquet으로 저장됩니다.
+    """
+    path = os.path.join(SYNTH_DIR, f"bench_{n_students}_{seed}.xlsx")
+    for existing in (path, os.path.splitext(path)[0] + ".parquet"):
+        if os.path.exists(existing):
+            return existing
+    return write_cohort(generate_cohort(n_students, seed=seed), path)
+
+def ingest(path):
+    """원본 파일 읽기 (엑셀은 파이프라인과 같은 pii_masking.load_raw: 스키마 해석 + 엑셀 읽기 + 서브헤더 처리)"""
+    if path.endswith(".parquet"):
+        return pii_masking.rebuild_subheader_columns(load_cohort(path))
+    df, _ = pii_masking.load_raw(path)
+    return df
+
+def golden_digest(result, decimals=GOLDEN_DECIMALS):
+    """Step 결과의 지문 (DataFrame은 시트별, HTML 등 문자열은 SHA-256)"""
+    if isinstance(result, str):
+        return hashlib.sha256(result.encode("utf-8")).hexdigest()
+    if isinstance(result, pd.DataFrame):
+        result = {'': result}
+    digests = {}
+    for name, df in result.items():
+        float_cols = df.select_dtypes(include='float').columns
+        # 범주형(Categorical) 코드화 여부는 표현 방식일 뿐이므로 값 기준으로 비교
+        coded_cols = list(df.select_dtypes(include='category').columns)
+        if len(float_cols) or coded_cols:
+            df = df.copy()
+            df[float_cols] = df[float_cols].round(decimals)
+            for col in coded_cols:
+                df[col] = df[col].astype(df[col].cat.categories.dtype)
+        digests[name] = hash_frame(df)
+    return digests
+
+def measure(name, fn, ctx, n_students, verbose=False):
+    """
+    Step 1개 실행 + 벽시계/CPU 시간, 메모리 측정 (instrumentation.track 사용)
+    행/초는 학생 수 기준, output_rows는 산출 시트 행 합계입니다.
+    """
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink, instrumentation.track(f"benchmark.{name}", rows_in=n_students) as record:
+        result = fn(ctx)
+        record['sheet_rows'] = instrumentation.count_rows(result)
+    metrics = {key: record[key] for key in ('wall_s', 'cpu_s', 'peak_rss_mb', 'peak_traced_mb', 'rows_per_s')}
+    return result, {**metrics, 'output_rows': record['sheet_rows']}
+
+def run_size(n_students, seed=RANDOM_SEED, trace_memory=False, verbose=False):
+    """학생 n명 가상 데이터로 전체 Step 측정. 반환: (측정 결과, {Step: 지문})"""
+    print(f"\n🧪 가상 학생 {n_students:,}명 (seed={seed})")
+    wall = time.perf_counter()
+    ctx = {'raw_file': cohort_file(n_students, seed)}
+    print(f"   - 원본 파일 준비: {time.perf_counter() - wall:.2f}s ({ctx['raw_file']})")
+
+    stages, digests = [], {}
+    for name, fn in benchmark_stages():
+        result, metrics = measure(name, fn, ctx, n_students, verbose)
+        if result is None:
+            print(f"❌ [{name}] 실행 실패 → 이후 Step 측정 중단")
+            break
+        ctx[name] = result
+        digests[name] = golden_digest(result)
+        stages.append({'stage': name, **metrics})
+        traced = f", traced {metrics['peak_traced_mb']}MB" if trace_memory else ""
+        print(f"   - {name:<10} {metrics['wall_s']:>9.3f}s (CPU {metrics['cpu_s']:.3f}s, "
+              f"RSS {metrics['peak_rss_mb']}MB{traced})")
+    return {'students': n_students, 'seed': seed, 'stages': stages}, digests
+
+def environment_info():
+    import scipy
+    import sklearn
+    return {
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'cpu_count': os.cpu_count(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'scipy': scipy.__version__, 'sklearn': sklearn.__version__,
+    }
+
+def check_golden(run, digests, golden, update=False):
+    """골든 지문과 비교합니다. 반환: 'ok' / 'mismatch' / 'recorded' / 'missing'"""
+    key = f"{run['students']}@{run['seed']}"
+    if update:
+        golden[key] = digests
+        return 'recorded'
+    if key not in golden:
+        print(f"⚠ 골든 지문 없음 ({key}) → --update-golden 으로 먼저 기록하세요.")
+        return 'missing'
+
+    mismatched = []
+    for stage_name, expected in golden[key].items():
+        actual = digests.get(stage_name)
+        if isinstance(expected, dict):
+            mismatched += [f"{stage_name}/{sheet}" for sheet, h in expected.items()
+                           if (actual or {}).get(sheet) != h]
+        elif actual != expected:
+            mismatched.append(stage_name)
+    if mismatched:
+        print(f"❌ 골든 결과 불일치 ({key}): {', '.join(mismatched)}")
+        return 'mismatch'
+    print(f"✅ 골든 결과 일치 ({key})")
+    return 'ok'
+
+def latest_results(trace_memory=False):
+    """같은 측정 방식(tracemalloc 사용 여부)으로 기록된 가장 최근 결과 (tracemalloc은 실행을 느리게 함)"""
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "bench_*.json")), reverse=True):
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)
+        if results.get('trace_memory', False) == trace_memory:
+            return results
+    return None
+
+def report_regressions(runs, previous):
+    """직전 기록과 같은 (학생 수, seed)의 Step 시간을 비교해 느려진 Step을 알립니다."""
+    if previous is None:
+        return []
+    before = {(r['students'], r['seed'], s['stage']): s['wall_s']
+              for r in previous['runs'] for s in r['stages']}
+    slower = []
+    for run in runs:
+        for s in run['stages']:
+            old = before.get((run['students'], run['seed'], s['stage']))
+            if old and s['wall_s'] >= REGRESSION_MIN_SEC and s['wall_s'] > old * REGRESSION_RATIO:
+                slower.append(f"{run['students']:,}명/{s['stage']}: {old:.3f}s → {s['wall_s']:.3f}s")
+    for line in slower:
+        print(f"⚠ 성능 저하 의심: {line}")
+    return slower
+
+def run_benchmark(sizes=DEFAULT_SIZES, seed=RANDOM_SEED, update_golden=False,
+                  trace_memory=False, verbose=False):
+    """전체 벤치마크 실행 후 결과 JSON 경로를 반환합니다. (골든 불일치 시 결과에 기록)"""
+    instrumentation.configure(trace_memory=trace_memory)
+    golden = {}
+    if os.path.exists(GOLDEN_FILE):
+        with open(GOLDEN_FILE, encoding="utf-8") as f:
+            golden = json.load(f)
+    previous = latest_results(trace_memory)
+
+    runs = []
+    for n in sizes:
+        run, digests = run_size(n, seed, trace_memory, verbose)
+        run['golden'] = check_golden(run, digests, golden, update_golden)
+        runs.append(run)
+
+    if update_golden:
+        os.makedirs(os.path.dirname(GOLDEN_FILE), exist_ok=True)
+        with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"💾 골든 지문 기록: {GOLDEN_FILE}")
+
+    results = {
+        'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'environment': environment_info(),
+        'trace_memory': trace_memory,
+        'runs': runs,
+        'regressions': report_regressions(runs, previous),
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n📊 벤치마크 결과 저장: {path}")
+    return path, results
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="가상 데이터 기반 Step별 성능 측정 / 골든 결과 검증")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="학생 수 목록")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="가상 데이터 난수 시드")
+    parser.add_argument("--update-golden", action="store_true",
+                        help="현재 결과를 골든 지문으로 기록 (최적화 작업 전에 실행)")
+    parser.add_argument("--verbose", action="store_true", help="각 Step의 출력 메시지 표시")
+    return instrumentation.add_instrumentation_args(parser)   # --trace-memory / --profile 등
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    print("⏱ [Benchmark] Step별 성능 측정을 시작합니다.")
+    _, results = run_benchmark(args.sizes, args.seed, args.update_golden,
+                               args.trace_memory, args.verbose)
+    if any(run['golden'] == 'mismatch' for run in results['runs']):
+        sys.exit(1)
@@ -0,0 +1,234 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from parallel_batches import count_option, workers_option, batch_tasks, run_batches
+
+# ==========================================
+# [설정] 학생 단위 부트스트랩 (신뢰구간 / 군집 안정성)
+# ==========================================
+# 학교가 아니라 '학생'을 복원추출한 표본을 수천 번 만들어 신뢰도 지표의 흔들림을 봅니다.
+# 학생 단위 원자료 대신 Step2 집계만으로 같은 분포를 재현합니다. (반복 묶음 단위로 벡터화)
+#   - 동네 x 학교 흐름표의 칸(학생 그룹) 인원 = 다항분포 Multinomial(N, 칸 비율)
+#   - 학교별 1지망 배정 인원 = 재추출된 배정 인원 중 이항분포 (원래 1지망 배정 비율)
+#   - 학교별 1지망 탈락 지원자 = 이항분포 Binomial(N, 탈락 지원자 / N)
+# 분석 대상 학교/동네 목록(최소 표본 기준)은 원자료 기준으로 고정합니다.
+# 실행 인자: --bootstrap <반복 수> [--workers <프로세스 수>]
+BOOTSTRAP_REPLICATES = 2000   # --bootstrap 만 주고 값이 없을 때의 기본 반복 수
+BOOTSTRAP_BATCH = 100         # 한 번에 벡터화해서 뽑는 반복 수 (프로세스에 나눠 주는 단위)
+BOOTSTRAP_SEED = 42           # 묶음별 난수는 이 시드에서 파생 → 프로세스 수와 무관하게 같은 결과
+CI_LEVEL = 0.95               # 신뢰구간 수준 (백분위수 구간)
+KMEANS_N_INIT = 10            # 원래 분석과 같은 KMeans 설정
+KMEANS_RANDOM_STATE = 42
+# ==========================================
+
+def bootstrap_options(argv=None):
+    """실행 인자 -> (반복 수, 프로세스 수). --bootstrap 이 없으면 반복 수 0 (부트스트랩 안 함)"""
+    return count_option("--bootstrap", BOOTSTRAP_REPLICATES, argv), workers_option(argv)
+
+def _indicator(index, n_cols):
+    """칸 -> 그룹(행/열) 합산용 희소 지시 행렬 (칸 수 x 그룹 수)"""
+    return sparse.csr_matrix((np.ones(len(index)), (np.arange(len(index)), index)), shape=(len(index), n_cols))
+
+def build_model(valid_schools, flow, valid_dongs, chi_schools, n_clusters):
+    """
+    재추출에 필요한 배열만 모은 모델 (프로세스로 보내기 쉽도록 numpy 배열 딕셔너리)
+    valid_schools: 유효 학교 표 (실제배정인원 / 일지망_배정된_사람 / 총_1지망_지원자수 포함)
+    flow: 전체 동네 x 학교 흐름표 / valid_dongs, chi_schools: 카이제곱 대상 동네, 학교
+    n_clusters: 원래 분석의 KMeans 군집 수
+    """
+    coo = flow['counts'].tocoo()
+    n_students = int(coo.data.sum())
+
+    school_pos = flow['schools'].get_indexer(valid_schools['배정고등학교'])
+    keep = school_pos >= 0
+    assigned = valid_schools['실제배정인원'].to_numpy(dtype=float)[keep]
+    first = valid_schools['일지망_배정된_사람'].to_numpy(dtype=float)[keep]
+    applicants = valid_schools['총_1지망_지원자수'].fillna(0).to_numpy(dtype=float)[keep]
+
+    # 카이제곱 대상 칸 (유효 동네 x 대상 학교)
+    in_rows = np.zeros(len(flow['dongs']), dtype=bool)
+    in_rows[flow['dongs'].get_indexer(valid_dongs)] = True
+    chi_cols = flow['schools'].get_indexer(chi_schools)
+    col_map = np.full(len(flow['schools']), -1)
+    col_map[chi_cols[chi_cols >= 0]] = np.arange((chi_cols >= 0).sum())
+    chi_cells = np.flatnonzero(in_rows[coo.row] & (col_map[coo.col] >= 0))
+    row_map = np.cumsum(in_rows) - 1
+
+    return {
+        'n_students': n_students,
+        'cell_p': coo.data / n_students,
+        'cell_school': _indicator(coo.col, len(flow['schools'])),
+        'school_pos': school_pos[keep],
+        'first_rate': first / assigned,
+        'rejected_p': np.clip(applicants - first, 0, None) / n_students,
+        'chi_cells': chi_cells,
+        'chi_rows': _indicator(row_map[coo.row[chi_cells]], int(in_rows.sum())),
+        'chi_cols': _indicator(col_map[coo.col[chi_cells]], int((chi_cols >= 0).sum())),
+        'n_clusters': n_clusters,
+    }
+
+def resample(model, n_reps, rng):
+    """
+    반복 n_reps개의 재추출 집계를 한 번에 뽑습니다.
+    반환: (흐름표 칸 인원 [반복 x 칸], 학교별 실질경쟁률 [반복 x 학교], 학교별 배정만족도(%) [반복 x 학교])
+    """
+    cells = rng.multinomial(model['n_students'], model['cell_p'], size=n_reps)
+    assigned = (model['cell_school'].T @ cells.T).T[:, model['school_pos']]
+    first = rng.binomial(assigned.astype(np.int64), model['first_rate'])
+    rejected = rng.binomial(model['n_students'], model['rejected_p'], size=assigned.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Step2와 같은 반올림 (실질경쟁률 소수 2자리, 만족도 1자리)
+        competition = np.round((first + rejected) / assigned, 2)
+        satisfaction = np.round(first / assigned * 100, 1)
+    return cells, competition, satisfaction
+
+def pearson_rows(x, y):
+    """행(반복)별 피어슨 상관계수 (벡터화)"""
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (xc * yc).sum(axis=1) / np.sqrt((xc ** 2).sum(axis=1) * (yc ** 2).sum(axis=1))
+
+def cramer_v_rows(model, cells):
+    """행(반복)별 카이제곱 Cramér's V (flow_matrix.chi_square와 같은 식, 빈 행/열은 반복마다 제외)"""
+    observed = cells[:, model['chi_cells']].astype(float)
+    rows = (model['chi_rows'].T @ observed.T).T
+    cols = (model['chi_cols'].T @ observed.T).T
+    n = observed.sum(axis=1)
+    row_of = model['chi_rows'].indices
+    col_of = model['chi_cols'].indices
+    expected = rows[:, row_of] * cols[:, col_of] / n[:, None]
+    ratio = np.divide(observed ** 2, expected, out=np.zeros_like(observed), where=observed > 0)
+    chi2 = ratio.sum(axis=1) - n
+    min_dim = np.minimum((rows > 0).sum(axis=1), (cols > 0).sum(axis=1)) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(min_dim > 0, np.sqrt(np.clip(chi2, 0, None) / (n * min_dim)), 0.0)
+
+def cluster_labels(competition, satisfaction, n_clusters):
+    """반복 1개의 학교 특성으로 원래 분석과 같은 KMeans 군집을 다시 구합니다."""
+    features = np.nan_to_num(np.column_stack([competition, satisfaction]))
+    scaled = StandardScaler().fit_transform(features)
+    return KMeans(n_clusters=n_clusters, random_state=KMEANS_RANDOM_STATE, n_init=KMEANS_N_INIT).fit_predict(scaled)
+
+# ---------------------------------------------------------
+# 묶음 실행 (프로세스 풀)
+# ---------------------------------------------------------
+_worker = {}
+
+def _init_worker(model):
+    """프로세스마다 모델을 한 번만 받아 둡니다."""
+    _worker['model'] = model
+
+def _run_batch(task):
+    """묶음 1개: (시드, 반복 수) -> 반복별 지표 + 학교 쌍별 같은 군집 횟수"""
+    seed, n_reps = task
+    model = _worker['model']
+    rng = np.random.default_rng(seed)
+    cells, competition, satisfaction = resample(model, n_reps, rng)
+
+    n_schools = competition.shape[1]
+    co_assigned = np.zeros((n_schools, n_schools), dtype=np.int32)
+    for b in range(n_reps):
+        labels = cluster_labels(competition[b], satisfaction[b], model['n_clusters'])
+        co_assigned += labels[:, None] == labels[None, :]
+    return {
+        'r': pearson_rows(competition, satisfaction),
+        'v': cramer_v_rows(model, cells),
+        'competition': competition,
+        'satisfaction': satisfaction,
+        'co_assigned': co_assigned,
+    }
+
+def run_replicates(model, n_reps, workers=None, seed=BOOTSTRAP_SEED):
+    """반복을 묶음으로 나눠 프로세스 풀에서 실행하고 결과를 합칩니다. (workers=1 이면 현재 프로세스에서)"""
+    batches = run_batches(_run_batch, batch_tasks(n_reps, BOOTSTRAP_BATCH, seed), workers,
+                          _init_worker, (model,), label="학생 단위 부트스트랩")
+
+    merged = {key: np.concatenate([b[key] for b in batches]) for key in ('r', 'v', 'competition', 'satisfaction')}
+    merged['co_assigned'] = sum(b['co_assigned'] for b in batches)
+    return merged
+
+# ---------------------------------------------------------
+# 결과 표
+# ---------------------------------------------------------
+def interval(samples, level=CI_LEVEL, axis=0):
+    """백분위수 신뢰구간 (결측 반복 제외) -> (하한, 상한)"""
+    tail = (1 - level) / 2 * 100
+    return np.nanpercentile(samples, tail, axis=axis), np.nanpercentile(samples, 100 - tail, axis=axis)
+
+def ci_table(estimates, samples, level=CI_LEVEL):
+    """
+    {지표: 점추정} + {지표: 반복별 값} -> 신뢰구간 표
+    칸이 많고 희소한 표의 Cramér's V는 재추출 잡음만큼 위로 치우치므로 편향(반복 평균 - 점추정)도 함께 기록
+    """
+    rows = []
+    for name, estimate in estimates.items():
+        values = samples[name]
+        low, high = interval(values, level)
+        bias = np.nanmean(values) - estimate
+        rows.append({
+            '지표': name, '점추정': estimate,
+            '부트스트랩_평균': np.nanmean(values), '편향': bias, '편향보정_추정': estimate - bias,
+            '표준오차': np.nanstd(values, ddof=1),
+            f'CI{int(level * 100)}_하한': low, f'CI{int(level * 100)}_상한': high,
+            '유효_반복수': int(np.isfinite(values).sum()),
+        })
+    return pd.DataFrame(rows)
+
+def stability_tables(schools, labels, type_names, co_assigned, n_reps):
+    """
+    같은 군집 비율(co-assignment) -> 학교별 / 군집별 안정성 표
+    학교 안정성 = 원래 같은 군집이었던 다른 학교들과 반복에서도 같은 군집에 묶인 비율의 평균
+    """
+    co = co_assigned / n_reps
+    same = labels[:, None] == labels[None, :]
+    np.fill_diagonal(same, False)
+    peers = same.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(peers > 0, (co * same).sum(axis=1) / peers, np.nan)
+        # 원래 다른 군집인 학교와 묶인 비율 (낮을수록 군집 경계가 뚜렷함)
+        other = ~same
+        np.fill_diagonal(other, False)
+        leak = np.where(other.sum(axis=1) > 0, (co * other).sum(axis=1) / other.sum(axis=1), np.nan)
+
+    per_school = pd.DataFrame({
+        '배정고등학교': schools, '군집_Label': labels, '분석_학교유형': type_names,
+        '군집_안정성': score.round(3), '타군집_혼입률': leak.round(3),
+    }).sort_values(['군집_Label', '군집_안정성'], ascending=[True, False]).reset_index(drop=True)
+    per_cluster = per_school.groupby(['군집_Label', '분석_학교유형']).agg(
+        학교수=('배정고등학교', 'size'), 평균_안정성=('군집_안정성', 'mean'), 최저_안정성=('군집_안정성', 'min'),
+    ).round(3).reset_index()
+    return per_school, per_cluster
+
+def bootstrap_reliability(valid_schools, flow, valid_dongs, chi_schools, estimates, n_clusters, n_reps,
+                          workers=None, seed=BOOTSTRAP_SEED):
+    """
+    신뢰도 지표의 부트스트랩 신뢰구간 + 군집 안정성 표 {시트명: DataFrame}
+    estimates: {'상관계수(r)': 점추정, '연관성 강도(V)': 점추정}
+    valid_schools: '군집_Label' / '분석_학교유형'이 붙은 유효 학교 표 / n_clusters: 원래 분석의 군집 수
+    """
+    model = build_model(valid_schools, flow, valid_dongs, chi_schools, n_clusters)
+    result = run_replicates(model, n_reps, workers, seed)
+
+    ci = ci_table(estimates, {'상관계수(r)': result['r'], '연관성 강도(V)': result['v']})
+
+    schools = valid_schools[flow['schools'].get_indexer(valid_schools['배정고등학교']) >= 0]
+    per_school, per_cluster = stability_tables(
+        schools['배정고등학교'].to_numpy(), schools['군집_Label'].to_numpy(),
+        schools['분석_학교유형'].to_numpy(), result['co_assigned'], n_reps,
+    )
+    # 학교별 특성(경쟁률/만족도) 구간도 함께 제공
+    bounds = {}
+    for name, key in (('실질경쟁률', 'competition'), ('배정만족도(%)', 'satisfaction')):
+        low, high = interval(result[key])
+        bounds[f'{name}_CI하한'], bounds[f'{name}_CI상한'] = low, high
+    bounds = pd.DataFrame(bounds, index=schools['배정고등학교'].to_numpy()).round(3)
+    per_school = per_school.join(bounds, on='배정고등학교')
+
+    return {
+        '4_부트스트랩_신뢰구간': ci,
+        '5_학교별_군집안정성': per_school,
+        '5_군집별_안정성': per_cluster,
+    }
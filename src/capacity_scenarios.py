@@ -0,0 +1,420 @@
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import json
+import os
+from artifact_store import STORE_DIR, save_step, export_excel
+from lottery_simulator import (load_inputs, build_model, lottery_round, random_fill, batch_size,
+                               rank_probabilities, prob_col, SIM_REPLICATES, SIM_SEED)
+from parallel_batches import batch_tasks, run_batches
+from instrumentation import instrument, add_instrumentation_args
+
+# ==========================================
+# [설정] 정원 / 학군 변경 시나리오 (What-if, 증분 재시뮬레이션)
+# ==========================================
+# 추첨 배정 시뮬레이션(lottery_simulator)의 기준 모델에 시나리오 변경을 적용해 배정만족도 / 동네별 1지망 성공률 변화를 봅니다.
+#   - 정원 변경: {학교: 증감 인원}  (예: '타고등학교=+30', 폐교는 현재 정원만큼 음수)
+#   - 학군 조정: {행정동: [학교들]}  (해당 동네 학생은 그 학교에 지원할 수 없음 -> 그 지망은 빈 지망)
+# 증분 재시뮬레이션: 기준 모델과 같은 시드(같은 묶음 / 같은 추첨 번호)로 라운드를 진행하면서,
+#   기준과 남은 정원이 달라진 학교 + 배정 상태가 달라진 학생이 지원한 학교만 다시 추첨하고,
+#   나머지 학교의 선발 결과는 기준 라운드 결과를 그대로 씁니다. (결과는 전체 재시뮬레이션과 같음)
+# 시나리오 결과는 '기준 모델 + 시나리오 + 반복 수 + 시드'의 해시를 키로 SCENARIO_DIR에 저장해 다시 계산하지 않습니다.
+SCENARIO_DIR = os.path.join(STORE_DIR, "_scenarios")
+STEP_NAME = "scenarios"
+OUTPUT_FILE = os.path.join("data", "processed", "Step5_정원_시나리오.xlsx") # 엑셀 내보내기(--excel) 시
+
+SCENARIOS_PER_PASS = 16          # 한 번에 같이 진행하는 시나리오 수 (시나리오마다 묶음 크기의 배정 상태 배열 유지)
+MIN_DONG_STUDENTS = 5            # 동네별 표: 거주 학생이 이보다 적은 동네는 제외 (연구2와 같은 기준)
+BASELINE_NAME = "기준"
+# ==========================================
+
+# ---------------------------------------------------------
+# 시나리오 정의
+# ---------------------------------------------------------
+def make_scenario(name, capacity=None, exclude=None):
+    """시나리오 dict: {'name', 'capacity': {학교: 증감 인원}, 'exclude': {행정동: [학교들]}}"""
+    return {
+        'name': str(name),
+        'capacity': {str(k): int(v) for k, v in (capacity or {}).items()},
+        'exclude': {str(k): sorted({str(s) for s in ([v] if isinstance(v, str) else v)}) for k, v in (exclude or {}).items()},
+    }
+
+def parse_pairs(items):
+    """['이름=값', ...] -> [(이름, 값)] (형식이 틀리면 ValueError)"""
+    pairs = []
+    for item in items or []:
+        key, sep, value = item.rpartition("=")
+        if not sep or not key.strip() or not value.strip():
+            raise ValueError(f"'이름=값' 형식이 아닙니다: {item}")
+        pairs.append((key.strip(), value.strip()))
+    return pairs
+
+def sweep_scenarios(school, start, stop, step):
+    """한 학교의 정원 증감을 start..stop(포함)까지 step 간격으로 바꾼 시나리오 목록 (0은 기준이므로 제외)"""
+    if step == 0:
+        raise ValueError("--sweep 간격은 0이 될 수 없습니다.")
+    deltas = range(start, stop + (1 if step > 0 else -1), step)
+    return [make_scenario(f"{school} {d:+d}", capacity={school: d}) for d in deltas if d != 0]
+
+def load_scenarios(path):
+    """JSON 파일([{'name', 'capacity', 'exclude'}, ...]) -> 시나리오 목록"""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [make_scenario(e.get('name', f"시나리오{i + 1}"), e.get('capacity'), e.get('exclude'))
+            for i, e in enumerate(entries)]
+
+def describe(scenario):
+    """시나리오 -> 변경 내용 한 줄 (예: '타고등학교 +30, 동구동: 타고등학교 제외')"""
+    parts = [f"{school} {delta:+d}" for school, delta in scenario['capacity'].items()]
+    parts += [f"{dong}: {', '.join(schools)} 제외" for dong, schools in scenario['exclude'].items()]
+    return ", ".join(parts) or "변경 없음"
+
+def apply_scenario(model, students, scenario):
+    """
+    기준 모델 + 시나리오 -> 변형 {'capacity', 'choices', 'moved'} (없는 학교 / 동네 이름이면 None)
+    moved: 지망이 바뀐 학생 (학군 조정 대상) -> 첫 라운드부터 다시 추첨
+    """
+    schools = list(model['schools'])
+    unknown = [s for s in list(scenario['capacity']) + [s for v in scenario['exclude'].values() for s in v] if s not in schools]
+    if unknown:
+        print(f"❌ 시나리오 '{scenario['name']}': 없는 학교입니다: {', '.join(sorted(set(unknown)))}")
+        return None
+
+    capacity = model['capacity'].copy()
+    for school, delta in scenario['capacity'].items():
+        code = schools.index(school)
+        capacity[code] = max(0, capacity[code] + delta)
+
+    choices = model['choices'].copy()
+    if scenario['exclude']:
+        if model['dong'] is None:
+            print(f"❌ 시나리오 '{scenario['name']}': 행정동 컬럼이 없어 학군 조정을 적용할 수 없습니다.")
+            return None
+        dong = students[model['dong']].astype(str).to_numpy()
+        missing = [d for d in scenario['exclude'] if not (dong == d).any()]
+        if missing:
+            print(f"❌ 시나리오 '{scenario['name']}': 없는 행정동입니다: {', '.join(missing)}")
+            return None
+        for d, excluded in scenario['exclude'].items():
+            codes = [schools.index(s) for s in excluded]
+            rows = dong == d
+            choices[rows] = np.where(np.isin(choices[rows], codes), -1, choices[rows])
+    return {'capacity': capacity, 'choices': choices, 'moved': (choices != model['choices']).any(axis=1)}
+
+# ---------------------------------------------------------
+# 결과 캐시 (기준 모델 + 시나리오 해시 -> 시뮬레이션 결과)
+# ---------------------------------------------------------
+def model_key(model, n_reps, seed):
+    """기준 모델(학교 사전, 지망 코드, 정원) + 반복 수 + 시드의 SHA-256"""
+    h = hashlib.sha256()
+    h.update(json.dumps([list(map(str, model['schools'])), model['columns'], n_reps, seed], ensure_ascii=False).encode())
+    h.update(np.ascontiguousarray(model['choices']).tobytes())
+    h.update(np.ascontiguousarray(model['capacity']).tobytes())
+    return h.hexdigest()
+
+def scenario_key(base_key, scenario):
+    """같은 변경이면 이름이 달라도 같은 키 (변경 내용만 해시)"""
+    body = json.dumps([scenario['capacity'], scenario['exclude']], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(f"{base_key}|{body}".encode()).hexdigest()[:16]
+
+def _cache_path(key):
+    return os.path.join(SCENARIO_DIR, f"{key}.npz")
+
+def load_cached(key):
+    """저장된 결과 {'student', 'school', 'n_reps', 'recomputed'} (없거나 읽기 실패 시 None)"""
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            return {'student': data['student'], 'school': data['school'],
+                    'n_reps': int(data['n_reps']), 'recomputed': float(data['recomputed'])}
+    except Exception as e:
+        print(f"⚠ 시나리오 캐시 읽기 실패 → 다시 계산합니다: {e}")
+        return None
+
+def save_cached(key, result):
+    os.makedirs(SCENARIO_DIR, exist_ok=True)
+    np.savez(_cache_path(key), student=result['student'], school=result['school'],
+             n_reps=result['n_reps'], recomputed=result['recomputed'])
+
+# ---------------------------------------------------------
+# 증분 재시뮬레이션 (프로세스 풀)
+# ---------------------------------------------------------
+_worker = {}
+
+def _init_worker(model, variants):
+    _worker['model'] = model
+    _worker['variants'] = variants
+
+def _new_state(capacity, n_reps, n, n_cols):
+    return {
+        'assigned': np.zeros((n_reps, n), dtype=bool),
+        'remaining': np.tile(capacity, (n_reps, 1)),
+        'student_hits': np.zeros((n, n_cols), dtype=np.int64),
+        'school_hits': np.zeros((len(capacity), n_cols), dtype=np.int64),
+        'work': 0,
+    }
+
+def _record(state, c, choice, admitted):
+    """라운드 선발 결과(admitted [반복 x 학생]) -> 배정 상태 / 지망 컬럼별 배정 횟수 갱신"""
+    hits = admitted.sum(axis=0)
+    listed = choice >= 0
+    state['assigned'] |= admitted
+    state['student_hits'][:, c] = hits
+    state['school_hits'][:, c] = np.bincount(choice[listed], weights=hits[listed],
+                                             minlength=len(state['school_hits'])).astype(np.int64)
+
+def sweep_batch(model, variants, seed, n_reps):
+    """
+    기준 + 변형들을 같은 추첨 번호로 함께 진행 -> (기준 합계, [변형 합계]) (합계 = simulate_batch와 같은 4개 + 재추첨 지원 건수)
+    변형의 라운드마다 다시 추첨하는 학교: 기준과 남은 정원이 다른 학교 + 기준과 배정 상태 / 지망이 다른 학생이 (기준 또는 변형에서) 지원한 학교
+    그 밖의 학교는 지원자와 남은 정원이 기준과 같으므로 기준 선발 결과를 복사합니다.
+    """
+    rng = np.random.default_rng(seed)
+    n, n_cols = model['n'], len(model['columns'])
+    base = _new_state(model['capacity'], n_reps, n, n_cols)
+    states = [_new_state(v['capacity'], n_reps, n, n_cols) for v in variants]
+
+    for c in range(n_cols):
+        school = model['choices'][:, c]
+        priority = rng.random((n_reps, n))   # 기준 / 변형 공통 추첨 번호
+
+        # 라운드 전 상태로 다시 추첨할 학교 / 학생을 정함
+        plans = []
+        for v, state in zip(variants, states):
+            choice = v['choices'][:, c]
+            dirty = v['moved'] | (state['assigned'] != base['assigned']).any(axis=0)
+            touched = (state['remaining'] != base['remaining']).any(axis=0)
+            touched[choice[dirty & (choice >= 0)]] = True
+            touched[school[dirty & (school >= 0)]] = True
+            redo = (choice >= 0) & touched[np.maximum(choice, 0)]
+            plans.append((choice, touched, redo, ~redo & ~dirty))
+
+        base['work'] += int((~base['assigned'] & (school >= 0)[None, :]).sum())
+        admitted = np.zeros((n_reps, n), dtype=bool)
+        admitted[lottery_round(school, priority, base['assigned'], base['remaining'])] = True
+        _record(base, c, school, admitted)
+
+        for state, (choice, touched, redo, copy) in zip(states, plans):
+            state['work'] += int((~state['assigned'][:, redo]).sum())
+            idx = np.flatnonzero(redo)   # 다시 추첨하는 지원자만 잘라서 추첨
+            rep, k = lottery_round(choice[idx], priority[:, idx], state['assigned'][:, idx], state['remaining'])
+            mine = np.zeros((n_reps, n), dtype=bool)
+            mine[rep, idx[k]] = True
+            mine[:, copy] = admitted[:, copy]
+            state['remaining'][:, ~touched] = base['remaining'][:, ~touched]
+            _record(state, c, choice, mine)
+
+    totals = []
+    for state in [base] + states:
+        student_random, school_random = random_fill(state['assigned'], state['remaining'])
+        totals.append((state['student_hits'], student_random, state['school_hits'], school_random, state['work']))
+    return totals[0], totals[1:]
+
+def _sweep_batch(task):
+    seed, n_reps = task
+    return sweep_batch(_worker['model'], _worker['variants'], seed, n_reps)
+
+def _combine(batches, n_reps):
+    """묶음 합계들 -> simulate()와 같은 형태의 결과 (+ 재추첨 지원 건수)"""
+    return {
+        'student': np.column_stack([sum(b[0] for b in batches), sum(b[1] for b in batches)]) / n_reps,
+        'school': np.column_stack([sum(b[2] for b in batches), sum(b[3] for b in batches)]) / n_reps,
+        'n_reps': n_reps,
+        'work': sum(b[4] for b in batches),
+    }
+
+@instrument()
+def simulate_variants(model, variants, n_reps=SIM_REPLICATES, workers=None, seed=SIM_SEED):
+    """
+    기준 + 변형들을 증분 재시뮬레이션 -> (기준 결과, [변형 결과])
+    변형 결과의 'recomputed': 기준 대비 다시 추첨한 지원 건수 비율
+    """
+    tasks = batch_tasks(n_reps, batch_size(model['n']), seed)   # lottery_simulator.simulate와 같은 묶음 / 시드
+    baseline, results = None, []
+    for start in range(0, max(len(variants), 1), SCENARIOS_PER_PASS):   # 변형이 없으면 기준만
+        group = variants[start:start + SCENARIOS_PER_PASS]
+        batches = run_batches(_sweep_batch, tasks, workers, _init_worker, (model, group),
+                              label=f"기준 + 시나리오 {len(group)}개")
+        baseline = _combine([b[0] for b in batches], n_reps)
+        for i in range(len(group)):
+            result = _combine([b[1][i] for b in batches], n_reps)
+            result['recomputed'] = result['work'] / max(baseline['work'], 1)
+            results.append(result)
+    return baseline, results
+
+# ---------------------------------------------------------
+# 지표 (배정만족도 / 동네별 1지망 성공률)
+# ---------------------------------------------------------
+def school_metrics(model, result, capacity):
+    """학교별 정원, 기대 배정 인원, 기대 1지망 배정 인원, 배정만족도(%) (= 1지망 배정 / 배정 인원, 연구1과 같은 정의)"""
+    first = result['school'][:, :-1][:, model['ranks'] == 1].sum(axis=1)
+    total = result['school'].sum(axis=1)
+    table = pd.DataFrame({
+        '정원': capacity,
+        '기대_배정인원': total,
+        '기대_1지망_배정인원': first,
+        '배정만족도(%)': np.divide(first, total, out=np.full(len(total), np.nan), where=total > 0) * 100,
+    }, index=pd.Index(model['schools'], name='배정고등학교'))
+    return table
+
+def dong_metrics(model, result, students):
+    """동네별 거주학생수 + 1지망 성공률(%) (= 학생별 1지망 배정 확률의 평균)"""
+    if model['dong'] is None:
+        return None
+    first = rank_probabilities(model, result)[prob_col(1)].to_numpy()
+    frame = pd.DataFrame({'행정동': students[model['dong']].astype(str).to_numpy(), '1지망_성공률(%)': first})
+    grouped = frame.groupby('행정동')['1지망_성공률(%)']
+    table = pd.DataFrame({'거주학생수': grouped.size(), '1지망_성공률(%)': grouped.mean()})
+    return table[table['거주학생수'] >= MIN_DONG_STUDENTS]
+
+def compare(base, scenario, key_cols, value_col, name):
+    """기준 / 시나리오 지표 -> 값이 달라진 행만 (기준, 시나리오, 증감)"""
+    delta = (scenario[value_col] - base[value_col]).round(2)
+    changed = (delta != 0) | (scenario[key_cols].round(1) != base[key_cols].round(1)).any(axis=1)
+    table = scenario.loc[changed, key_cols].round(1)
+    table[f"기준_{value_col}"] = base.loc[changed, value_col].round(1)
+    table[f"시나리오_{value_col}"] = scenario.loc[changed, value_col].round(1)
+    table['증감(%p)'] = delta[changed]
+    table = table.reset_index()
+    table.insert(0, '시나리오', name)
+    return table
+
+@instrument()
+def scenario_frames(model, students, scenarios, variants, baseline, results):
+    """시나리오별 결과 -> 산출물 {시트명: DataFrame} (학교 / 동네 표는 값이 달라진 행만)"""
+    base_school = school_metrics(model, baseline, model['capacity'])
+    base_dong = dong_metrics(model, baseline, students)
+    first = prob_col(1)
+    summary = [{'시나리오': BASELINE_NAME, '변경_내용': "-", '재추첨_비율(%)': 100.0,
+                '영향_학교수': 0, '영향_동네수': 0,
+                first: round(rank_probabilities(model, baseline)[first].mean(), 2), '증감(%p)': 0.0, '캐시': "-"}]
+    schools, dongs = [], []
+    for scenario, variant, result in zip(scenarios, variants, results):
+        school = compare(base_school, school_metrics(model, result, variant['capacity']),
+                         ['정원', '기대_배정인원', '기대_1지망_배정인원'], '배정만족도(%)', scenario['name'])
+        schools.append(school)
+        dong = None
+        if base_dong is not None:
+            dong = compare(base_dong, dong_metrics(model, result, students), ['거주학생수'], '1지망_성공률(%)', scenario['name'])
+            dongs.append(dong)
+        mean = rank_probabilities(model, result)[first].mean()
+        summary.append({
+            '시나리오': scenario['name'], '변경_내용': describe(scenario),
+            '재추첨_비율(%)': round(result['recomputed'] * 100, 1),
+            '영향_학교수': len(school), '영향_동네수': 0 if dong is None else len(dong),
+            first: round(mean, 2), '증감(%p)': round(mean - summary[0][first], 2),
+            '캐시': "재사용" if result.get('cached') else "계산",
+        })
+
+    frames = {'0_시나리오_요약': pd.DataFrame(summary)}
+    frames['1_학교별_배정만족도_변화'] = pd.concat(schools, ignore_index=True) if schools else pd.DataFrame()
+    if base_dong is not None:
+        frames['2_동네별_1지망성공률_변화'] = pd.concat(dongs, ignore_index=True) if dongs else pd.DataFrame()
+    return frames
+
+# ---------------------------------------------------------
+# 실행
+# ---------------------------------------------------------
+def run_variants(model, students, scenarios, n_reps, workers, seed, use_cache=True):
+    """
+    시나리오 목록 -> (변형 목록, 기준 결과, 시나리오 결과 목록) / 잘못된 시나리오가 있으면 None
+    캐시에 있는 시나리오는 다시 계산하지 않고, 없는 시나리오만 묶어서 증분 재시뮬레이션합니다.
+    """
+    variants = [apply_scenario(model, students, s) for s in scenarios]
+    if any(v is None for v in variants):
+        return None
+    base_key = model_key(model, n_reps, seed)
+    keys = [scenario_key(base_key, s) for s in scenarios]
+    baseline_key = scenario_key(base_key, make_scenario(BASELINE_NAME))
+
+    baseline = load_cached(baseline_key) if use_cache else None
+    found = {}   # 변경 내용 키 -> 결과 (같은 변경을 다른 이름으로 준 시나리오는 한 번만 계산)
+    for key in dict.fromkeys(keys):
+        cached = load_cached(key) if use_cache else None
+        if cached is not None:
+            found[key] = {**cached, 'cached': True}
+    todo = [keys.index(key) for key in dict.fromkeys(keys) if key not in found]   # 키별 첫 시나리오
+    print(f"   - 시나리오 {len(scenarios)}개: 캐시 재사용 {sum(k in found for k in keys)}개, 계산 {len(todo)}개")
+
+    if todo or baseline is None:
+        baseline, fresh = simulate_variants(model, [variants[i] for i in todo], n_reps, workers, seed)
+        save_cached(baseline_key, {**baseline, 'recomputed': 1.0})
+        for i, result in zip(todo, fresh):
+            save_cached(keys[i], result)
+            found[keys[i]] = result
+    # 같은 키의 두 번째 이후 시나리오는 첫 시나리오 결과를 재사용
+    first = {key: keys.index(key) for key in found}
+    results = [found[key] if first[key] == i else {**found[key], 'cached': True} for i, key in enumerate(keys)]
+    return variants, baseline, results
+
+@instrument()
+def run_scenarios(scenarios, n_reps=SIM_REPLICATES, workers=None, seed=SIM_SEED, excel=False, use_cache=True):
+    print("🧪 [Capacity Scenarios] 정원 / 학군 변경 시나리오 증분 재시뮬레이션을 시작합니다.")
+    if not scenarios:
+        print("❌ 시나리오가 없습니다. (--seats / --exclude / --sweep / --scenarios 중 하나 이상 필요)")
+        return None
+    inputs = load_inputs()
+    if inputs is None:
+        return None
+    df, schema, df_school = inputs
+
+    model, students = build_model(df, schema, df_school)
+    if model is None:
+        return None
+    outcome = run_variants(model, students, scenarios, n_reps, workers, seed, use_cache)
+    if outcome is None:
+        return None
+    variants, baseline, results = outcome
+
+    frames = scenario_frames(model, students, scenarios, variants, baseline, results)
+    save_step(STEP_NAME, frames)
+    if excel:
+        export_excel(frames, OUTPUT_FILE)
+    print(frames['0_시나리오_요약'].to_string(index=False))
+    print(f"\n✅ 시나리오 분석 완료! 결과 저장소: {STEP_NAME}")
+    return frames
+
+def scenarios_from_args(args):
+    """실행 인자 -> 시나리오 목록 (--seats / --exclude는 한 시나리오로 묶음)"""
+    scenarios = []
+    seats = [(school, int(value)) for school, value in parse_pairs(args.seats)]
+    exclude = {}
+    for dong, school in parse_pairs(args.exclude):
+        exclude.setdefault(dong, []).append(school)
+    if seats or exclude:
+        scenarios.append(make_scenario(args.name, dict(seats), exclude))
+    if args.sweep:
+        school, start, stop, step = args.sweep
+        scenarios += sweep_scenarios(school, int(start), int(stop), int(step))
+    if args.scenarios:
+        scenarios += load_scenarios(args.scenarios)
+    return scenarios
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="정원 / 학군 변경 시나리오 (배정만족도 / 동네별 1지망 성공률 변화, 증분 재시뮬레이션)")
+    parser.add_argument("--seats", nargs="+", metavar="학교=증감", help="정원 증감 (예: 타고등학교=+30)")
+    parser.add_argument("--exclude", nargs="+", metavar="행정동=학교", help="학군 조정: 해당 동네 학생의 지원 불가 학교")
+    parser.add_argument("--name", default="시나리오", help="--seats / --exclude 시나리오 이름")
+    parser.add_argument("--sweep", nargs=4, metavar=("학교", "시작", "끝", "간격"), help="한 학교의 정원 증감 범위 탐색")
+    parser.add_argument("--scenarios", metavar="JSON", help="시나리오 목록 파일 ([{name, capacity, exclude}, ...])")
+    parser.add_argument("--reps", type=int, default=SIM_REPLICATES, help="반복 수")
+    parser.add_argument("--workers", type=int, help="프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--seed", type=int, default=SIM_SEED, help="난수 시드")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="저장된 시나리오 결과를 쓰지 않고 다시 계산")
+    parser.add_argument("--excel", action="store_true", help="결과를 엑셀로 내보내기")
+    return add_instrumentation_args(parser)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        scenarios = scenarios_from_args(args)
+    except (ValueError, OSError, json.JSONDecodeError) as e:
+        print(f"❌ 시나리오 인자 오류: {e}")
+        return None
+    return run_scenarios(scenarios, args.reps, args.workers, args.seed, args.excel, args.use_cache)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+# ==========================================
+# [설정] 통합 실행 명령 (빠른 시작)
+# ==========================================
+# 명령마다 필요한 모듈만 실행 시점에 가져옵니다. (pandas / sklearn / scipy / matplotlib 등은 이 파일에서 가져오지 않음)
+# 여러 명령을 한 번에 주면 한 프로세스에서 순서대로 실행하므로, 무거운 라이브러리는 프로세스당 한 번만 로드됩니다.
+#   python src/cli.py mask research stats advanced plots dashboard
+#   python src/cli.py all [--excel --bootstrap ...]     # 파이프라인(한 프로세스, 메모리 연결)
+#   python src/cli.py check-imports                     # 명령별 가져오기 시간 예산 검사
+# 명령 -> (모듈, 실행 함수, 설명). 각 Step의 옵션(--excel, --workers 등)은 해당 모듈이 실행 인자에서 직접 읽습니다.
+# (ARGV_COMMANDS는 명령 이름을 뺀 나머지 인자를 main(argv)로 받음)
+COMMANDS = {
+    'mask': ('pii_masking', 'run_process', "전처리 및 익명화 (Step1)"),
+    'research': ('research_analytics', 'run_research', "지망 선호도 및 지역 흐름 (Step2)"),
+    'stats': ('school_typology', 'run_typology', "학교 유형화 및 통계 검증 (Step3 + 신뢰도 상세)"),
+    'advanced': ('advanced_analytics_engine', 'main', "고급 분석 엔진 (Step4)"),
+    'gender': ('gender_analytics', 'run_gender_analysis', "성별 분석"),
+    'plots': ('advanced_visualization', 'visualize_results', "Step4 그래프"),
+    'dashboard': ('final_dashboard_generator', 'generate_html_dashboard', "HTML 대시보드"),
+    'years': ('multi_year', 'main', "연도별 원본 일괄 실행 + 연도별 추이"),
+    'lottery': ('lottery_simulator', 'main', "추첨 배정 시뮬레이션 (배정 확률)"),
+    'scenarios': ('capacity_scenarios', 'main', "정원 / 학군 변경 시나리오 (증분 재시뮬레이션)"),
+    'serve': ('query_service', 'main', "Step2 / Step4 결과 로컬 조회 서비스 (HTTP / JSON)"),
+}
+# argparse로 자기 인자를 읽는 명령: 명령 이름 뒤의 나머지 인자를 main(argv)에 그대로 넘김 (모르는 인자는 오류)
+ARGV_COMMANDS = ['years', 'lottery', 'scenarios', 'serve']
+PIPELINE_COMMAND = 'all'            # pipeline.py의 실행 인자를 그대로 사용
+CHECK_COMMAND = 'check-imports'
+
+# 가져오기 시간 예산 (초, 새 프로세스에서 모듈 import만 측정). 'cli'는 이 파일 자체
+IMPORT_BUDGET_SEC = {
+    'cli': 0.2,
+    'mask': 1.0, 'research': 1.0, 'stats': 2.5, 'advanced': 2.5,
+    'gender': 1.0, 'plots': 1.0, 'dashboard': 0.8, 'years': 3.0, 'lottery': 1.5, 'scenarios': 1.5, 'serve': 1.0, 'all': 3.0,
+}
+HEAVY_MODULES = ['pandas', 'numpy', 'scipy', 'sklearn', 'statsmodels', 'matplotlib', 'seaborn', 'pyarrow']
+# ==========================================
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_command(name):
+    """명령 -> 실행 함수 (이때 처음으로 해당 모듈과 무거운 라이브러리를 가져옴)"""
+    module_name, func_name, _ = COMMANDS[name]
+    return getattr(importlib.import_module(module_name), func_name)
+
+def command_module(name):
+    return 'pipeline' if name == PIPELINE_COMMAND else COMMANDS[name][0]
+
+# ---------------------------------------------------------
+# 가져오기 시간 예산 검사
+# ---------------------------------------------------------
+def measure_import(module_name):
+    """새 프로세스에서 모듈 import 시간(초)과 함께 로드된 무거운 라이브러리 목록을 잽니다."""
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        f"import {module_name}; "
+        "elapsed = time.perf_counter() - t; "
+        f"print(elapsed, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules), sep='|')"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else module_name)
+    seconds, heavy = out.stdout.strip().splitlines()[-1].split('|')
+    return float(seconds), [m for m in heavy.split(',') if m]
+
+def check_imports(names=None):
+    """
+    명령별 import 시간을 예산과 비교합니다. (초과하거나 cli 자체가 무거운 라이브러리를 가져오면 False)
+    가장 오래 걸리는 라이브러리는 python -X importtime -c "import <모듈>" 로 확인할 수 있습니다.
+    """
+    names = names or ['cli'] + list(COMMANDS) + [PIPELINE_COMMAND]
+    print(f"⏱ 명령별 가져오기 시간 검사 (Python {sys.version.split()[0]})")
+    ok = True
+    for name in names:
+        module_name = 'cli' if name == 'cli' else command_module(name)
+        try:
+            seconds, heavy = measure_import(module_name)
+        except RuntimeError as e:
+            print(f"   ❌ {name:<10} 가져오기 실패: {e}")
+            ok = False
+            continue
+        budget = IMPORT_BUDGET_SEC.get(name)
+        over = budget is not None and seconds > budget
+        leaked = name == 'cli' and heavy
+        mark = "❌" if over or leaked else "✔"
+        print(f"   {mark} {name:<10} {seconds:6.3f}s / 예산 {budget}s  [{module_name}] {', '.join(heavy) or '-'}")
+        if leaked:
+            print(f"      -> cli.py는 무거운 라이브러리를 가져오면 안 됩니다: {', '.join(heavy)}")
+        ok &= not (over or leaked)
+    print("✅ 모든 명령이 예산 안에 있습니다." if ok else "⚠ 예산을 넘은 명령이 있습니다.")
+    return ok
+
+# ---------------------------------------------------------
+# 실행
+# ---------------------------------------------------------
+def build_parser():
+    lines = [f"  {name:<10} {desc}" for name, (_, _, desc) in COMMANDS.items()]
+    lines.append(f"  {PIPELINE_COMMAND:<10} 전체 파이프라인 (옵션은 python src/pipeline.py --help 참고)")
+    lines.append(f"  {CHECK_COMMAND:<10} 명령별 가져오기 시간 예산 검사")
+    parser = argparse.ArgumentParser(
+        description="고교 배정 분석 통합 실행 (명령 여러 개는 한 프로세스에서 순서대로 실행)",
+        epilog="명령:\n" + "\n".join(lines), formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("commands", nargs="+", metavar="명령",
+                        choices=list(COMMANDS) + [PIPELINE_COMMAND, CHECK_COMMAND])
+    parser.add_argument("--timing", action="store_true", help="명령별 가져오기 / 실행 시간 출력")
+    return parser
+
+def run_commands(names, rest=(), timing=False):
+    for name in names:
+        started = time.perf_counter()
+        run = load_command(name)
+        loaded = time.perf_counter()
+        if name in ARGV_COMMANDS:
+            run(list(rest))
+        else:
+            run()
+        if timing:
+            print(f"⏱ [{name}] 가져오기 {loaded - started:.2f}s, 실행 {time.perf_counter() - loaded:.2f}s")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # 명령 이름 뒤의 나머지 옵션(--excel, --workers 등)은 각 Step 모듈이 직접 읽도록 남겨 둠
+    args, rest = build_parser().parse_known_args(argv)
+
+    if CHECK_COMMAND in args.commands:
+        return 0 if check_imports() else 1
+    if PIPELINE_COMMAND in args.commands:
+        if len(args.commands) > 1:
+            print(f"❌ '{PIPELINE_COMMAND}'는 다른 명령과 함께 쓸 수 없습니다.")
+            return 2
+        pipeline = importlib.import_module('pipeline')
+        pipeline.main(rest)
+        return 0
+    run_commands(args.commands, rest, args.timing)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import pandas as pd
+import numpy as np
+from assignment_classifier import CHOICE_PATTERN, shares_categories
+
+# ==========================================
+# [설정] 정수 코드화(Categorical) 학생 테이블
+# ==========================================
+# 학교 / 동네 / 자치구 / 성별 문자열을 수집 단계에서 한 번만 정렬된 코드 사전으로 만들고,
+# 해당 컬럼을 같은 사전을 공유하는 pandas Categorical로 바꿉니다.
+#   - 배정학교와 모든 지망 컬럼은 같은 '학교' 사전을 사용 → 코드끼리 바로 비교 가능
+#   - 이후 Step의 groupby / crosstab / 빈도 집계는 문자열 대신 정수 코드로 계산
+# 사전은 '이름 가나다순'이므로 코드 순서 = 기존 문자열 정렬 순서 (보고서 순서 변화 없음)
+DICTIONARY_FRAME = "코드사전"   # Step1 저장소에 함께 기록되는 (사전, 코드, 이름) 표
+
+SCHOOL_DICT = "학교"
+DONG_DICT = "동네"
+DISTRICT_DICT = "자치구"
+GENDER_DICT = "성별"
+
+# 사전별 대상 컬럼 키워드 (학교 사전은 배정 컬럼 + 지망 컬럼)
+DICT_KEYWORDS = {
+    SCHOOL_DICT: "배정고등학교",
+    DONG_DICT: "행정동",
+    DISTRICT_DICT: "자치구",
+    GENDER_DICT: "성별",
+}
+# ==========================================
+
+def coded_columns(columns):
+    """컬럼 목록 -> {사전 이름: [해당 컬럼들]} (대상 컬럼이 없는 사전은 제외)"""
+    groups = {}
+    for name, keyword in DICT_KEYWORDS.items():
+        cols = [c for c in columns if keyword in str(c)]
+        if name == SCHOOL_DICT:
+            cols += [c for c in columns if CHOICE_PATTERN.search(str(c)) and c not in cols]
+        if cols:
+            groups[name] = cols
+    return groups
+
+def _sorted_categories(values):
+    """고유값(결측 제외)을 정렬된 Index로 (정렬 불가한 혼합 타입이면 등장 순서 유지)"""
+    uniques = pd.Index(pd.unique(values)).dropna()
+    try:
+        return uniques.sort_values()
+    except TypeError:
+        return uniques
+
+def build_dictionaries(df, groups=None):
+    """학생 테이블 -> {사전 이름: 정렬된 이름 Index} (Index 위치 = 정수 코드)"""
+    groups = coded_columns(df.columns) if groups is None else groups
+    dictionaries = {}
+    for name, cols in groups.items():
+        # 컬럼별 고유값을 먼저 구한 뒤 합침 (학생 수 x 컬럼 수 크기의 배열을 만들지 않음)
+        uniques = [df[c].cat.categories if isinstance(df[c].dtype, pd.CategoricalDtype) else pd.unique(df[c])
+                   for c in cols]
+        dictionaries[name] = _sorted_categories(np.concatenate([np.asarray(u, dtype=object) for u in uniques]))
+    return dictionaries
+
+def merge_dictionaries(base, extra):
+    """두 사전을 합쳐 다시 정렬합니다. (청크 단위 수집에서 사전을 누적할 때)"""
+    if base is None:
+        return extra
+    names = list(base) + [k for k in extra if k not in base]
+    return {name: _sorted_categories(np.concatenate([
+                np.asarray(base.get(name, []), dtype=object), np.asarray(extra.get(name, []), dtype=object)]))
+            for name in names}
+
+def encode(df, dictionaries=None):
+    """
+    학교/동네/자치구/성별 컬럼을 공유 사전 기반 Categorical로 바꿉니다.
+    반환: (코드화된 DataFrame(얕은 복사), 사전) / 사전에 없는 값은 결측(코드 -1)이 됩니다.
+    """
+    groups = coded_columns(df.columns)
+    if dictionaries is None:
+        dictionaries = build_dictionaries(df, groups)
+    df = df.copy(deep=False)
+    for name, cols in groups.items():
+        if name not in dictionaries:
+            continue
+        dtype = pd.CategoricalDtype(dictionaries[name])
+        for col in cols:
+            df[col] = df[col].astype(dtype)
+    return df, dictionaries
+
+def is_coded(df):
+    """대상 컬럼이 모두 Categorical이고, 같은 사전의 컬럼끼리 코드표가 같은지"""
+    return all(shares_categories(df, cols) for cols in coded_columns(df.columns).values())
+
+def ensure_coded(df):
+    """이미 코드화된 테이블은 그대로, 문자열 테이블(엑셀 등)이면 여기서 코드화합니다."""
+    if is_coded(df):
+        return df
+    print("   - 문자열 컬럼 감지 → 학교/동네 코드 사전 생성 중...")
+    return encode(df)[0]
+
+def dictionary_frame(dictionaries):
+    """사전 -> 저장용 긴 형식 표 (사전, 코드, 이름)"""
+    parts = [pd.DataFrame({'사전': name, '코드': np.arange(len(names), dtype=np.int32),
+                           '이름': np.asarray(names, dtype=object)})
+             for name, names in dictionaries.items()]
+    if not parts:
+        return pd.DataFrame(columns=['사전', '코드', '이름'])
+    return pd.concat(parts, ignore_index=True)
+
+def dictionaries_from_frame(frame):
+    """dictionary_frame 결과 -> {사전 이름: 이름 Index}"""
+    return {name: pd.Index(part.sort_values('코드')['이름'].to_numpy(dtype=object))
+            for name, part in frame.groupby('사전', sort=False)}
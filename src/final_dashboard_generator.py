@@ -1,32 +1,43 @@
 import pandas as pd
 import os
+from artifact_store import load_frame, has_frame
+from instrumentation import instrument
 
 # ==========================================
 # [설정] 분석 결과 엑셀 파일 경로
 # ==========================================
 # 앞 단계에서 생성된 엑셀 파일명과 정확히 일치해야 합니다.
 INPUT_EXCEL = os.path.join("data", "processed", "Step3_학교유형화_및_통계검증.xlsx")
+INPUT_STEP = "step3"   # 저장소에 Step3 산출물이 있으면 엑셀 대신 사용
 OUTPUT_HTML = os.path.join("output", "Insight_Dashboard_2025.html")
+REPORT_YEAR = "2025"   # 보고서 제목의 연도 (연도별 일괄 실행 시에는 입력 파일의 학년도를 사용)
+DASHBOARD_SHEETS = ['1_유형화(신뢰데이터)', '1_군집요약', '2_종속성검정_결과', '3_상관관계_결과']
 
-def generate_html_dashboard():
-    print("🎨 엑셀 기반 HTML 대시보드 생성을 시작합니다...")
-    
+@instrument()
+def load_step3():
+    """Step3 결과 시트를 {시트명: DataFrame}으로 읽습니다. (실패 시 None)"""
     # 1. 데이터 로드 (엑셀 시트별 읽기)
-    if not os.path.exists(INPUT_EXCEL):
-        print(f"❌ 오류: '{INPUT_EXCEL}' 파일이 없습니다. 통계 분석 코드를 먼저 실행해주세요.")
-        return
-
     try:
+        if has_frame(INPUT_STEP, '1_유형화(신뢰데이터)'):
+            # Step3 저장소 산출물(Parquet)을 바로 읽음
+            return {name: load_frame(INPUT_STEP, name) for name in DASHBOARD_SHEETS}
+        if not os.path.exists(INPUT_EXCEL):
+            print(f"❌ 오류: '{INPUT_EXCEL}' 파일이 없습니다. 통계 분석 코드를 먼저 실행해주세요.")
+            return None
         # 엑셀의 각 시트를 데이터프레임으로 불러옵니다.
-        df_cluster = pd.read_excel(INPUT_EXCEL, sheet_name='1_유형화(신뢰데이터)')
-        df_summary = pd.read_excel(INPUT_EXCEL, sheet_name='1_군집요약')
-        df_chi = pd.read_excel(INPUT_EXCEL, sheet_name='2_종속성검정_결과')
-        df_corr = pd.read_excel(INPUT_EXCEL, sheet_name='3_상관관계_결과')
-        print("✔ 엑셀 데이터 로드 성공!")
+        return {name: pd.read_excel(INPUT_EXCEL, sheet_name=name) for name in DASHBOARD_SHEETS}
     except Exception as e:
         print(f"❌ 데이터 로드 실패: {e}")
         print("   -> 엑셀 파일이 열려있다면 닫고 다시 실행해주세요.")
-        return
+        return None
+
+@instrument()
+def build_dashboard_html(frames, year=REPORT_YEAR):
+    """Step3 결과 {시트명: DataFrame} -> HTML 문자열 (파일 입출력 없음, year: 제목에 표시할 연도)"""
+    df_cluster = frames['1_유형화(신뢰데이터)']
+    df_summary = frames['1_군집요약']
+    df_chi = frames['2_종속성검정_결과']
+    df_corr = frames['3_상관관계_결과']
 
     # 2. 스타일 정의 (CSS)
     css_style = """
@@ -61,12 +72,12 @@ def generate_html_dashboard():
     <html>
     <head>
         <meta charset="utf-8">
-        <title>2025 후기고 배정 분석 보고서</title>
+        <title>{year} 후기고 배정 분석 보고서</title>
         {css_style}
     </head>
     <body>
         <div class="container">
-            <h1>📊 2025 후기고 배정 심층 분석 보고서</h1>
+            <h1>📊 {year} 후기고 배정 심층 분석 보고서</h1>
             
             <div class="card-container">
                 <div class="card">
@@ -113,17 +124,34 @@ def generate_html_dashboard():
             </table>
 
             <div class="footer">
-                Generated by The Code Architect | 2025 School Assignment Analysis System
+                Generated by The Code Architect | {year} School Assignment Analysis System
             </div>
         </div>
     </body>
     </html>
     """
     
-    with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
+    return html
+
+@instrument()
+def write_dashboard(html, output_html=OUTPUT_HTML):
+    """HTML 문자열을 보고서 파일로 저장합니다."""
+    os.makedirs(os.path.dirname(output_html) or ".", exist_ok=True)
+    with open(output_html, "w", encoding="utf-8") as f:
         f.write(html)
-    print(f"✅ HTML 보고서 생성 완료: {OUTPUT_HTML}")
+    print(f"✅ HTML 보고서 생성 완료: {output_html}")
     print("   -> 브라우저에서 파일을 열어 확인하세요.")
 
+@instrument()
+def generate_html_dashboard():
+    print("🎨 엑셀 기반 HTML 대시보드 생성을 시작합니다...")
+    
+    frames = load_step3()
+    if frames is None:
+        return
+    print("✔ 분석 데이터 로드 성공!")
+
+    write_dashboard(build_dashboard_html(frames))
+
 if __name__ == "__main__":
     generate_html_dashboard()
\ No newline at end of file
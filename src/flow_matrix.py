@@ -0,0 +1,218 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from artifact_store import save_frame, load_frame, has_frame
+
+# ==========================================
+# [설정] 희소(Sparse) 동네 x 학교 흐름 매트릭스
+# ==========================================
+# 대부분의 (동네, 학교) 칸은 0이므로 CSR 희소 행렬로 보관하고,
+# 엔트로피 / 상호작용 강도 / 카이제곱 / Top-k 를 희소 형태 그대로 계산합니다.
+# 흐름 매트릭스는 {'counts': CSR 행렬, 'dongs': 행 라벨, 'schools': 열 라벨} 딕셔너리입니다.
+FLOW_FRAME = "부록_동네_학교_흐름"   # 저장소에 기록되는 (동네, 학교, 인원) 긴 형식 표
+COUNT_COL = "인원"
+ENTROPY_EPS = 1e-9                  # 0 방지용 (기존 entropy(x + 1e-9)와 동일)
+# ==========================================
+
+def make_flow(counts, dongs, schools):
+    """CSR 행렬 + 라벨로 흐름 매트릭스를 만듭니다."""
+    return {
+        'counts': sparse.csr_matrix(counts, dtype=np.int64),
+        'dongs': pd.Index(dongs),
+        'schools': pd.Index(schools),
+    }
+
+def _sorted_codes(values):
+    """
+    값 -> (정수 코드, 정렬된 라벨). pd.factorize(sort=True)와 같은 결과.
+    정렬된 사전을 쓰는 Categorical(coded_table)은 코드를 재사용하고, 등장하지 않은 라벨만 뺍니다.
+    """
+    values = pd.Series(values)
+    if not isinstance(values.dtype, pd.CategoricalDtype) or not values.cat.categories.is_monotonic_increasing:
+        return pd.factorize(values, sort=True)
+    codes = values.cat.codes.to_numpy()
+    present = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+    remap = np.where(present, np.cumsum(present) - 1, -1)
+    return np.where(codes >= 0, remap[codes], -1), values.cat.categories[present]
+
+def from_records(dong_values, school_values):
+    """학생 단위 (거주 동네, 배정 학교) 기록에서 바로 흐름 매트릭스를 만듭니다."""
+    dong_codes, dongs = _sorted_codes(dong_values)
+    school_codes, schools = _sorted_codes(school_values)
+    valid = (dong_codes >= 0) & (school_codes >= 0)   # 결측 제외 (pd.crosstab과 동일)
+    counts = sparse.coo_matrix(
+        (np.ones(valid.sum(), dtype=np.int64), (dong_codes[valid], school_codes[valid])),
+        shape=(len(dongs), len(schools)),
+    ).tocsr()   # 같은 칸의 중복은 합산됨
+    dongs = pd.Index(dongs, name=getattr(dong_values, 'name', None))
+    schools = pd.Index(schools, name=getattr(school_values, 'name', None))
+    return make_flow(counts, dongs, schools)
+
+def from_dense(df_matrix):
+    """기존 엑셀 '부록_동네_학교_전체매트릭스' 형태(DataFrame)에서 변환합니다."""
+    return make_flow(sparse.csr_matrix(df_matrix.fillna(0).to_numpy(dtype=np.int64)),
+                     df_matrix.index, df_matrix.columns)
+
+def to_dense(flow):
+    """엑셀 보고용 DataFrame(행: 동네, 열: 학교)으로 펼칩니다."""
+    return pd.DataFrame(flow['counts'].toarray(), index=flow['dongs'], columns=flow['schools'])
+
+def to_long(flow):
+    """0이 아닌 칸만 (동네, 학교, 인원) 긴 형식으로 변환합니다. (라벨 전체는 범주형으로 보존)"""
+    coo = flow['counts'].tocoo()
+    dong_col = flow['dongs'].name or "행정동"
+    school_col = flow['schools'].name or "배정고등학교"
+    return pd.DataFrame({
+        dong_col: pd.Categorical.from_codes(coo.row, categories=flow['dongs']),
+        school_col: pd.Categorical.from_codes(coo.col, categories=flow['schools']),
+        COUNT_COL: coo.data,
+    })
+
+def from_long(df_long):
+    """to_long 결과(범주형 라벨 포함)에서 흐름 매트릭스를 복원합니다."""
+    dong_col, school_col = [c for c in df_long.columns if c != COUNT_COL][:2]
+    dong_cat = df_long[dong_col].astype('category')
+    school_cat = df_long[school_col].astype('category')
+    dongs = pd.Index(dong_cat.cat.categories, name=dong_col)
+    schools = pd.Index(school_cat.cat.categories, name=school_col)
+    counts = sparse.coo_matrix(
+        (df_long[COUNT_COL].to_numpy(dtype=np.int64),
+         (dong_cat.cat.codes.to_numpy(), school_cat.cat.codes.to_numpy())),
+        shape=(len(dongs), len(schools)),
+    )
+    return make_flow(counts.tocsr(), dongs, schools)
+
+def save_flow(flow, step, name=FLOW_FRAME):
+    """흐름 매트릭스를 저장소에 희소(긴 형식) 그대로 기록합니다."""
+    return save_frame(to_long(flow), step, name)
+
+def load_flow(step, name=FLOW_FRAME):
+    return from_long(load_frame(step, name))
+
+def has_flow(step, name=FLOW_FRAME):
+    return has_frame(step, name)
+
+# ---------------------------------------------------------
+# 합계 / 부분 행렬
+# ---------------------------------------------------------
+def row_totals(flow):
+    """동네별 학생 수"""
+    return pd.Series(np.asarray(flow['counts'].sum(axis=1)).ravel(), index=flow['dongs'])
+
+def col_totals(flow):
+    """학교별 배정 인원"""
+    return pd.Series(np.asarray(flow['counts'].sum(axis=0)).ravel(), index=flow['schools'])
+
+def subset(flow, dongs=None, schools=None):
+    """지정한 동네/학교만 남긴 부분 행렬 (라벨 순서는 인자 순서를 따름)"""
+    counts = flow['counts']
+    row_labels, col_labels = flow['dongs'], flow['schools']
+    if dongs is not None:
+        rows = flow['dongs'].get_indexer(dongs)
+        counts, row_labels = counts[rows], flow['dongs'][rows]
+    if schools is not None:
+        cols = flow['schools'].get_indexer(schools)
+        counts, col_labels = counts[:, cols], flow['schools'][cols]
+    return make_flow(counts, row_labels, col_labels)
+
+def drop_empty(flow):
+    """학생이 한 명도 없는 행(동네)/열(학교)을 제거합니다."""
+    rows = np.flatnonzero(row_totals(flow).to_numpy())
+    cols = np.flatnonzero(col_totals(flow).to_numpy())
+    return make_flow(flow['counts'][rows][:, cols], flow['dongs'][rows], flow['schools'][cols])
+
+def is_empty(flow):
+    return flow['counts'].shape[0] == 0 or flow['counts'].shape[1] == 0
+
+# ---------------------------------------------------------
+# 지표 계산 (희소 형태 그대로)
+# ---------------------------------------------------------
+def entropy(flow, axis=1, eps=ENTROPY_EPS):
+    """
+    행(axis=1: 동네별) 또는 열(axis=0: 학교별) 섀넌 엔트로피.
+    0인 칸은 eps로 취급하여 기존 dense 계산(entropy(x + eps))과 같은 값을 냅니다.
+    """
+    mat = flow['counts'].tocsr() if axis == 1 else flow['counts'].T.tocsr()
+    labels = flow['dongs'] if axis == 1 else flow['schools']
+    n_rows, n_cols = mat.shape
+    nnz_per_row = np.diff(mat.indptr)
+
+    totals = np.asarray(mat.sum(axis=1)).ravel() + n_cols * eps
+    row_of_nnz = np.repeat(np.arange(n_rows), nnz_per_row)
+    p = (mat.data + eps) / totals[row_of_nnz]
+    h = np.bincount(row_of_nnz, weights=-p * np.log(p), minlength=n_rows)
+
+    # 0인 칸들의 기여분: (0칸 개수) x (-q log q)
+    q = eps / totals
+    h += (n_cols - nnz_per_row) * (-q * np.log(q))
+    return pd.Series(h, index=labels)
+
+def interaction_ratio(flow, eps=1e-9):
+    """
+    공간 상호작용 강도 I_ij = T_ij / (row_i * col_j / N) (희소 행렬).
+    0인 칸은 비율도 0이므로 0이 아닌 칸만 계산합니다.
+    """
+    coo = flow['counts'].tocoo()
+    rows = np.asarray(flow['counts'].sum(axis=1)).ravel()
+    cols = np.asarray(flow['counts'].sum(axis=0)).ravel()
+    total = coo.data.sum()
+    expected = rows[coo.row] * cols[coo.col] / total
+    ratio = coo.data / (expected + eps)
+    return sparse.csr_matrix((ratio, (coo.row, coo.col)), shape=coo.shape)
+
+def chi_square(flow):
+    """
+    독립성 카이제곱 검정 + Cramér's V (희소 계산).
+    chi2 = sum(O^2 / E) - N  (0인 칸은 O^2 = 0이므로 0이 아닌 칸만 합산)
+    반환: (chi2, p-value, 자유도, Cramér's V)
+    """
+    flow = drop_empty(flow)
+    counts = flow['counts']
+    n_rows, n_cols = counts.shape
+    dof = (n_rows - 1) * (n_cols - 1)
+    if dof == 0:
+        return 0.0, 1.0, 0, 0.0
+
+    # scipy.stats는 가져오는 데 1초 가까이 걸리므로 검정이 필요할 때만 가져옴
+    from scipy.stats import chi2 as chi2_dist, chi2_contingency
+
+    n = counts.sum()
+    if dof == 1:
+        # 2x2 표는 Yates 보정을 적용하는 scipy 결과와 맞춤
+        stat, p, dof, _ = chi2_contingency(counts.toarray())
+    else:
+        coo = counts.tocoo()
+        rows = np.asarray(counts.sum(axis=1)).ravel()
+        cols = np.asarray(counts.sum(axis=0)).ravel()
+        expected = rows[coo.row] * cols[coo.col] / n
+        stat = float((coo.data.astype(float) ** 2 / expected).sum() - n)
+        p = float(chi2_dist.sf(stat, dof))
+
+    min_dim = min(n_rows, n_cols) - 1
+    cramer_v = np.sqrt(stat / (n * min_dim)) if min_dim > 0 else 0
+    return stat, p, dof, cramer_v
+
+def top_k_table(flow, k=3, row_label="행정동"):
+    """
+    동네별로 가장 많이 배정된 학교 Top-k 표.
+    동순위는 학교 열 순서가 앞선 쪽 우선, 0이 아닌 학교가 k개 미만이면 0명 학교로 채움 (nlargest와 동일).
+    """
+    csr = flow['counts'].tocsr()
+    n_cols = csr.shape[1]
+    schools = flow['schools']
+    records = []
+    for i, dong in enumerate(flow['dongs']):
+        start, end = csr.indptr[i], csr.indptr[i + 1]
+        cols, vals = csr.indices[start:end], csr.data[start:end]
+        order = np.lexsort((cols, -vals))[:k]
+        picked = list(zip(cols[order], vals[order]))
+        if len(picked) < min(k, n_cols):
+            used = set(cols)
+            picked += [(c, 0) for c in range(n_cols) if c not in used][:k - len(picked)]
+
+        row_data = {row_label: dong}
+        for rank, (col, count) in enumerate(picked, 1):
+            row_data[f"Top{rank}_학교"] = schools[col]
+            row_data[f"Top{rank}_인원"] = count
+        records.append(row_data)
+    return pd.DataFrame(records)
@@ -1,89 +1,146 @@
 import pandas as pd
 import os
+from artifact_store import load_frame, has_frame, save_step, export_excel, wants_excel_export
+from instrumentation import instrument
+from aggregate_cube import build_cube, load_cube, cube_crosstab, first_choice_table, ASSIGN_CUBE, RANK_COL
+from schema_manifest import (
+    load_schema, excel_schema, resolve_schema, field_columns, choice_columns,
+    FIELD_DONG, FIELD_DISTRICT, FIELD_ASSIGNED, FIELD_GENDER, FIELD_CHOICE,
+)
+from segment_preference import segment_preferences, rank_tag, COUNT_FORMAT
 
 # ==========================================
 # [설정]
 # ==========================================
 INPUT_FILE = os.path.join("data", "processed", "Step1_전처리_익명화_마스터.xlsx")
-OUTPUT_FILE = os.path.join("data", "processed", "Experimental_Gender_Analysis.xlsx")
+OUTPUT_FILE = os.path.join("data", "processed", "Experimental_Gender_Analysis.xlsx") # 엑셀 내보내기(--excel) 시
+INPUT_STEP = "step1"   # 저장소에 Step1 산출물이 있으면 엑셀 대신 사용
+STEP_NAME = "gender"
+MIN_DONG_STUDENTS = 5   # 성별 x 동네 만족도: (동네, 성별) 학생 수가 이보다 적으면 제외 (연구2와 같은 기준)
+GENDER_PAIRS = [('남자', '여자')]   # 격차/비율을 계산할 성별 쌍 (다른 값/결측 표기는 지원수 열만 표시)
+GENDER_LABELS = {'남자': '남', '여자': '여'}   # 격차/비율 컬럼명 표기 (기존 보고서: '선호도_격차(남-여)')
 
-def run_gender_analysis():
-    print("👫 [시나리오 2] 성별 선호도 및 배정 격차 분석을 시작합니다...")
-
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 파일 없음: {INPUT_FILE}")
-        return
+# 보안_RawData에서 읽을 컬럼 (스키마 매니페스트의 논리 필드, 배정순위는 큐브가 없을 때 재생성용)
+LOAD_FIELDS = [FIELD_DONG, FIELD_DISTRICT, FIELD_ASSIGNED, FIELD_GENDER, FIELD_CHOICE]
+LOAD_EXTRA = [RANK_COL]
 
+@instrument()
+def load_masked():
+    """Step1 마스킹 데이터(보안_RawData)를 읽습니다. (실패 시 None)"""
     try:
-        df = pd.read_excel(INPUT_FILE, sheet_name='보안_RawData')
+        if has_frame(INPUT_STEP, '보안_RawData'):
+            schema = load_schema(INPUT_STEP, '보안_RawData')   # 필요한 컬럼만 읽음
+            df = load_frame(INPUT_STEP, '보안_RawData', columns=field_columns(schema, LOAD_FIELDS, LOAD_EXTRA))
+        elif not os.path.exists(INPUT_FILE):
+            print(f"❌ 파일 없음: {INPUT_FILE}")
+            return None
+        else:
+            schema = excel_schema(INPUT_FILE, '보안_RawData')
+            df = pd.read_excel(INPUT_FILE, sheet_name='보안_RawData',
+                               usecols=field_columns(schema, LOAD_FIELDS, LOAD_EXTRA))
     except Exception as e:
         print(f"❌ 데이터 로드 실패: {e}")
-        return
+        return None
+    return df
+
+@instrument()
+def analyze_gender(df, cube=None, schema=None):
+    """
+    마스킹된 학생 DataFrame -> 성별 분석 산출물 {시트명: DataFrame} (파일 입출력 없음, 실패 시 None)
+    cube: Step1 집계 큐브 (있으면 학생 테이블은 컬럼명 확인과 자치구 집계에만 사용, 없으면 여기서 생성)
+    schema: 스키마 매니페스트 (없으면 컬럼명으로 해석)
+    """
+    df = df.copy(deep=False)  # 입력 DataFrame은 변경하지 않음 (컬럼 단위로만 교체)
 
     # 컬럼 클리닝 (공백 제거 등)
     df.columns = [c.strip() for c in df.columns]
+    if cube is None:
+        cube = build_cube(df)
+        if cube is None:
+            return None
+    assigned = cube[ASSIGN_CUBE]
     
-    # 핵심 컬럼 식별
-    col_gender = '성별'
-    col_assigned = '배정고등학교'
+    # 핵심 컬럼 식별 (매니페스트의 논리 필드 -> 실제 컬럼)
+    schema = schema or resolve_schema(df.columns)
+    col_gender = schema['fields'][FIELD_GENDER]
+    col_assigned = schema['fields'][FIELD_ASSIGNED]
+    col_dong = schema['fields'][FIELD_DONG]
+    col_district = schema['fields'][FIELD_DISTRICT]
     # 1지망 컬럼들
-    cols_1st = [c for c in df.columns if '1지망' in c]
-    col_assign_type = '분석_배정유형'
+    cols_1st = choice_columns(schema, ranks=[1]).get(1, [])
 
     print(f"   - 분석 대상 인원: {len(df)}명")
 
     # ---------------------------------------------------------
-    # 1. 성별 학교별 1지망 선호도
+    # 1. 성별 학교별 1지망 선호도 (세그먼트 선호도 엔진 - 남-여 쌍의 격차/비율, 격차 순 정렬)
     # ---------------------------------------------------------
-    gender_pref = []
-    unique_genders = df[col_gender].dropna().unique()
-    
-    for gender in unique_genders:
-        gender_df = df[df[col_gender] == gender]
-        pref_counts = pd.Series(dtype=int)
-        for col in cols_1st:
-            counts = gender_df[col].value_counts()
-            pref_counts = pref_counts.add(counts, fill_value=0)
-        
-        pref_df = pref_counts.to_frame(name=f'{gender}_1지망_지원수')
-        gender_pref.append(pref_df)
-
-    if not gender_pref:
+    pref_summary = segment_preferences(df, [col_gender], cube=cube, pairs=GENDER_PAIRS, labels=GENDER_LABELS)
+    if pref_summary is None:
         print("❌ 성별 데이터를 찾을 수 없습니다.")
-        return
-        
-    pref_summary = pd.concat(gender_pref, axis=1).fillna(0)
-    
-    # 남/녀 데이터가 모두 있을 때만 격차 계산
-    if '남자_1지망_지원수' in pref_summary.columns and '여자_1지망_지원수' in pref_summary.columns:
-        pref_summary['선호도_격차(남-여)'] = pref_summary['남자_1지망_지원수'] - pref_summary['여자_1지망_지원수']
-        pref_summary = pref_summary.sort_values('선호도_격차(남-여)', ascending=False)
+        return None
+    # 지원수 열은 기존 보고서와 같이 데이터에 처음 나온 성별 순서로 배치
+    count_cols = [COUNT_FORMAT.format(segment=g, ranks=rank_tag([1])) for g in df[col_gender].dropna().unique()]
+    count_cols = [c for c in count_cols if c in pref_summary.columns]
+    pref_summary = pref_summary[count_cols + [c for c in pref_summary.columns if c not in count_cols]]
+    pref_summary = pref_summary.rename_axis(cols_1st[0])   # 인덱스 이름은 기존 보고서와 같이 첫 1지망 컬럼명
 
     # ---------------------------------------------------------
     # 2. 성별 배정 만족도 (1지망 성공률)
     # ---------------------------------------------------------
-    satisfaction = df.groupby(col_gender).agg(
-        총인원=(col_gender, 'count'),
-        일지망_성공=(col_assign_type, lambda x: (x == '1지망 배정').sum())
-    )
+    satisfaction = first_choice_table(assigned, [col_gender], '총인원', '일지망_성공')
     satisfaction['1지망_성공률(%)'] = (satisfaction['일지망_성공'] / satisfaction['총인원'] * 100).round(1)
 
     # ---------------------------------------------------------
     # 3. 학교별 실제 배정 성비
     # ---------------------------------------------------------
-    school_gender = pd.crosstab(df[col_assigned], df[col_gender])
+    school_gender = cube_crosstab(assigned, col_assigned, col_gender)  # 배정 큐브를 학교 x 성별로 합산
     if '남자' in school_gender.columns and '여자' in school_gender.columns:
         school_gender['남초_비율(%)'] = (school_gender['남자'] / (school_gender['남자'] + school_gender['여자']) * 100).round(1)
     
     # ---------------------------------------------------------
-    # 결과 저장
+    # 결과 묶기 (저장은 호출하는 쪽에서 결정)
+    # ---------------------------------------------------------
+    frames = {
+        '1_성별_선호학교_순위': pref_summary,
+        '2_성별_배정만족도': satisfaction,
+        '3_학교별_실제성비': school_gender,
+    }
+
+    # ---------------------------------------------------------
+    # 4. 동네 x 성별 배정 만족도 (같은 큐브의 다른 조각 - 추가 스캔 없음)
     # ---------------------------------------------------------
-    with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-        pref_summary.to_excel(writer, sheet_name='1_성별_선호학교_순위')
-        satisfaction.to_excel(writer, sheet_name='2_성별_배정만족도')
-        school_gender.to_excel(writer, sheet_name='3_학교별_실제성비')
+    if col_dong in assigned.columns:
+        dong_gender = first_choice_table(assigned, [col_dong, col_gender], '거주학생수', '일지망_성공수')
+        dong_gender['1지망_성공률(%)'] = (dong_gender['일지망_성공수'] / dong_gender['거주학생수'] * 100).round(1)
+        frames['4_동네별_성별_만족도'] = dong_gender[dong_gender['거주학생수'] >= MIN_DONG_STUDENTS].reset_index()
+
+    # ---------------------------------------------------------
+    # 5. 자치구 x 성별 1지망 선호도 (자치구는 큐브 차원이 아니므로 학생 테이블을 한 번 집계)
+    # ---------------------------------------------------------
+    if col_district in df.columns:
+        district_pref = segment_preferences(df, [col_district, col_gender], compare=col_gender,
+                                            pairs=GENDER_PAIRS, labels=GENDER_LABELS)
+        if district_pref is not None:
+            frames['5_자치구별_성별_선호도'] = district_pref.reset_index()
+    return frames
+
+@instrument()
+def run_gender_analysis():
+    print("👫 [시나리오 2] 성별 선호도 및 배정 격차 분석을 시작합니다...")
+
+    df = load_masked()
+    if df is None:
+        return
+
+    frames = analyze_gender(df, cube=load_cube(INPUT_STEP))
+    if frames is None:
+        return
+
+    save_step(STEP_NAME, frames)
+    if wants_excel_export():
+        export_excel(frames, OUTPUT_FILE)
 
-    print(f"\n✅ 분석 완료! 파일 생성됨: {OUTPUT_FILE}")
+    print(f"\n✅ 분석 완료! 결과 저장소: {STEP_NAME}")
 
 if __name__ == "__main__":
     run_gender_analysis()
@@ -0,0 +1,341 @@
+import pandas as pd
+import atexit
+import cProfile
+import functools
+import inspect
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+# ==========================================
+# [설정] Step별 계측 (시간 / 메모리 / 처리 행 수)
+# ==========================================
+# @instrument 를 붙인 함수는 실행될 때마다 벽시계/CPU 시간, 최대 메모리, 입력/출력 행 수를
+# JSON Lines 파일에 한 줄씩 기록합니다. (함수 안에서 다시 계측 함수를 부르면 depth/parent로 구분)
+# 입력/출력 행 수는 주 테이블 1개 기준입니다. (행/초 계산용, 여러 시트를 반환하면 시트 행 합계는 sheet_rows에 별도 기록)
+# 실행 인자:
+#   --metrics-summary      실행 종료 시 Step별 요약표 출력
+#   --trace-memory         tracemalloc으로 파이썬 할당량도 측정 (느려짐)
+#   --profile <Step>       해당 Step만 cProfile로 프로파일링 (함수명 또는 '모듈.함수명')
+#   --no-metrics           지표 파일 기록 끄기
+METRICS_DIR = os.path.join("data", "processed", "metrics")
+METRICS_FILE = os.path.join(METRICS_DIR, "stage_metrics.jsonl")
+PROFILE_TOP_N = 25       # 프로파일 결과 출력 줄 수 (누적 시간 순)
+MB = 1024 * 1024
+# ==========================================
+
+_state = {'settings': None, 'records': [], 'run_id': uuid.uuid4().hex[:12],
+          'seq': 0, 'summary_registered': False}
+# 계측 중인 Step 스택은 스레드별로 관리 (동시에 실행되는 분석끼리 상위/하위 관계가 섞이지 않도록)
+_local = threading.local()
+_lock = threading.Lock()
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def carry_context(fn):
+    """
+    현재 스레드의 계측 위치(상위 Step)를 이어받아 실행하는 함수로 감쌉니다.
+    스레드 풀에 작업을 넘길 때 사용하면 하위 Step의 parent/depth가 호출한 Step 기준으로 기록됩니다.
+    (스레드끼리 시간/메모리는 프로세스 단위로 측정되므로 동시 실행 구간의 CPU/RSS는 겹쳐서 보입니다)
+    """
+    parent = list(_stack())
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        _local.stack = list(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.stack = []
+    return run
+
+def _argv_value(argv, flag):
+    for i, arg in enumerate(argv):
+        if arg == flag and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(flag + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+def settings(argv=None):
+    """계측 설정 (처음 사용할 때 실행 인자에서 읽고, configure()로 덮어쓸 수 있음)"""
+    if _state['settings'] is None:
+        argv = sys.argv[1:] if argv is None else argv
+        _state['settings'] = {
+            'metrics_file': None if "--no-metrics" in argv else METRICS_FILE,
+            'summary': "--metrics-summary" in argv,
+            'trace_memory': "--trace-memory" in argv,
+            'profile': _argv_value(argv, "--profile"),
+        }
+        _register_summary()
+    return _state['settings']
+
+def configure(**overrides):
+    """계측 설정 변경 (예: configure(profile='analyze_research', summary=True))"""
+    current = settings()
+    current.update({k: v for k, v in overrides.items() if v is not None})
+    _register_summary()
+    return current
+
+def _register_summary():
+    if _state['settings']['summary'] and not _state['summary_registered']:
+        atexit.register(print_summary)
+        _state['summary_registered'] = True
+
+# ---------------------------------------------------------
+# 메모리 측정
+# ---------------------------------------------------------
+def _read_hwm_mb():
+    """리눅스: 최대 RSS(VmHWM, MB) / 그 외: None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    """리눅스 최대 RSS 기록을 현재 값으로 초기화 (Step별 최대 메모리 측정용). 실패 시 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _process_peak_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+def table_rows(obj):
+    """표 1개의 행 수 (DataFrame / Series, 희소 행렬·배열은 첫 축 길이, 그 외 None)"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    shape = getattr(obj, 'shape', None)
+    return int(shape[0]) if shape else None
+
+def primary_rows(values):
+    """값 목록 중 첫 번째 DataFrame(또는 Series)의 행 수 (없으면 None)"""
+    for value in values:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return len(value)
+    return None
+
+def count_rows(obj):
+    """DataFrame / {이름: DataFrame} / 튜플·리스트 안의 DataFrame 행 수 합계 (없으면 None) - 시트 합계용"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        counts = [c for c in (count_rows(o) for o in obj) if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+# ---------------------------------------------------------
+# 계측
+# ---------------------------------------------------------
+@contextmanager
+def track(stage, rows_in=None):
+    """
+    Step 1개 구간을 계측합니다. 기록(dict)을 돌려주며, 호출 측에서 record['rows_out']를 채울 수 있습니다.
+    사용법: with track('step2', rows_in=len(df)) as record: ...
+    """
+    cfg = settings()
+    stack = _stack()
+    parent = stack[-1] if stack else None
+
+    # 상위 Step의 지금까지 최대값을 먼저 반영한 뒤 이 Step 기준으로 초기화
+    if parent is not None:
+        hwm = _read_hwm_mb()
+        if hwm is not None:
+            parent['_child_rss'] = max(parent['_child_rss'], hwm)
+        if cfg['trace_memory'] and tracemalloc.is_tracing():
+            parent['_child_traced'] = max(parent['_child_traced'], tracemalloc.get_traced_memory()[1])
+    rss_scoped = _reset_hwm()
+
+    started_tracing = False
+    if cfg['trace_memory']:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracemalloc.reset_peak()
+
+    with _lock:
+        _state['seq'] += 1
+        seq = _state['seq']
+    record = {
+        'run_id': _state['run_id'], 'seq': seq, 'stage': stage,
+        'parent': parent['stage'] if parent else None, 'depth': len(stack),
+        'started': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'rows_in': rows_in, 'rows_out': None, 'sheet_rows': None, 'status': 'ok',
+        '_child_rss': 0.0, '_child_traced': 0,
+        '_traced_start': tracemalloc.get_traced_memory()[0] if cfg['trace_memory'] else 0,
+    }
+    stack.append(record)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException:
+        record['status'] = 'error'
+        raise
+    finally:
+        record['wall_s'] = round(time.perf_counter() - wall, 4)
+        record['cpu_s'] = round(time.process_time() - cpu, 4)
+        stack.pop()
+
+        hwm = _read_hwm_mb() if rss_scoped else None
+        if hwm is not None:
+            peak = max(hwm, record['_child_rss'])
+            record['peak_rss_mb'], record['rss_scope'] = round(peak, 1), 'stage'
+        else:
+            peak = _process_peak_mb()
+            record['peak_rss_mb'], record['rss_scope'] = round(peak, 1), 'process'
+        if parent is not None:
+            parent['_child_rss'] = max(parent['_child_rss'], peak)
+
+        record['peak_traced_mb'] = None
+        if cfg['trace_memory']:
+            traced_peak = max(tracemalloc.get_traced_memory()[1], record['_child_traced'])
+            record['peak_traced_mb'] = round((traced_peak - record['_traced_start']) / MB, 2)
+            if parent is not None:
+                parent['_child_traced'] = max(parent['_child_traced'], traced_peak)
+            if started_tracing:
+                tracemalloc.stop()
+
+        rows = record['rows_out'] if record['rows_out'] is not None else record['rows_in']
+        record['rows_per_s'] = round(rows / record['wall_s'], 1) if rows and record['wall_s'] > 0 else None
+        for key in ('_child_rss', '_child_traced', '_traced_start'):
+            record.pop(key)
+        _emit(record)
+
+def _emit(record):
+    path = settings()['metrics_file']
+    with _lock:
+        _state['records'].append(record)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def _wants_profile(stage, func_name):
+    target = settings()['profile']
+    return target is not None and target in (stage, func_name)
+
+def _run_profiled(stage, func, args, kwargs):
+    """cProfile로 실행하고 누적 시간 상위 함수를 출력, .prof 파일로 저장합니다."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"profile_{stage}.prof")
+    profiler.dump_stats(path)
+    print(f"\n🔎 [{stage}] cProfile 결과 (누적 시간 상위 {PROFILE_TOP_N}개, 전체: {path})")
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return result
+
+def _select_rows(select, value):
+    """행 수 선택 함수 실행 (값이 없거나 선택 실패 시 None)"""
+    try:
+        return table_rows(select(value))
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+def _output_rows(result):
+    """기본 출력 행 수: DataFrame이면 그 행 수, 튜플/리스트면 첫 DataFrame, {시트명: DataFrame}은 None"""
+    if isinstance(result, (list, tuple)):
+        return primary_rows(result)
+    return table_rows(result) if isinstance(result, (pd.DataFrame, pd.Series)) else None
+
+def instrument(stage=None, rows_in=None, rows_out=None):
+    """
+    함수 계측 데코레이터. stage를 생략하면 '모듈.함수명'을 Step 이름으로 사용합니다.
+    입력 행 수는 첫 번째 DataFrame 인자, 출력 행 수는 반환된 DataFrame(튜플이면 첫 DataFrame)에서 셉니다.
+    주 테이블이 다르면 선택 함수로 지정합니다.
+      - rows_in: {인자명: 값} -> 표 (예: lambda a: a['flow']['counts'])
+      - rows_out: 반환값 -> 표 (예: lambda frames: frames['보안_RawData'])
+    {시트명: DataFrame}을 반환하면 시트 행 합계를 sheet_rows에 따로 기록합니다.
+    """
+    def decorator(func):
+        # 스크립트로 직접 실행되면 모듈명이 '__main__'이므로 파일명을 사용
+        module = os.path.splitext(os.path.basename(func.__code__.co_filename))[0]
+        name = stage or f"{module}.{func.__name__}"
+        signature = inspect.signature(func)
+
+        def input_rows(args, kwargs):
+            if rows_in is None:
+                return primary_rows(list(args) + list(kwargs.values()))
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return _select_rows(rows_in, bound.arguments)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(name, rows_in=input_rows(args, kwargs)) as record:
+                if _wants_profile(name, func.__name__):
+                    result = _run_profiled(name, func, args, kwargs)
+                else:
+                    result = func(*args, **kwargs)
+                if result is not None:
+                    record['rows_out'] = _output_rows(result) if rows_out is None else _select_rows(rows_out, result)
+                if isinstance(result, dict):
+                    record['sheet_rows'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def add_instrumentation_args(parser):
+    """argparse를 쓰는 스크립트에 계측 실행 인자를 추가합니다. (값은 settings()가 직접 읽음)"""
+    parser.add_argument("--metrics-summary", action="store_true", help="실행 종료 시 Step별 계측 요약표 출력")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc으로 Step별 할당량 측정 (느려짐)")
+    parser.add_argument("--profile", metavar="STEP", help="해당 Step(함수명)만 cProfile로 프로파일링")
+    parser.add_argument("--no-metrics", action="store_true", help=f"지표 파일({METRICS_FILE}) 기록 끄기")
+    return parser
+
+# ---------------------------------------------------------
+# 요약
+# ---------------------------------------------------------
+def summary_table(records=None):
+    """이번 실행의 계측 기록 -> 요약 DataFrame (실행 순서, 하위 Step은 들여쓰기)"""
+    records = _state['records'] if records is None else records
+    if not records:
+        return pd.DataFrame()
+    # 기록은 Step이 끝난 순서이므로 시작 순서(상위 Step 먼저)로 재정렬
+    df = pd.DataFrame(records).sort_values('seq')
+    return pd.DataFrame({
+        'Step': ["  " * d + s for d, s in zip(df['depth'], df['stage'])],
+        '시간(s)': df['wall_s'], 'CPU(s)': df['cpu_s'], '최대RSS(MB)': df['peak_rss_mb'],
+        '입력행': df['rows_in'], '출력행': df['rows_out'], '행/초': df['rows_per_s'],
+        '시트행합계': df['sheet_rows'],
+        '상태': df['status'],
+    }).reset_index(drop=True)
+
+def print_summary(records=None):
+    table = summary_table(records)
+    if table.empty:
+        return
+    print("\n⏱ Step별 계측 요약")
+    table['Step'] = table['Step'].str.ljust(table['Step'].str.len().max())   # 들여쓰기가 보이도록 왼쪽 정렬
+    print(table.to_string(index=False))
+    path = settings()['metrics_file']
+    if path:
+        print(f"   (전체 기록: {path})")
+
+def read_metrics(path=METRICS_FILE, run_id=None):
+    """지표 파일(JSON Lines)을 DataFrame으로 읽습니다. (run_id 지정 시 해당 실행만)"""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    df = pd.read_json(path, lines=True)
+    return df[df['run_id'] == run_id] if run_id else df
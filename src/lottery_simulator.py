@@ -0,0 +1,289 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from artifact_store import load_frame, has_frame, save_step, export_excel
+from aggregate_cube import RANK_COL
+from assignment_classifier import UNLISTED_RANK
+from coded_table import ensure_coded
+from schema_manifest import load_schema, field_columns, choice_columns, FIELD_DONG, FIELD_ASSIGNED, FIELD_CHOICE
+from parallel_batches import batch_tasks, run_batches
+from instrumentation import instrument, add_instrumentation_args
+
+# ==========================================
+# [설정] 추첨 배정 몬테카를로 시뮬레이션 (1지망 배정 확률)
+# ==========================================
+# 관측된 학생별 지망(1지망 / 2지망, 학교군별)과 학교별 정원(= 실제배정인원)으로 추첨 배정을 반복 재현합니다.
+#   - 지망 순위 순서로(같은 순위는 학교군 컬럼 순서대로) 라운드를 진행
+#   - 라운드마다 아직 배정되지 않은 지원자 중, 남은 정원보다 지원자가 많은 학교는 무작위 추첨으로 선발
+#   - 모든 지망 라운드가 끝난 뒤 남은 학생은 남은 자리에 무작위(임의) 배정
+#   - 묶음마다 [반복 수 x 학생 수] 난수를 한 번에 뽑아 모든 반복을 같이 계산하고, 묶음은 프로세스 풀로 실행
+# 같은 시드면 정원만 바꾼 시나리오도 같은 추첨 번호를 사용합니다. (시나리오 간 차이 = 정원 효과)
+# (실제 배정 규칙의 단계별 정원 비율 / 거리 조건 등은 반영하지 않은 단순화 모델)
+INPUT_STEP = "step1"            # 학생별 지망 (보안_RawData)
+CAPACITY_STEP = "step2"         # 학교별 정원 (연구1_학교별_인기도의 실제배정인원, 없으면 배정학교 인원 수)
+STEP_NAME = "lottery"
+OUTPUT_FILE = os.path.join("data", "processed", "Step5_배정확률_시뮬레이션.xlsx") # 엑셀 내보내기(--excel) 시
+
+SIM_REPLICATES = 2_000          # 기본 반복 수
+SIM_SEED = 42                   # 묶음별 난수는 이 시드에서 파생 → 프로세스 수와 무관하게 같은 결과
+BATCH_ELEMENTS = 1 << 22        # 묶음 크기 = 이 값 / 학생 수 (묶음당 난수 배열 약 32MB)
+MIN_PATTERN_STUDENTS = 5        # 지망 패턴별 표: 학생 수가 이보다 적은 패턴은 제외
+
+LOAD_FIELDS = [FIELD_DONG, FIELD_ASSIGNED, FIELD_CHOICE]
+RANDOM_LABEL = "임의"
+PROB_FORMAT = "{label}_배정확률(%)"
+# ==========================================
+
+def rank_name(rank):
+    return RANDOM_LABEL if rank == UNLISTED_RANK else f"{rank}지망"
+
+def prob_col(rank):
+    return PROB_FORMAT.format(label=rank_name(rank))
+
+# ---------------------------------------------------------
+# 모델 (학생별 지망 코드 + 학교별 정원)
+# ---------------------------------------------------------
+def capacities_from(df_school, schools):
+    """연구1 학교 통계표의 실제배정인원 -> 학교 코드 순서의 정원 배열 (없는 학교는 0)"""
+    table = df_school.set_index('배정고등학교') if '배정고등학교' in df_school.columns else df_school
+    return table['실제배정인원'].reindex(schools).fillna(0).to_numpy(dtype=np.int64)
+
+def build_model(df, schema, df_school=None):
+    """
+    학생 테이블 -> (모델, 학생 라벨 표)
+    모델: 라운드 순서의 지망 학교 코드 [학생 x 지망 컬럼], 컬럼별 순위, 학교별 정원 (프로세스 풀로 전달)
+    학생 라벨 표: 동네 / 지망 컬럼 / 관측 배정순위 (보고서 집계용, 부모 프로세스에만 유지)
+    """
+    df = ensure_coded(df)
+    col_assigned = schema['fields'][FIELD_ASSIGNED]
+    rounds = [(rank, col) for rank, cols in choice_columns(schema).items() for col in cols]
+    if col_assigned is None or not rounds:
+        print("❌ 시뮬레이션: 배정학교 / 지망 컬럼을 찾을 수 없습니다.")
+        return None, None
+
+    schools = df[col_assigned].cat.categories   # 배정 / 지망 컬럼은 같은 학교 사전
+    if df_school is not None:
+        capacity = capacities_from(df_school, schools)
+    else:
+        capacity = np.bincount(df[col_assigned].cat.codes.to_numpy()[df[col_assigned].notna().to_numpy()],
+                               minlength=len(schools)).astype(np.int64)
+
+    model = {
+        'n': len(df),
+        'schools': schools,
+        'columns': [col for _, col in rounds],
+        'ranks': np.array([rank for rank, _ in rounds], dtype=np.int16),
+        'choices': np.column_stack([df[col].cat.codes.to_numpy().astype(np.int32) for _, col in rounds]),
+        'capacity': capacity,
+        'dong': schema['fields'][FIELD_DONG] if schema['fields'][FIELD_DONG] in df.columns else None,
+    }
+    keep = [c for c in [model['dong'], RANK_COL] if c is not None and c in df.columns]
+    students = df[keep + model['columns']].reset_index(drop=True)
+    return model, students
+
+# ---------------------------------------------------------
+# 묶음 실행 (프로세스 풀)
+# ---------------------------------------------------------
+_worker = {}
+
+def _init_worker(model):
+    _worker['model'] = model
+
+def lottery_round(school, priority, assigned, remaining):
+    """
+    추첨 라운드 1개 (모든 반복을 한 번에)
+    school: 학생별 지원 학교 코드 [학생] / priority: 추첨 번호 [반복 x 학생] / assigned: 배정 여부 [반복 x 학생]
+    remaining: 남은 정원 [반복 x 학교] (제자리 갱신)
+    반환: 선발된 (반복 번호, 학생 번호) 배열
+    """
+    n_reps, n_schools = remaining.shape
+    rep, student = np.nonzero(~assigned & (school >= 0)[None, :])
+    if len(student) == 0:
+        return rep, student
+    key = rep.astype(np.int64) * n_schools + school[student]
+    # (반복, 학교)별로 추첨 번호 순서로 줄 세운 뒤, 줄 안의 순번이 남은 정원보다 작으면 선발
+    order = np.lexsort((priority[rep, student], key))
+    key_sorted = key[order]
+    starts = np.flatnonzero(np.r_[True, key_sorted[1:] != key_sorted[:-1]])
+    position = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    win = order[position < remaining.ravel()[key_sorted]]
+    remaining -= np.bincount(key[win], minlength=n_reps * n_schools).reshape(n_reps, n_schools)
+    return rep[win], student[win]
+
+def random_fill(assigned, remaining):
+    """
+    모든 지망 라운드 뒤 남은 학생을 남은 자리에 무작위 배정 (자리가 모자라면 그 비율만큼만 배정)
+    반환: (학생별 임의 배정 기대 횟수 [학생], 학교별 임의 배정 기대 인원 합계 [학교])
+    """
+    leftover = (~assigned).sum(axis=1)
+    seats = remaining.sum(axis=1)
+    student_share = np.minimum(1.0, seats / np.maximum(leftover, 1))
+    seat_share = np.minimum(1.0, leftover / np.maximum(seats, 1))
+    return (~assigned * student_share[:, None]).sum(axis=0), (remaining * seat_share[:, None]).sum(axis=0)
+
+def batch_size(n):
+    """묶음당 반복 수 (시나리오 비교도 같은 묶음 / 시드를 써야 같은 추첨 번호가 나옴)"""
+    return max(1, BATCH_ELEMENTS // max(n, 1))
+
+def simulate_batch(model, seed, n_reps):
+    """
+    반복 n_reps회 -> 묶음 합계
+      - student_hits [학생 x 지망 컬럼]: 해당 지망으로 배정된 횟수
+      - student_random [학생]: 임의 배정 기대 횟수
+      - school_hits [학교 x 지망 컬럼] / school_random [학교]: 학교별 배정 인원 합계
+    """
+    rng = np.random.default_rng(seed)
+    n, n_cols = model['n'], len(model['columns'])
+    n_schools = len(model['capacity'])
+    assigned = np.zeros((n_reps, n), dtype=bool)
+    remaining = np.tile(model['capacity'], (n_reps, 1))
+    student_hits = np.zeros((n, n_cols), dtype=np.int64)
+    school_hits = np.zeros((n_schools, n_cols), dtype=np.int64)
+
+    for c in range(n_cols):
+        school = model['choices'][:, c]
+        priority = rng.random((n_reps, n))   # 라운드마다 새 추첨 번호 (정원과 무관하게 같은 난수열)
+        rep, student = lottery_round(school, priority, assigned, remaining)
+        assigned[rep, student] = True
+        student_hits[:, c] = np.bincount(student, minlength=n)
+        school_hits[:, c] = np.bincount(school[student], minlength=n_schools)
+
+    student_random, school_random = random_fill(assigned, remaining)
+    return student_hits, student_random, school_hits, school_random
+
+def _simulate_batch(task):
+    seed, n_reps = task
+    return simulate_batch(_worker['model'], seed, n_reps)
+
+@instrument()
+def simulate(model, n_reps=SIM_REPLICATES, workers=None, seed=SIM_SEED):
+    """
+    추첨 배정을 n_reps회 반복합니다.
+    반환: {'student': 학생별 확률 [학생 x (지망 컬럼 + 임의)], 'school': 학교별 기대 인원 [학교 x (지망 컬럼 + 임의)], 'n_reps'}
+    """
+    batches = run_batches(_simulate_batch, batch_tasks(n_reps, batch_size(model['n']), seed), workers,
+                          _init_worker, (model,), label="배정 시뮬레이션")
+    student = np.column_stack([sum(b[0] for b in batches), sum(b[1] for b in batches)]) / n_reps
+    school = np.column_stack([sum(b[2] for b in batches), sum(b[3] for b in batches)]) / n_reps
+    return {'student': student, 'school': school, 'n_reps': n_reps}
+
+# ---------------------------------------------------------
+# 보고서 표
+# ---------------------------------------------------------
+def rank_probabilities(model, result):
+    """학생별 확률 -> 순위별 확률 표 [학생 x (1지망, 2지망, ..., 임의)] (%)"""
+    probs = result['student']
+    ranks = sorted(set(model['ranks'].tolist()))
+    table = {prob_col(r): probs[:, :-1][:, model['ranks'] == r].sum(axis=1) for r in ranks}
+    table[prob_col(UNLISTED_RANK)] = probs[:, -1]
+    return pd.DataFrame(table) * 100
+
+def observed_shares(students, ranks):
+    """관측 배정순위 -> 순위별 비율 (%) (배정순위 컬럼이 없으면 None)"""
+    if RANK_COL not in students.columns:
+        return None
+    observed = pd.Series(students[RANK_COL].to_numpy()).value_counts(normalize=True) * 100
+    return {prob_col(r): observed.get(r, 0.0) for r in list(ranks) + [UNLISTED_RANK]}
+
+def school_table(model, result, students):
+    """학교별: 정원, 순위별 지원자 수(학생 기준) / 그 학교에 그 순위로 배정될 확률, 순위별 기대 배정 인원"""
+    probs = result['student']
+    schools = model['schools']
+    parts = []
+    for c, rank in enumerate(model['ranks']):
+        codes = model['choices'][:, c]
+        listed = np.flatnonzero(codes >= 0)
+        parts.append(pd.DataFrame({'학교': codes[listed], '순위': rank, '학생': listed, '확률': probs[listed, c]}))
+    # 같은 학교를 같은 순위에 여러 학교군으로 쓴 학생은 한 명으로 (해당 학교에 그 순위로 배정될 확률 = 합)
+    entries = pd.concat(parts, ignore_index=True).groupby(['학교', '순위', '학생'])['확률'].sum()
+    grouped = entries.groupby(['학교', '순위']).agg(['size', 'mean']).unstack('순위')
+
+    table = pd.DataFrame({'정원': model['capacity']}, index=pd.RangeIndex(len(schools)))
+    for rank in sorted(set(model['ranks'].tolist())):
+        table[f"{rank_name(rank)}_지원자수"] = grouped['size'].get(rank, pd.Series(dtype=float)).reindex(table.index).fillna(0).astype(int)
+        table[prob_col(rank)] = (grouped['mean'].get(rank, pd.Series(dtype=float)).reindex(table.index) * 100).round(1)
+    for rank in sorted(set(model['ranks'].tolist())):
+        table[f"기대_{rank_name(rank)}_배정인원"] = result['school'][:, :-1][:, model['ranks'] == rank].sum(axis=1).round(1)
+    table[f"기대_{RANDOM_LABEL}_배정인원"] = result['school'][:, -1].round(1)
+    table.index = pd.Index(schools, name='배정고등학교')
+    table = table[table['정원'] > 0]
+    return table.sort_values(prob_col(1) if prob_col(1) in table else '정원', ascending=True)
+
+def group_table(probs, students, keys, min_students=1):
+    """학생 라벨(keys)별 학생 수 + 순위별 평균 확률 (%)"""
+    frame = pd.concat([students[keys].reset_index(drop=True), probs], axis=1)
+    grouped = frame.groupby(keys, observed=True, dropna=False)
+    table = grouped[list(probs.columns)].mean().round(1)
+    table.insert(0, '학생수', grouped.size())
+    return table[table['학생수'] >= min_students]
+
+@instrument()
+def lottery_frames(model, result, students):
+    """시뮬레이션 결과 -> 산출물 {시트명: DataFrame}"""
+    ranks = sorted(set(model['ranks'].tolist()))
+    probs = rank_probabilities(model, result)
+
+    summary = [{'구분': f"시뮬레이션 ({result['n_reps']:,}회)", **probs.mean().round(1).to_dict()}]
+    observed = observed_shares(students, ranks)
+    if observed is not None:
+        summary.append({'구분': "관측 (실제 배정)", **{k: round(v, 1) for k, v in observed.items()}})
+    frames = {
+        '0_시뮬레이션_요약': pd.DataFrame(summary),
+        '1_학교별_배정확률': school_table(model, result, students),
+    }
+    if model['dong'] is not None:
+        frames['2_동네별_배정확률'] = group_table(probs, students, [model['dong']]).sort_values(prob_col(1))
+    patterns = group_table(probs, students, model['columns'], MIN_PATTERN_STUDENTS)
+    frames['3_지망패턴별_배정확률'] = patterns.sort_values('학생수', ascending=False).reset_index()
+    return frames
+
+# ---------------------------------------------------------
+# 실행
+# ---------------------------------------------------------
+def load_inputs():
+    """Step1 학생 지망(필요한 컬럼만) + Step2 정원표 -> (학생 DataFrame, 스키마, 정원표 또는 None) / 실패 시 None"""
+    if not has_frame(INPUT_STEP, '보안_RawData'):
+        print(f"❌ 저장소에 Step1 산출물이 없습니다: {INPUT_STEP}/보안_RawData")
+        return None
+    schema = load_schema(INPUT_STEP, '보안_RawData')
+    df = load_frame(INPUT_STEP, '보안_RawData', columns=field_columns(schema, LOAD_FIELDS, [RANK_COL]))
+    df_school = load_frame(CAPACITY_STEP, '연구1_학교별_인기도') if has_frame(CAPACITY_STEP, '연구1_학교별_인기도') else None
+    return df, schema, df_school
+
+@instrument()
+def run_simulation(n_reps=SIM_REPLICATES, workers=None, seed=SIM_SEED, excel=False):
+    print("🎲 [Lottery Simulator] 추첨 배정 몬테카를로 시뮬레이션을 시작합니다.")
+    inputs = load_inputs()
+    if inputs is None:
+        return None
+    df, schema, df_school = inputs
+
+    model, students = build_model(df, schema, df_school)
+    if model is None:
+        return None
+    print(f"   - 학생 {model['n']:,}명, 학교 {int((model['capacity'] > 0).sum())}개 (정원 합계 {int(model['capacity'].sum()):,}), "
+          f"라운드: {', '.join(model['columns'])}")
+
+    frames = lottery_frames(model, simulate(model, n_reps, workers, seed), students)
+    save_step(STEP_NAME, frames)
+    if excel:
+        export_excel(frames, OUTPUT_FILE)
+    print(frames['0_시뮬레이션_요약'].to_string(index=False))
+    print(f"\n✅ 시뮬레이션 완료! 결과 저장소: {STEP_NAME}")
+    return frames
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="추첨 배정 몬테카를로 시뮬레이션 (학교 / 동네 / 지망 패턴별 배정 확률)")
+    parser.add_argument("--reps", type=int, default=SIM_REPLICATES, help="반복 수")
+    parser.add_argument("--workers", type=int, help="프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--seed", type=int, default=SIM_SEED, help="난수 시드")
+    parser.add_argument("--excel", action="store_true", help="결과를 엑셀로 내보내기")
+    return add_instrumentation_args(parser)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run_simulation(args.reps, args.workers, args.seed, args.excel)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import sys
+import joblib
+import sklearn
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score, calinski_harabasz_score
+from sklearn.mixture import GaussianMixture
+from parallel_batches import run_tasks, pool_size
+
+# ==========================================
+# [설정] 군집 모델 선택 (GMM / K-Means 탐색)
+# ==========================================
+# 군집 수를 고정하지 않고 후보를 병렬로 적합해 기준 점수로 고릅니다.
+#   - GMM: 군집 수 x 공분산 형태, BIC(또는 AIC)가 가장 낮은 모델
+#     (같은 군집 수 안에서는 'full' 결과의 평균/비중으로 나머지 공분산 형태를 웜스타트)
+#   - K-Means: 군집 수, 실루엣(또는 Calinski-Harabasz)이 가장 높은 모델
+# 두 탐색 모두 표본에 비해 과한 후보는 점수와 관계없이 제외합니다. (표본이 적은 Step4 학교 단위 입력 대비)
+#   - 추정 파라미터 수가 표본 수 이상인 모델
+#   - 소속 표본이 MIN_CLUSTER_SIZE 미만인 군집이 생긴 모델 (1개짜리 군집의 특이 공분산이 BIC를 왜곡)
+# 선택된 모델은 '입력 특성 + 탐색 설정'의 해시를 키로 저장해 두고, 같은 입력이면 다시 적합하지 않습니다.
+# 실행 인자: --select-models (없으면 기존 고정 군집 수 사용)
+MODEL_DIR = os.path.join("data", "processed", "models")
+SELECT_FLAG = "--select-models"
+
+GMM_COMPONENTS = list(range(2, 9))
+GMM_COVARIANCE_TYPES = ['full', 'tied', 'diag', 'spherical']   # 첫 번째 형태의 결과로 나머지를 웜스타트
+GMM_CRITERION = 'BIC'          # 'BIC' 또는 'AIC' (낮을수록 좋음)
+
+KMEANS_K = list(range(2, 9))
+KMEANS_CRITERION = '실루엣'     # '실루엣' 또는 'Calinski_Harabasz' (높을수록 좋음)
+KMEANS_N_INIT = 10
+RANDOM_STATE = 42
+MIN_CLUSTER_SIZE = 2           # 군집마다 최소 소속 표본 수
+# ==========================================
+
+def wants_model_selection(argv=None):
+    """실행 인자에 --select-models 가 있으면 군집 수를 탐색으로 정합니다."""
+    argv = sys.argv[1:] if argv is None else argv
+    return SELECT_FLAG in argv
+
+# ---------------------------------------------------------
+# 모델 캐시 (입력 특성 해시 -> 선택된 모델 + 점수표)
+# ---------------------------------------------------------
+def feature_hash(x, kind, settings):
+    """입력 특성 행렬 + 탐색 설정 + sklearn 버전의 SHA-256 (앞 16자리)"""
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    h = hashlib.sha256()
+    h.update(f"{kind}|{x.shape}|{sklearn.__version__}|".encode())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    h.update(x.tobytes())
+    return h.hexdigest()[:16]
+
+def _cache_path(kind, key):
+    return os.path.join(MODEL_DIR, f"{kind}_{key}.joblib")
+
+def load_cached(kind, key):
+    """저장된 {'model', 'scores'} (없거나 읽기 실패 시 None)"""
+    path = _cache_path(kind, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print(f"⚠ 모델 캐시 읽기 실패 → 다시 적합합니다: {e}")
+        return None
+
+def save_cached(kind, key, entry):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(entry, _cache_path(kind, key))
+
+# ---------------------------------------------------------
+# 후보 적합 (프로세스 풀 작업 - 모듈 최상위 함수)
+# ---------------------------------------------------------
+def _fit_gmm(task):
+    """같은 군집 수의 공분산 형태들을 적합. 첫 형태의 평균/비중으로 나머지를 웜스타트"""
+    x, k, covariance_types, random_state = task
+    fitted, rows, warm = {}, [], {}
+    for cov in covariance_types:
+        gmm = GaussianMixture(n_components=k, covariance_type=cov, random_state=random_state, **warm)
+        gmm.fit(x)
+        if not warm:
+            warm = {'means_init': gmm.means_, 'weights_init': gmm.weights_}
+        fitted[cov] = gmm
+        n_params = gmm._n_parameters()
+        rows.append({'군집수': k, '공분산형태': cov, 'BIC': gmm.bic(x), 'AIC': gmm.aic(x),
+                     '수렴여부': bool(gmm.converged_), '반복횟수': int(gmm.n_iter_), '파라미터수': n_params,
+                     '제외사유': exclusion_reason(n_params, gmm.predict(x), k, len(x))})
+    return rows, fitted
+
+def _fit_kmeans(task):
+    x, k, n_init, random_state = task
+    km = KMeans(n_clusters=k, random_state=random_state, n_init=n_init).fit(x)
+    n_params = km.cluster_centers_.size   # 군집 중심 좌표
+    row = {'군집수': k, '실루엣': silhouette_score(x, km.labels_),
+           'Calinski_Harabasz': calinski_harabasz_score(x, km.labels_), '관성(inertia)': km.inertia_,
+           '파라미터수': n_params, '제외사유': exclusion_reason(n_params, km.labels_, k, len(x))}
+    return row, km
+
+def _valid_ks(ks, n_samples):
+    """군집 수 후보 중 표본 수로 가능한 것 (2 <= k < 표본 수)"""
+    return [k for k in ks if 2 <= k < n_samples]
+
+def exclusion_reason(n_params, labels, k, n_samples, min_size=MIN_CLUSTER_SIZE):
+    """GMM / K-Means 공통 후보 제외 규칙. 제외 사유 문자열 (사용 가능하면 빈 문자열)"""
+    if n_params >= n_samples:
+        return f"파라미터 {n_params}개 >= 표본 {n_samples}개"
+    smallest = int(np.bincount(labels, minlength=k).min())
+    if smallest < min_size:
+        return f"최소 군집 {smallest}개 < {min_size}개"
+    return ""
+
+def _pick(scores, criterion, lowest):
+    """제외되지 않은 후보 중 기준 점수가 가장 좋은 행 번호 (모두 제외되면 None)"""
+    usable = scores.loc[scores['제외사유'] == '', criterion]
+    if usable.empty:
+        return None
+    return usable.idxmin() if lowest else usable.idxmax()
+
+# ---------------------------------------------------------
+# 모델 선택
+# ---------------------------------------------------------
+def select_gmm(x, components=GMM_COMPONENTS, covariance_types=GMM_COVARIANCE_TYPES,
+               criterion=GMM_CRITERION, workers=None, random_state=RANDOM_STATE):
+    """
+    GMM 군집 수 x 공분산 형태 탐색. 반환: (선택된 GaussianMixture, 점수표 DataFrame) / 후보가 없으면 (None, None)
+    모든 후보가 제외 규칙(exclusion_reason)에 걸리면 (None, 점수표)를 반환합니다.
+    군집 수별로 작업을 나눠 프로세스 풀에서 적합합니다.
+    """
+    x = np.asarray(x, dtype=float)
+    ks = _valid_ks(components, len(x))
+    if not ks:
+        return None, None
+    settings = {'components': ks, 'covariance_types': list(covariance_types),
+                'criterion': criterion, 'random_state': random_state, 'min_cluster_size': MIN_CLUSTER_SIZE}
+    key = feature_hash(x, 'gmm', settings)
+    cached = load_cached('gmm', key)
+    if cached is not None:
+        print(f"   - GMM 모델 캐시 재사용 ({key})")
+        return cached['model'], cached['scores']
+
+    print(f"   - GMM 탐색: 군집 수 {ks[0]}~{ks[-1]} x 공분산 {len(covariance_types)}종 "
+          f"(프로세스 {pool_size(workers, len(ks))}개, 기준 {criterion})")
+    results = run_tasks(_fit_gmm, [(x, k, list(covariance_types), random_state) for k in ks], workers)
+    scores = pd.DataFrame([row for rows, _ in results for row in rows])
+    best = _pick(scores, criterion, lowest=True)
+    scores['선택'] = scores.index == best
+    if best is None:
+        print("⚠ GMM 탐색: 표본 수에 맞는 후보가 없어 기본 군집 수를 사용합니다.")
+        return None, scores
+    winner = results[ks.index(scores.at[best, '군집수'])][1][scores.at[best, '공분산형태']]
+
+    save_cached('gmm', key, {'model': winner, 'scores': scores})
+    print(f"   - 선택: 군집 {winner.n_components}개, 공분산 {winner.covariance_type} ({criterion} {scores.at[best, criterion]:.1f})")
+    return winner, scores
+
+def select_kmeans(x, ks=KMEANS_K, criterion=KMEANS_CRITERION, workers=None,
+                  n_init=KMEANS_N_INIT, random_state=RANDOM_STATE):
+    """
+    K-Means 군집 수 탐색. 반환: (선택된 KMeans, 점수표 DataFrame) / 후보가 없으면 (None, None)
+    실루엣 점수는 군집 수가 표본 수보다 작아야 하므로 가능한 후보만 사용합니다.
+    모든 후보가 제외 규칙(exclusion_reason)에 걸리면 (None, 점수표)를 반환합니다.
+    """
+    x = np.asarray(x, dtype=float)
+    ks = _valid_ks(ks, len(x))
+    if not ks:
+        return None, None
+    settings = {'ks': ks, 'criterion': criterion, 'n_init': n_init, 'random_state': random_state,
+                'min_cluster_size': MIN_CLUSTER_SIZE}
+    key = feature_hash(x, 'kmeans', settings)
+    cached = load_cached('kmeans', key)
+    if cached is not None:
+        print(f"   - K-Means 모델 캐시 재사용 ({key})")
+        return cached['model'], cached['scores']
+
+    print(f"   - K-Means 탐색: 군집 수 {ks[0]}~{ks[-1]} (프로세스 {pool_size(workers, len(ks))}개, 기준 {criterion})")
+    results = run_tasks(_fit_kmeans, [(x, k, n_init, random_state) for k in ks], workers)
+    scores = pd.DataFrame([row for row, _ in results])
+    best = _pick(scores, criterion, lowest=False)
+    scores['선택'] = scores.index == best
+    if best is None:
+        print("⚠ K-Means 탐색: 표본 수에 맞는 후보가 없어 기본 군집 수를 사용합니다.")
+        return None, scores
+    winner = results[best][1]
+
+    save_cached('kmeans', key, {'model': winner, 'scores': scores})
+    print(f"   - 선택: 군집 {winner.n_clusters}개 ({criterion} {scores.at[best, criterion]:.3f})")
+    return winner, scores
@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+import argparse
+import glob
+import os
+import re
+import pii_masking
+import research_analytics
+import advanced_analytics_engine
+import flow_matrix
+import bootstrap_reliability
+import permutation_test
+import model_selection
+from pipeline import run_stages, write_reports, export_step_excel, step2_inputs, EXCEL_OUTPUTS
+from artifact_store import save_step, export_excel
+from parallel_batches import run_tasks, pool_size
+from instrumentation import instrument, add_instrumentation_args
+
+# ==========================================
+# [설정] 연도별 일괄 실행 + 연도별 추이
+# ==========================================
+# 입력 폴더에서 '<학년도>학년도 ... 후기고 ... .xlsx' 원본을 모두 찾아, 연도마다 전체 파이프라인을
+# 별도 프로세스에서 실행합니다. (연도 안의 부트스트랩/순열/모델 탐색은 프로세스 1개로 실행해 CPU를 나눠 쓰지 않음)
+# 산출물은 연도별 파티션에 기록합니다.
+#   - 저장소: data/processed/store/year=<학년도>/<step>
+#   - 엑셀(--excel): data/processed/years/year=<학년도>/<기존 파일명>
+#   - 대시보드 / 그래프: output/years/year=<학년도>/
+# 모든 연도가 끝나면 학교별 / 동네별 연도 추이 표를 만듭니다. (저장소 'trends' + 엑셀)
+INPUT_DIR = os.path.join("data", "input")
+RAW_FILE_PATTERN = re.compile(r"(\d{4})학년도.*후기고.*\.xlsx$")
+PARTITION_FORMAT = "year={year}"
+YEAR_EXCEL_DIR = os.path.join("data", "processed", "years")
+YEAR_OUTPUT_DIR = os.path.join("output", "years")
+TREND_STEP = "trends"
+TREND_EXCEL = os.path.join("data", "processed", "Trend_연도별_추이.xlsx")
+
+# 추이 지표 (컬럼명 -> 시트 이름에 쓸 짧은 이름)
+SCHOOL_METRICS = {'실질경쟁률': '실질경쟁률', '배정만족도(%)': '배정만족도', '포용성_지수': '엔트로피', '중심성_지수': '중심성'}
+DONG_METRICS = {'배정학교_가중경쟁률': '경쟁률', '1지망_성공률(%)': '만족도', '엔트로피_지수': '엔트로피', '중심성_지수': '중심성'}
+CHANGE_COL = "증감(최근-최초)"
+# ==========================================
+
+def find_year_files(input_dir=INPUT_DIR):
+    """입력 폴더의 연도별 원본 -> {학년도: 경로} (같은 학년도 파일이 여러 개면 첫 파일만 사용)"""
+    files = {}
+    for path in sorted(glob.glob(os.path.join(input_dir, "*.xlsx"))):
+        name = os.path.basename(path)
+        match = RAW_FILE_PATTERN.search(name)
+        if match is None or name.startswith("~$"):   # 엑셀 임시 파일 제외
+            continue
+        year = int(match.group(1))
+        if year in files:
+            print(f"⚠ {year}학년도 원본이 여러 개입니다. '{os.path.basename(files[year])}'만 사용합니다. (제외: {name})")
+            continue
+        files[year] = path
+    return dict(sorted(files.items()))
+
+def partition(year):
+    return PARTITION_FORMAT.format(year=year)
+
+# ---------------------------------------------------------
+# 연도별 추이 지표
+# ---------------------------------------------------------
+def dong_competition(step2):
+    """동네별 배정학교 가중 경쟁률 = sum(동네->학교 인원 x 학교 실질경쟁률) / 동네 배정 인원"""
+    df_school, flow = step2_inputs(step2)
+    competition = df_school.set_index('배정고등학교')['실질경쟁률'].reindex(flow['schools']).fillna(0).to_numpy()
+    counts = flow['counts'].tocsr()
+    totals = flow_matrix.row_totals(flow).to_numpy(dtype=float)
+    weighted = counts @ competition
+    return pd.Series(np.divide(weighted, totals, out=np.full(len(totals), np.nan), where=totals > 0),
+                     index=flow['dongs'], name='배정학교_가중경쟁률')
+
+def year_metrics(results):
+    """
+    한 연도의 Step 결과 -> (학교 지표 표, 동네 지표 표). Step2가 없으면 (None, None)
+    Step4가 없으면(앞 단계 실패 등) 엔트로피 / 중심성은 결측으로 둡니다.
+    """
+    step2 = results.get(research_analytics.STEP_NAME)
+    if step2 is None:
+        return None, None
+    step4 = results.get(advanced_analytics_engine.STEP_NAME, {})
+
+    schools = step2['연구1_학교별_인기도'][['실질경쟁률', '배정만족도(%)']].copy()
+    dongs = step2['연구2_동네별_만족도'][['거주학생수', '1지망_성공률(%)']].copy()
+    dongs['배정학교_가중경쟁률'] = dong_competition(step2)
+
+    if '2_학교_수용다양성' in step4:
+        schools['포용성_지수'] = step4['2_학교_수용다양성'].set_index('배정고등학교')['포용성_지수']
+    if '2_지역_배정다양성' in step4:
+        dongs['엔트로피_지수'] = step4['2_지역_배정다양성'].set_index('행정동')['엔트로피_지수']
+    if '3_네트워크_중심성' in step4:
+        centrality = step4['3_네트워크_중심성']
+        schools['중심성_지수'] = centrality[centrality['구분'] == '학교'].set_index('ID')['중심성_지수']
+        dongs['중심성_지수'] = centrality[centrality['구분'] == '동네'].set_index('ID')['중심성_지수']
+    return schools.reindex(columns=list(SCHOOL_METRICS)), dongs.reindex(columns=['거주학생수'] + list(DONG_METRICS))
+
+def trend_tables(metrics, key, columns, prefix):
+    """
+    {학년도: 지표 표(index=key)} -> 추이 시트들
+      - '{prefix}_연도별_추이': (key, 학년도) 긴 표
+      - '{prefix}_{지표}': key x 학년도 넓은 표 + 증감(최근-최초) (두 해 이상 값이 있을 때)
+    """
+    frames = [df.rename_axis(key).reset_index().assign(학년도=year) for year, df in metrics.items() if df is not None]
+    if not frames:
+        return {}
+    long = pd.concat(frames, ignore_index=True)
+    long = long[[key, '학년도'] + [c for c in long.columns if c not in (key, '학년도')]].sort_values([key, '학년도'])
+
+    sheets = {f"{prefix}_연도별_추이": long.reset_index(drop=True)}
+    for col, short in columns.items():
+        wide = long.pivot_table(index=key, columns='학년도', values=col, aggfunc='first', dropna=False)
+        wide.columns = [f"{y}학년도" for y in wide.columns]
+        # 처음 / 마지막으로 값이 있는 해 사이의 변화
+        first = wide.apply(lambda row: row.dropna().iloc[0] if row.notna().any() else np.nan, axis=1)
+        last = wide.apply(lambda row: row.dropna().iloc[-1] if row.notna().any() else np.nan, axis=1)
+        wide[CHANGE_COL] = (last - first).where(wide.notna().sum(axis=1) >= 2)
+        sheets[f"{prefix}_{short}"] = wide.sort_values(CHANGE_COL, ascending=False)
+    return sheets
+
+# ---------------------------------------------------------
+# 연도별 실행 (프로세스 풀 작업 - 모듈 최상위 함수)
+# ---------------------------------------------------------
+def _run_year(task):
+    """연도 1개: 원본 로드 -> 전체 Step -> 연도 파티션에 기록. 반환: (학년도, 실행 요약, 학교 지표, 동네 지표)"""
+    year, path, options = task
+    print(f"\n📅 [{year}학년도] {os.path.basename(path)}")
+    df_raw, _ = pii_masking.load_raw(path)
+    if df_raw is None:
+        return year, {'학년도': year, '원본': os.path.basename(path), '실행된_Step': "", '학생수': 0}, None, None
+
+    results = run_stages(df_raw, options['bootstrap'], 1, options['permutations'], options['select_models'])
+    out_dir = os.path.join(YEAR_OUTPUT_DIR, partition(year))
+    write_reports(results, os.path.join(out_dir, f"Insight_Dashboard_{year}.html"),
+                  os.path.join(out_dir, "advanced_plots"), year)
+    for step, frames in results.items():
+        save_step(os.path.join(partition(year), step), frames)
+        if options['excel']:
+            excel_path = os.path.join(YEAR_EXCEL_DIR, partition(year), os.path.basename(EXCEL_OUTPUTS[step]))
+            export_step_excel(step, frames, excel_path)
+
+    summary = {'학년도': year, '원본': os.path.basename(path), '실행된_Step': ", ".join(results), '학생수': len(df_raw)}
+    return (year, summary) + year_metrics(results)
+
+@instrument()
+def run_years(input_dir=INPUT_DIR, years=None, workers=None, excel=False,
+              bootstrap=0, permutations=0, select_models=False):
+    """
+    연도별 원본을 모두 찾아 연도마다 전체 파이프라인을 병렬 실행하고, 연도별 추이 표를 만듭니다.
+    years: 실행할 학년도 목록 (생략 시 모두) / workers: 동시에 실행할 연도 수 (기본: CPU 수)
+    반환: 추이 산출물 {시트명: DataFrame} (원본이 없으면 None)
+    """
+    files = find_year_files(input_dir)
+    if years:
+        files = {y: p for y, p in files.items() if y in set(years)}
+    if not files:
+        print(f"❌ '{input_dir}'에서 '<학년도>학년도 ... 후기고 ... .xlsx' 원본을 찾을 수 없습니다.")
+        return None
+
+    print(f"🚀 [Multi-Year] {len(files)}개 학년도 일괄 실행: {', '.join(map(str, files))} "
+          f"(프로세스 {pool_size(workers, len(files))}개)")
+    options = {'excel': excel, 'bootstrap': bootstrap, 'permutations': permutations, 'select_models': select_models}
+    results = run_tasks(_run_year, [(year, path, options) for year, path in files.items()], workers)
+
+    school_metrics = {year: schools for year, _, schools, _ in results}
+    dong_metrics = {year: dongs for year, _, _, dongs in results}
+    trends = {'0_연도별_실행요약': pd.DataFrame([summary for _, summary, _, _ in results])}
+    trends.update(trend_tables(school_metrics, '배정고등학교', SCHOOL_METRICS, '1_학교'))
+    trends.update(trend_tables(dong_metrics, '행정동', DONG_METRICS, '2_동네'))
+
+    save_step(TREND_STEP, trends)
+    if excel:
+        export_excel(trends, TREND_EXCEL)
+    print(f"\n✅ 연도별 일괄 실행 완료! 추이 저장소: {TREND_STEP} ({len(trends)}개 표)")
+    return trends
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="연도별 원본 일괄 실행 + 학교/동네 연도별 추이")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="연도별 원본 엑셀 폴더")
+    parser.add_argument("--years", type=int, nargs="+", help="실행할 학년도 (생략 시 모두)")
+    parser.add_argument("--workers", type=int, help="동시에 실행할 연도 수 (기본: CPU 수)")
+    parser.add_argument("--excel", action="store_true", help="연도별 Step 결과와 추이 표를 엑셀로 내보내기")
+    parser.add_argument("--bootstrap", type=int, nargs="?", const=bootstrap_reliability.BOOTSTRAP_REPLICATES,
+                        default=0, metavar="N", help="연도별 Step3-Sub 부트스트랩 반복 수")
+    parser.add_argument("--permutations", type=int, nargs="?", const=permutation_test.PERMUTATIONS,
+                        default=0, metavar="N", help="연도별 Step3 순열 검정 반복 수")
+    parser.add_argument(model_selection.SELECT_FLAG, dest="select_models", action="store_true",
+                        help="연도별 K-Means / GMM 군집 수 탐색")
+    return add_instrumentation_args(parser)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run_years(args.input_dir, args.years, args.workers, args.excel,
+                     args.bootstrap, args.permutations, args.select_models)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import eigsh, ArpackNoConvergence
+
+# ==========================================
+# [설정] 지역-학교 네트워크 중심성 (희소 행렬 기반)
+# ==========================================
+# 그래프 객체를 만들지 않고 동네 x 학교 이분(bipartite) 인접 행렬 B에서 바로 계산합니다.
+#   - 고유벡터 중심성: 전체 인접 행렬 A = [[0, B], [B^T, 0]] 의 주 고유벡터
+#   - PageRank: A를 행 정규화한 전이 행렬의 정상 분포
+#   - HITS: 동네(허브) -> 학교(권위) 방향 그래프 (h = B a, a = B^T h)
+# 수렴 여부/반복 횟수/잔차는 진단표로 함께 반환합니다. (조용히 다른 지표로 대체하지 않음)
+CENTRALITY_MAX_ITER = 1000
+CENTRALITY_TOL = 1e-6      # networkx 기본값과 동일 (노드 수 x tol 을 L1 기준으로 사용)
+HITS_TOL = 1e-8
+PAGERANK_ALPHA = 0.85
+# ==========================================
+
+def bipartite_adjacency(flow):
+    """흐름 매트릭스 -> 대칭 인접 행렬 A (노드 순서: 동네 전체, 학교 전체)"""
+    b = flow['counts'].astype(float)
+    return sparse.bmat([[None, b], [b.T, None]], format='csr')
+
+def _diagnostic(metric, method, iterations, residual, converged, note=""):
+    return {'지표': metric, '방법': method, '반복횟수': iterations,
+            '잔차(L1)': residual, '수렴여부': converged, '비고': note}
+
+def eigenvector_centrality(adj, max_iter=CENTRALITY_MAX_ITER, tol=CENTRALITY_TOL):
+    """
+    (A / ||A||_1 + I) 거듭제곱 반복 (networkx.eigenvector_centrality 와 같은 방식).
+    이분 그래프는 고유값이 +-λ 쌍으로 나타나 단순 반복이 진동하므로 I를 더해 이동시킵니다.
+    인원 가중치(수백 명)에 비해 I가 너무 작으면 수렴이 매우 느리므로, 먼저 최대 열 합(||A||_1)으로 나눠
+    고유값을 [-1, 1]로 맞춥니다. (고유벡터는 같음)
+    반복이 수렴하지 않으면 희소 고유값 분해(eigsh)로 계산하고 진단표에 기록합니다.
+    """
+    n = adj.shape[0]
+    scale = abs(adj).sum(axis=0).max() if adj.nnz else 1.0
+    scaled = adj / scale
+    x = np.full(n, 1.0 / n)
+    residual = np.inf
+    for it in range(1, max_iter + 1):
+        x_last = x
+        x = x_last + scaled @ x_last
+        x /= np.linalg.norm(x) or 1
+        residual = np.abs(x - x_last).sum()
+        if residual < n * tol:
+            return x, _diagnostic('고유벡터', '거듭제곱 반복', it, residual, True)
+
+    note = f"거듭제곱 반복 {max_iter}회 미수렴 (잔차 {residual:.2e})"
+    print(f"⚠ 고유벡터 중심성: {note} → 희소 고유값 분해(eigsh)로 계산")
+    try:
+        # 시작 벡터를 마지막 반복값으로 고정 (ARPACK 기본 난수 시작 벡터 대신 → 재실행 시 같은 결과)
+        vals, vec = eigsh(adj, k=1, which='LA', v0=x, maxiter=max_iter * n)
+    except ArpackNoConvergence:
+        print("❌ 고유벡터 중심성: 희소 고유값 분해도 수렴하지 않아 마지막 반복값을 사용합니다.")
+        return x, _diagnostic('고유벡터', '거듭제곱 반복', max_iter, residual, False, note)
+    x = np.abs(vec[:, 0])
+    x /= np.linalg.norm(x) or 1
+    residual = np.abs(adj @ x - vals[0] * x).sum()   # 고유방정식 잔차 |Ax - λx|
+    return x, _diagnostic('고유벡터', '희소 고유값 분해(eigsh)', max_iter, residual, True, note)
+
+def pagerank(adj, alpha=PAGERANK_ALPHA, max_iter=CENTRALITY_MAX_ITER, tol=CENTRALITY_TOL):
+    """가중치 PageRank (연결이 없는 노드의 확률은 전체에 균등 분배)"""
+    n = adj.shape[0]
+    out_weight = np.asarray(adj.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv_weight = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transition_t = (sparse.diags(inv_weight) @ adj).T.tocsr()
+
+    x = np.full(n, 1.0 / n)
+    residual = np.inf
+    for it in range(1, max_iter + 1):
+        x_last = x
+        x = alpha * (transition_t @ x_last + x_last[dangling].sum() / n) + (1 - alpha) / n
+        residual = np.abs(x - x_last).sum()
+        if residual < n * tol:
+            return x, _diagnostic('PageRank', '거듭제곱 반복', it, residual, True)
+
+    print(f"⚠ PageRank: {max_iter}회 반복 내 수렴 실패 (잔차 {residual:.2e}) → 마지막 반복값 사용")
+    return x, _diagnostic('PageRank', '거듭제곱 반복', max_iter, residual, False)
+
+def hits(counts, max_iter=CENTRALITY_MAX_ITER, tol=HITS_TOL):
+    """HITS: 동네 허브 점수 / 학교 권위 점수 (각각 합계 1로 정규화)"""
+    b = counts.astype(float).tocsr()
+    b_t = b.T.tocsr()
+    hub = np.full(b.shape[0], 1.0 / max(b.shape[0], 1))
+    auth = np.zeros(b.shape[1])
+    residual = np.inf
+    for it in range(1, max_iter + 1):
+        hub_last = hub
+        auth = b_t @ hub_last
+        auth /= auth.sum() or 1
+        hub = b @ auth
+        hub /= hub.sum() or 1
+        residual = np.abs(hub - hub_last).sum()
+        if residual < tol:
+            return hub, auth, _diagnostic('HITS', '거듭제곱 반복', it, residual, True)
+
+    print(f"⚠ HITS: {max_iter}회 반복 내 수렴 실패 (잔차 {residual:.2e}) → 마지막 반복값 사용")
+    return hub, auth, _diagnostic('HITS', '거듭제곱 반복', max_iter, residual, False)
+
+def node_order(flow):
+    """
+    간선이 있는 노드만, 동네 행을 순서대로 훑으며 처음 등장한 순서로 정렬합니다.
+    (기존 그래프 구성 시 노드 추가 순서와 동일)
+    """
+    coo = flow['counts'].tocsr().tocoo()
+    n_dongs, n_schools = coo.shape
+    first = np.full(n_dongs + n_schools, np.iinfo(np.int64).max)
+    pos = np.arange(coo.nnz)
+    np.minimum.at(first, coo.row, 2 * pos)
+    np.minimum.at(first, n_dongs + coo.col, 2 * pos + 1)
+    linked = np.flatnonzero(first < np.iinfo(np.int64).max)
+    return linked[np.argsort(first[linked], kind='stable')]
+
+def compute_centrality(flow):
+    """
+    흐름 매트릭스 -> (중심성 표, 수렴 진단표)
+    중심성 표 컬럼: ID, 중심성_지수(고유벡터), PageRank, HITS_허브, HITS_권위, 구분
+    """
+    columns = ['ID', '중심성_지수', 'PageRank', 'HITS_허브', 'HITS_권위', '구분']
+    if flow['counts'].nnz == 0:
+        print("⚠ 배정 흐름(간선)이 없어 중심성을 계산하지 않습니다.")
+        return pd.DataFrame(columns=columns), pd.DataFrame()
+
+    adj = bipartite_adjacency(flow)
+    n_dongs = len(flow['dongs'])
+    eig, eig_diag = eigenvector_centrality(adj)
+    rank, rank_diag = pagerank(adj)
+    hub, auth, hits_diag = hits(flow['counts'])
+
+    labels = np.concatenate([np.asarray(flow['dongs'], dtype=object),
+                             np.asarray(flow['schools'], dtype=object)])
+    hub_all = np.concatenate([hub, np.zeros(len(auth))])
+    auth_all = np.concatenate([np.zeros(len(hub)), auth])
+    kind = np.where(np.arange(len(labels)) < n_dongs, '동네', '학교')
+
+    order = node_order(flow)
+    values = [labels, eig, rank, hub_all, auth_all, kind]
+    df_centrality = pd.DataFrame({col: v[order] for col, v in zip(columns, values)})
+    df_diagnostics = pd.DataFrame([eig_diag, rank_diag, hits_diag])
+    return df_centrality, df_diagnostics
@@ -0,0 +1,71 @@
+import numpy as np
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# [설정] 반복 계산(부트스트랩 / 순열 검정 / 모델 탐색 등)의 묶음 병렬 실행
+# ==========================================
+# 반복을 일정 크기의 묶음으로 나누고, 묶음마다 SeedSequence에서 파생한 시드를 줍니다.
+# 묶음 구성과 시드가 프로세스 수와 무관하므로 --workers 값이 달라도 결과는 같습니다.
+WORKERS_FLAG = "--workers"
+# ==========================================
+
+def count_option(flag, default, argv=None):
+    """실행 인자 '<flag> [N]' -> N (값 없이 flag만 있으면 default, flag가 없으면 0)"""
+    argv = sys.argv[1:] if argv is None else argv
+    for i, arg in enumerate(argv):
+        if arg == flag:
+            value = argv[i + 1] if i + 1 < len(argv) else ""
+            return int(value) if value.isdigit() else default
+    return 0
+
+def workers_option(argv=None):
+    """실행 인자 '--workers N' -> N (없으면 None = CPU 수)"""
+    return count_option(WORKERS_FLAG, None, argv) or None
+
+def batch_tasks(n_reps, batch_size, seed):
+    """반복 n_reps개 -> [(묶음 시드, 묶음 반복 수)]"""
+    sizes = [batch_size] * (n_reps // batch_size)
+    if n_reps % batch_size:
+        sizes.append(n_reps % batch_size)
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+def _limit_threads():
+    """프로세스마다 BLAS/OpenMP 스레드는 1개로 제한 (프로세스 수만큼 병렬)"""
+    try:
+        from threadpoolctl import threadpool_limits
+        return threadpool_limits(1)
+    except ImportError:
+        return None
+
+_worker_limits = []
+
+def _init_worker(initializer, args):
+    _worker_limits.append(_limit_threads())
+    if initializer is not None:
+        initializer(*args)
+
+def pool_size(workers, n_tasks):
+    """실제로 띄울 프로세스 수 (기본: CPU 수, 작업 수보다 많이 띄우지 않음)"""
+    return max(1, min(workers or os.cpu_count() or 1, n_tasks))
+
+def run_tasks(fn, tasks, workers=None, initializer=None, initargs=()):
+    """
+    작업 목록을 프로세스 풀에서 실행하고 결과 목록을 (작업 순서대로) 반환합니다.
+    fn / initializer는 모듈 최상위 함수여야 합니다. (workers=1 이면 현재 프로세스에서 실행)
+    """
+    workers = pool_size(workers, len(tasks))
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)   # 현재 프로세스의 스레드 설정은 건드리지 않음
+        return [fn(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(initializer, initargs)) as pool:
+        return list(pool.map(fn, tasks))
+
+def run_batches(fn, tasks, workers=None, initializer=None, initargs=(), label="반복"):
+    """반복 묶음 [(시드, 반복 수)]을 run_tasks로 실행합니다. (진행 상황 출력 포함)"""
+    n_reps = sum(size for _, size in tasks)
+    print(f"   - {label} {n_reps:,}회 (묶음 {len(tasks)}개, 프로세스 {pool_size(workers, len(tasks))}개)")
+    return run_tasks(fn, tasks, workers, initializer, initargs)
@@ -0,0 +1,112 @@
+import numpy as np
+from scipy import sparse
+from parallel_batches import count_option, workers_option, batch_tasks, run_batches
+
+# ==========================================
+# [설정] 거주지-배정학교 독립성 몬테카를로 순열 검정
+# ==========================================
+# 기대빈도가 작은 칸이 많으면 카이제곱 근사 p-value를 믿기 어렵습니다.
+# 학생들의 배정학교 라벨을 동네 라벨에 대해 무작위로 섞어(행/열 합계 고정) 귀무분포를 직접 만듭니다.
+#   - 학생 = (동네 코드, 학교 코드) 정수 배열 / 묶음마다 [순열 수 x 학생 수] 배열을 한 번에 섞음
+#   - 합계가 고정이므로 chi2 = N * sum(O^2 / (R*C)) - N, G2 = 2 * (sum O ln O - 상수) 에서 칸 합만 다시 계산
+# p-value = (1 + 관측값 이상인 순열 수) / (1 + 순열 수)
+# 실행 인자: --permutations <순열 수> [--workers <프로세스 수>]
+PERMUTATIONS = 10_000          # --permutations 만 주고 값이 없을 때의 기본 순열 수
+PERMUTATION_SEED = 42          # 묶음별 난수는 이 시드에서 파생 → 프로세스 수와 무관하게 같은 결과
+BATCH_ELEMENTS = 1 << 23       # 묶음 크기 = 이 값 / 학생 수 (묶음당 정수 배열 약 32MB)
+STAT_TOLERANCE = 1e-9          # 관측값과 같은 통계량의 부동소수 오차 허용 (상대값)
+# ==========================================
+
+def permutation_options(argv=None):
+    """실행 인자 -> (순열 수, 프로세스 수). --permutations 가 없으면 순열 수 0 (검정 안 함)"""
+    return count_option("--permutations", PERMUTATIONS, argv), workers_option(argv)
+
+def build_model(flow):
+    """
+    흐름표(빈 행/열 제거된 상태) -> 순열 검정에 필요한 정수 배열 / 가중치
+    동네 라벨은 고정(정렬된 학생 순서), 학교 라벨만 섞습니다.
+    """
+    counts = sparse.csr_matrix(flow['counts'])
+    rows = np.asarray(counts.sum(axis=1)).ravel()
+    cols = np.asarray(counts.sum(axis=0)).ravel()
+    n_rows, n_cols = counts.shape
+    n = int(rows.sum())
+    log_table = np.arange(int(max(rows.max(), cols.max())) + 1, dtype=float)
+    log_table[1:] *= np.log(log_table[1:])   # x ln x (0 ln 0 = 0)
+    return {
+        'n': n,
+        'n_cells': n_rows * n_cols,
+        # 학생별 '동네 코드 x 학교 수' (칸 번호 = 이 값 + 학교 코드)
+        'row_key': np.repeat(np.arange(n_rows, dtype=np.int32) * n_cols, rows.astype(np.int64)),
+        'schools': np.repeat(np.arange(n_cols, dtype=np.int16 if n_cols < 2 ** 15 else np.int32), cols.astype(np.int64)),
+        'chi_weight': (1.0 / np.outer(rows, cols)).ravel(),
+        'xlogx': log_table,
+        # G2 = 2 * (sum O ln O - sum R ln R - sum C ln C + N ln N)
+        'g_const': log_table[rows.astype(np.int64)].sum() + log_table[cols.astype(np.int64)].sum() - n * np.log(n),
+    }
+
+def statistics(model, cell_counts):
+    """칸 인원 [순열 x 칸] -> (chi2 배열, G2 배열)"""
+    chi2 = model['n'] * (cell_counts.astype(float) ** 2 @ model['chi_weight']) - model['n']
+    g2 = 2 * (model['xlogx'][cell_counts].sum(axis=1) - model['g_const'])
+    return chi2, g2
+
+def observed_statistics(model, flow):
+    """관측 흐름표의 (chi2, G2)"""
+    dense = np.asarray(flow['counts'].todense()).reshape(1, -1).astype(np.int64)
+    chi2, g2 = statistics(model, dense)
+    return float(chi2[0]), float(g2[0])
+
+# ---------------------------------------------------------
+# 묶음 실행 (프로세스 풀)
+# ---------------------------------------------------------
+_worker = {}
+
+def _init_worker(model):
+    _worker['model'] = model
+
+def _permute_batch(task):
+    """묶음 1개: (시드, 순열 수) -> (chi2 배열, G2 배열)"""
+    seed, n_perm = task
+    model = _worker['model']
+    rng = np.random.default_rng(seed)
+    labels = np.tile(model['schools'], (n_perm, 1))
+    for row in labels:   # 행별 제자리 섞기 (Generator.permuted(axis=1)보다 빠름)
+        rng.shuffle(row)
+    # 순열마다 칸 번호를 겹치지 않게 밀어서 bincount 한 번으로 [순열 x 칸] 인원을 셈 (묶음 크기로 int32 범위 보장)
+    offsets = (np.arange(n_perm, dtype=np.int32) * model['n_cells'])[:, None]
+    keys = labels + (model['row_key'] + offsets)
+    cell_counts = np.bincount(keys.ravel(), minlength=n_perm * model['n_cells']).reshape(n_perm, -1)
+    return statistics(model, cell_counts)
+
+def permutation_test(flow, n_perm=PERMUTATIONS, workers=None, seed=PERMUTATION_SEED):
+    """
+    독립성 순열 검정 (flow: 빈 행/열이 제거된 흐름표)
+    반환: {'chi2', 'g2', 'p_chi2', 'p_g2', 'n_perm'}
+    """
+    model = build_model(flow)
+    chi2_obs, g2_obs = observed_statistics(model, flow)
+    batch_size = max(1, min(BATCH_ELEMENTS // max(model['n'], 1), (2 ** 31 - 1) // max(model['n_cells'], 1)))
+    batches = run_batches(_permute_batch, batch_tasks(n_perm, batch_size, seed), workers,
+                          _init_worker, (model,), label="순열 검정")
+    null_chi2 = np.concatenate([b[0] for b in batches])
+    null_g2 = np.concatenate([b[1] for b in batches])
+
+    def p_value(null, observed):
+        return (1 + int((null >= observed - STAT_TOLERANCE * abs(observed)).sum())) / (1 + len(null))
+
+    return {
+        'chi2': chi2_obs, 'g2': g2_obs,
+        'p_chi2': p_value(null_chi2, chi2_obs), 'p_g2': p_value(null_g2, g2_obs),
+        'n_perm': len(null_chi2),
+    }
+
+def permutation_columns(result):
+    """검정 결과 -> 종속성 검정 표에 붙일 컬럼 {컬럼명: [값]}"""
+    return {
+        "검정통계량(chi2)": [result['chi2']],
+        "순열_P-value(chi2)": [result['p_chi2']],
+        "검정통계량(G2)": [result['g2']],
+        "순열_P-value(G2)": [result['p_g2']],
+        "순열_반복수": [result['n_perm']],
+    }
@@ -1,127 +1,73 @@
 import pandas as pd
-import uuid
 import os
+from artifact_store import save_step, export_excel, wants_excel_export
+from assignment_classifier import classify_assignment, UNLISTED_LABEL
+from pseudonymizer import pseudonymize_frame, load_salt, SALT_FILE, TOKEN_LENGTH
+from coded_table import encode, dictionary_frame, DICTIONARY_FRAME
+from aggregate_cube import build_cube, cube_crosstab, type_crosstab, type_counts, rollup, ASSIGN_CUBE, APPLY_CUBE
+from instrumentation import instrument
+from schema_manifest import (
+    rebuild_columns, is_subheader, read_schema, resolve_schema, choice_columns, save_schema,
+    PII_KEYWORDS, FIELD_ASSIGNED, FIELD_GENDER, FIELD_PII,
+)
 
 # ==========================================
 # [설정] 파일명
 # ==========================================
 INPUT_FILE = os.path.join("data", "input", "2026학년도 후기고.xlsx")
-OUTPUT_FILE = os.path.join("data", "processed", "Step1_전처리_익명화_마스터.xlsx")
+OUTPUT_FILE = os.path.join("data", "processed", "Step1_전처리_익명화_마스터.xlsx") # 엑셀 내보내기(--excel) 시
+STEP_NAME = "step1"  # 중간 산출물 저장소(Parquet) 이름
 
-# 마스킹 대상 키워드 (헤더에 이 글자가 포함되면 마스킹)
-MASK_KEYWORDS = ['성명', '이름', '생년월일', '접수번호', '전화', '연락처', '☎']
-# ==========================================
-
-def get_random_token(prefix):
-    return f"{prefix}_{uuid.uuid4().hex[:4].upper()}"
-
-def find_columns_by_keyword(df, keyword):
-    """특정 키워드가 포함된 모든 컬럼명을 찾습니다."""
-    return [col for col in df.columns if keyword in str(col)]
-
-def run_process():
-    print("🚀 고교 배정 데이터 심층 분석을 시작합니다...")
-
-    # 1. 파일 로드
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 오류: '{INPUT_FILE}' 파일이 없습니다.")
-        return
-
-    try:
-        df = pd.read_excel(INPUT_FILE)
-        print(f"✔ 파일 로드 성공: 총 {len(df)}명")
-
-        # [추가] 첫 번째 행이 서브헤더('1지망', '2지망')인 경우 처리
-        if '1지망' in df.iloc[0].values:
-            print("   - 서브헤더 탐색됨. 컬럼명 재구성 중...")
-            new_cols = []
-            last_valid_col = ""
-            for col, sub in zip(df.columns, df.iloc[0]):
-                col_str = str(col)
-                sub_str = str(sub) if pd.notna(sub) else ""
-                
-                if 'Unnamed' not in col_str:
-                    last_valid_col = col_str
-                
-                if sub_str:
-                    new_cols.append(f"{last_valid_col}_{sub_str}")
-                else:
-                    new_cols.append(last_valid_col)
-            
-            df.columns = new_cols
-            df = df.drop(df.index[0]).reset_index(drop=True)
-            print(f"   - 재구성된 컬럼: {list(df.columns[:10])} ...")
-
-    except Exception as e:
-        print(f"❌ 엑셀 읽기 실패: {e}")
-        return
+# 마스킹 대상 키워드 (헤더에 이 글자가 포함되면 마스킹) - 스키마 매니페스트의 개인정보 필드와 공용
+MASK_KEYWORDS = PII_KEYWORDS
 
-    # 2. 데이터 전처리 (공백 제거)
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].astype(str).str.strip()
+# 가명화 키 파일 / 토큰 길이 (같은 키 = 연도별·재실행 간 같은 학생은 같은 토큰)
+MASK_SALT_FILE = SALT_FILE
+MASK_TOKEN_LENGTH = TOKEN_LENGTH
+# ==========================================
 
-    # 3. 핵심 컬럼 자동 탐색
-    # (이미지를 기반으로 '성별', '배정', '1지망', '2지망'이 포함된 컬럼을 찾음)
-    cols_gender = find_columns_by_keyword(df, '성별')
-    cols_assigned = find_columns_by_keyword(df, '배정고등학교') # 혹은 그냥 '배정'
-    
-    # 1지망, 2지망 컬럼은 여러 개일 수 있음 (단일학교군, 일반학교군 등)
-    cols_choice_1 = find_columns_by_keyword(df, '1지망')
-    cols_choice_2 = find_columns_by_keyword(df, '2지망')
+def rebuild_subheader_columns(df):
+    """첫 번째 행이 서브헤더('1지망', '2지망')인 경우 '상위헤더_서브헤더'로 컬럼명을 재구성합니다."""
+    if len(df) == 0 or not is_subheader(df.iloc[0].values):
+        return df
+
+    print("   - 서브헤더 탐색됨. 컬럼명 재구성 중...")
+    df.columns = rebuild_columns(df.columns, df.iloc[0])
+    df = df.drop(df.index[0]).reset_index(drop=True)
+    print(f"   - 재구성된 컬럼: {list(df.columns[:10])} ...")
+    return df
+
+def resolve_columns(columns, schema=None):
+    """
+    핵심 컬럼 (배정학교 / 성별 / 지망 / 개인정보 컬럼) - 스키마 매니페스트에서 꺼냄 (없으면 컬럼명으로 해석)
+    반환: (배정 컬럼, 성별 컬럼 또는 None, {순위: [지망 컬럼]}, [개인정보 컬럼]) / 실패 시 None
+    """
+    schema = schema or resolve_schema(columns)
+    fields = schema['fields']
+    main_assigned_col = fields[FIELD_ASSIGNED]   # 배정고등학교 컬럼 (보통 1개)
+    main_gender_col = fields[FIELD_GENDER]
+    choice_cols = choice_columns(schema)   # 1지망, 2지망(, 3지망...) 컬럼은 여러 개일 수 있음 (단일학교군, 일반학교군 등)
 
     # 컬럼 검증
-    if not cols_assigned:
+    if main_assigned_col is None:
         print("❌ '배정고등학교' 관련 컬럼을 찾을 수 없습니다.")
-        print(f"   현재 헤더 목록: {list(df.columns)}")
-        return
-    if not cols_gender:
+        print(f"   현재 헤더 목록: {list(columns)}")
+        return None
+    if main_gender_col is None:
         print("⚠ '성별' 컬럼을 찾지 못해 성비 분석이 제한될 수 있습니다.")
-    
-    main_assigned_col = cols_assigned[0] # 배정고등학교 컬럼 (보통 1개)
-    main_gender_col = cols_gender[0] if cols_gender else None
 
     print(f"   - 배정 컬럼: {main_assigned_col}")
-    print(f"   - 1지망 컬럼들: {cols_choice_1}")
-    print(f"   - 2지망 컬럼들: {cols_choice_2}")
-    
-    # 4. 마스킹 (개인정보 보호)
-    masked_df = df.copy()
-    print("\n🔒 개인정보 마스킹 진행 중...")
-    for col in masked_df.columns:
-        for keyword in MASK_KEYWORDS:
-            if keyword in col:
-                masked_df[col] = [get_random_token("MASK") for _ in range(len(masked_df))]
-                break # 한 번 마스킹하면 다음 키워드 검사 생략
+    for rank, cols in choice_cols.items():
+        print(f"   - {rank}지망 컬럼들: {cols}")
 
-    # 5. [심층 분석 1] 배정 유형 분류 (1지망/2지망/미지망)
-    print("\n📊 배정 적합성 분석 중...")
-    
-    def classify_assignment(row):
-        assigned_school = row[main_assigned_col]
-        
-        # 1. 1지망 군(단일/일반)에 배정학교가 있는지 확인
-        for col in cols_choice_1:
-            if row[col] == assigned_school:
-                return "1지망 배정"
-        
-        # 2. 2지망 군에 배정학교가 있는지 확인
-        for col in cols_choice_2:
-            if row[col] == assigned_school:
-                return "2지망 배정"
-                
-        # 3. 어디에도 없으면
-        return "미지망(임의) 배정"
-
-    masked_df['분석_배정유형'] = masked_df.apply(classify_assignment, axis=1)
-
-    # 6. [결과 집계 1] 전체 요약 (요청하신 4가지 지표)
-    total_count = len(masked_df)
-    type_counts = masked_df['분석_배정유형'].value_counts()
-    
+    return main_assigned_col, main_gender_col, choice_cols, fields[FIELD_PII]
+
+def build_summary(type_counts, total_count):
+    """배정 유형별 인원 -> '종합_요약' 표 (요청하신 4가지 지표)"""
     count_1st = type_counts.get("1지망 배정", 0)
     count_2nd = type_counts.get("2지망 배정", 0)
-    count_none = type_counts.get("미지망(임의) 배정", 0)
-    count_any = count_1st + count_2nd # 지망 내 배정 (1+2)
+    count_none = type_counts.get(UNLISTED_LABEL, 0)
+    count_any = count_1st + count_2nd # 지망 내 배정 (1+2, 라벨과 같이 3지망 이상은 제외)
 
     summary_data = {
         '구분': [
@@ -140,45 +86,133 @@ def run_process():
             100.0
         ]
     }
-    summary_df = pd.DataFrame(summary_data)
+    return pd.DataFrame(summary_data)
 
-    # 7. [결과 집계 2] 학교별 배정 인원 및 성비 (남/녀 구분)
+def build_reports(cube, total_count, main_assigned_col, main_gender_col):
+    """
+    집계 큐브 -> (종합_요약, 학교별_성비, 학교별_배정유형) 표 (학생 테이블 재스캔 없음)
+    """
+    # [결과 집계 1] 전체 요약 (요청하신 4가지 지표)
+    summary_df = build_summary(type_counts(cube), total_count)
+
+    # [결과 집계 2] 학교별 배정 인원 및 성비 (남/녀 구분)
     print("📊 학교별 세부 현황 집계 중...")
-    
-    # 기본 학교별 카운트
     if main_gender_col:
-        school_stats = pd.crosstab(
-            masked_df[main_assigned_col], 
-            masked_df[main_gender_col],
-            margins=True,
-            margins_name="합계"
-        )
+        school_stats = cube_crosstab(cube[ASSIGN_CUBE], main_assigned_col, main_gender_col, margins_name="합계")
     else:
-        school_stats = masked_df[main_assigned_col].value_counts().to_frame(name='배정인원')
-
-    # 8. [결과 집계 3] 학교별 배정 유형 상세 (A학교에 온 애들이 1지망 써서 왔나?)
-    school_quality = pd.crosstab(
-        masked_df[main_assigned_col],
-        masked_df['분석_배정유형'],
-        margins=True,
-        margins_name="합계"
+        school_stats = rollup(cube[ASSIGN_CUBE], [main_assigned_col])
+        school_stats = school_stats.sort_values(ascending=False, kind='stable').to_frame(name='배정인원')
+
+    # [결과 집계 3] 학교별 배정 유형 상세 (A학교에 온 애들이 1지망 써서 왔나?)
+    school_quality = type_crosstab(cube, main_assigned_col, margins_name="합계")
+    return summary_df, school_stats, school_quality
+
+@instrument()
+def load_raw(input_file=INPUT_FILE):
+    """
+    원본 배정 엑셀을 읽어 (DataFrame, 스키마 매니페스트)로 반환합니다. (실패 시 (None, None))
+    매니페스트는 파일 해시로 찾으므로, 호출 측은 read_schema를 다시 부르지 말고 이 값을 사용합니다.
+    """
+    if not os.path.exists(input_file):
+        print(f"❌ 오류: '{input_file}' 파일이 없습니다.")
+        return None, None
+
+    try:
+        schema = read_schema(input_file)   # 헤더 해석은 파일당 한 번 (내용 해시별 매니페스트 캐시)
+        df = pd.read_excel(input_file)
+        print(f"✔ 파일 로드 성공: 총 {len(df)}명")
+
+        # [추가] 첫 번째 행이 서브헤더('1지망', '2지망')인 경우 매니페스트의 재구성된 컬럼명 사용
+        if schema['header_rows'] == 2:
+            print("   - 서브헤더 탐색됨. 매니페스트 컬럼명 적용...")
+            df = df.drop(df.index[0]).reset_index(drop=True)
+            df.columns = schema['columns']
+
+    except Exception as e:
+        print(f"❌ 엑셀 읽기 실패: {e}")
+        return None, None
+    return df, schema
+
+@instrument(rows_out=lambda frames: frames['보안_RawData'])
+def mask_and_classify(df, salt=None, schema=None):
+    """
+    원본 DataFrame -> Step1 산출물 {시트명: DataFrame} (파일 입출력 없음, 실패 시 None)
+    입력 DataFrame은 변경하지 않습니다.
+    salt: 가명화 키 (기본값: MASK_SALT_FILE 키 파일, 벤치마크 등에서 고정 키 지정 가능)
+    schema: 원본 파일의 스키마 매니페스트 (없으면 컬럼명으로 해석)
+    """
+    df = df.copy(deep=False)  # 컬럼 단위로만 교체하므로 얕은 복사로 충분 (원본 2배 메모리 방지)
+
+    # 2. 데이터 전처리 (공백 제거)
+    for col in df.select_dtypes(include=['object']).columns:
+        df[col] = df[col].astype(str).str.strip()
+
+    # 2-1. 학교/동네/자치구/성별 -> 공유 코드 사전 기반 Categorical (이후 집계는 정수 코드로 계산)
+    df, dictionaries = encode(df)
+    print("   - 코드 사전: " + ", ".join(f"{k} {len(v)}개" for k, v in dictionaries.items()))
+
+    # 3. 핵심 컬럼 자동 탐색
+    resolved = resolve_columns(df.columns, schema)
+    if resolved is None:
+        return None
+    main_assigned_col, main_gender_col, choice_cols, pii_cols = resolved
+    
+    # 4. 마스킹 (개인정보 보호) - 함수 시작 시 복사본을 만들었으므로 그대로 사용
+    masked_df = df
+    print("\n🔒 개인정보 마스킹 진행 중...")
+    # 컬럼 단위 HMAC 가명화 (고유값마다 한 번만 해시 계산)
+    masked_df, mask_report = pseudonymize_frame(
+        masked_df, pii_cols, salt=salt or load_salt(MASK_SALT_FILE), length=MASK_TOKEN_LENGTH
     )
+    print(f"   - 가명화 컬럼: {pii_cols}")
+
+    # 5. [심층 분석 1] 배정 유형 분류 (1지망/2지망/미지망)
+    print("\n📊 배정 적합성 분석 중...")
+    
+    # 배정학교를 모든 지망 컬럼과 한 번에 비교 (1지망 우선, 없으면 미지망)
+    masked_df['분석_배정유형'], masked_df['분석_배정순위'] = classify_assignment(
+        masked_df, main_assigned_col, choice_cols
+    )
+
+    # 6. 집계 큐브 (동네 x 학교 x 성별 x 순위) - 학생 단위 스캔은 여기서 한 번만, 아래 보고서는 큐브 합산
+    print("📊 집계 큐브 생성 중...")
+    cube = build_cube(masked_df)
+    summary_df, school_stats, school_quality = build_reports(
+        cube, len(masked_df), main_assigned_col, main_gender_col
+    )
+
+    # 7. 결과 묶기 (저장은 호출하는 쪽에서 결정)
+    frames = {
+        '종합_요약': summary_df,            # 시트1: 요약표 (가장 중요한 4가지 지표)
+        '학교별_성비': school_stats,         # 시트2: 학교별 성비
+        '학교별_배정유형': school_quality,   # 시트3: 학교별 배정 만족도 (1지망으로 왔는지, 튕겨서 왔는지)
+        '보안_RawData': masked_df,          # 시트4: 마스킹된 원본 데이터 (검증용)
+        '가명화_점검': mask_report,          # 시트5: 컬럼별 고유값 수 / 토큰 충돌 건수
+        DICTIONARY_FRAME: dictionary_frame(dictionaries),  # 시트6: 학교/동네/자치구/성별 코드 사전
+        ASSIGN_CUBE: cube[ASSIGN_CUBE],     # 시트7: (동네, 학교, 성별, 배정순위)별 인원
+        APPLY_CUBE: cube[APPLY_CUBE],       # 시트8: (동네, 지망학교, 성별, 지망순위)별 지원 건수
+    }
+    return frames
+
+@instrument()
+def run_process():
+    print("🚀 고교 배정 데이터 심층 분석을 시작합니다...")
+
+    # 1. 파일 로드
+    df, schema = load_raw(INPUT_FILE)
+    if df is None:
+        return
+
+    frames = mask_and_classify(df, schema=schema)
+    if frames is None:
+        return
+
+    save_step(STEP_NAME, frames)
+    save_schema(STEP_NAME, schema)   # 이후 Step은 매니페스트로 필요한 컬럼만 읽음
+    if wants_excel_export():
+        export_excel(frames, OUTPUT_FILE)
 
-    # 9. 엑셀 저장
-    with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-        # 시트1: 요약표 (가장 중요한 4가지 지표)
-        summary_df.to_excel(writer, sheet_name='종합_요약', index=False)
-        
-        # 시트2: 학교별 성비
-        school_stats.to_excel(writer, sheet_name='학교별_성비')
-        
-        # 시트3: 학교별 배정 만족도 (1지망으로 왔는지, 튕겨서 왔는지)
-        school_quality.to_excel(writer, sheet_name='학교별_배정유형')
-        
-        # 시트4: 마스킹된 원본 데이터 (검증용)
-        masked_df.to_excel(writer, sheet_name='보안_RawData', index=False)
-
-    print(f"\n✅ 분석 완료! 결과 파일: {OUTPUT_FILE}")
+    print(f"\n✅ 분석 완료! 결과 저장소: {STEP_NAME}")
     print("   -> '종합_요약' 시트에서 전체 퍼센트를 확인하세요.")
     print("   -> '학교별_배정유형' 시트에서 학교별 선호도를 확인하세요.")
 
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import os
+
+import pii_masking
+import research_analytics
+import statistical_deep_research
+import stat_reliability
+import advanced_analytics_engine
+import gender_analytics
+import final_dashboard_generator
+import advanced_visualization
+import assignment_classifier
+import pseudonymizer
+import flow_matrix
+import network_centrality
+import coded_table
+import aggregate_cube
+import segment_preference
+import bootstrap_reliability
+import permutation_test
+import parallel_batches
+import model_selection
+import school_typology
+import analysis_scheduler
+import schema_manifest
+from aggregate_cube import cube_frames
+from artifact_store import save_step, export_excel
+from stage_graph import stage, run_graph, hash_file
+from instrumentation import instrument, add_instrumentation_args
+
+# ==========================================
+# [설정] 단일 프로세스 파이프라인
+# ==========================================
+# 모든 Step을 한 프로세스에서 순서대로 실행하고, DataFrame을 메모리로 바로 넘깁니다.
+# 중간 산출물(저장소/엑셀)은 감사(audit) 목적일 때만 선택적으로 기록합니다.
+
+# Step 이름 -> (엑셀 내보내기 경로)
+EXCEL_OUTPUTS = {
+    pii_masking.STEP_NAME: pii_masking.OUTPUT_FILE,
+    research_analytics.STEP_NAME: research_analytics.OUTPUT_FILE,
+    statistical_deep_research.STEP_NAME: statistical_deep_research.OUTPUT_FILE,
+    stat_reliability.STEP_NAME: stat_reliability.OUTPUT_FILE,
+    advanced_analytics_engine.STEP_NAME: advanced_analytics_engine.OUTPUT_EXCEL,
+    gender_analytics.STEP_NAME: gender_analytics.OUTPUT_FILE,
+}
+# ==========================================
+
+def step2_inputs(step2):
+    """Step2 산출물에서 학교 통계표(학교명 컬럼 포함)와 희소 동네x학교 흐름표를 꺼냅니다."""
+    df_school = step2['연구1_학교별_인기도'].reset_index()
+    flow = flow_matrix.from_long(step2[flow_matrix.FLOW_FRAME])
+    return df_school, flow
+
+def export_step_excel(step, frames, path=None):
+    """Step 결과를 엑셀로 내보냅니다. (Step2 희소 흐름표는 기존 전체 매트릭스 시트로 펼침, path 생략 시 기본 경로)"""
+    if step == research_analytics.STEP_NAME:
+        frames = research_analytics.excel_frames(frames)
+    export_excel(frames, path or EXCEL_OUTPUTS[step])
+
+@instrument()
+def run_stages(df_raw, bootstrap=0, workers=None, permutations=0, select_models=False):
+    """
+    원본 DataFrame -> 모든 Step 결과 {step: {시트명: DataFrame}} (파일 입출력 없음)
+    중간에 실패한 Step이 있으면 그때까지의 결과만 반환합니다.
+    bootstrap / workers: Step3-Sub 학생 단위 부트스트랩 반복 수 / 프로세스 수 (0이면 생략)
+    permutations: Step3 독립성 순열 검정 반복 수 (0이면 생략, 같은 workers 사용)
+    select_models: Step3 / Step3-Sub K-Means, Step4 GMM 군집 수를 탐색으로 결정 (같은 workers 사용)
+    """
+    results = {}
+
+    print("\n🔒 [1/5] 전처리 및 익명화")
+    step1 = pii_masking.mask_and_classify(df_raw)
+    if step1 is None:
+        return results
+    results[pii_masking.STEP_NAME] = step1
+    masked, cube = step1['보안_RawData'], cube_frames(step1)   # 큐브: Step2 / 성별 분석은 재스캔 없이 합산만
+    schema = schema_manifest.resolve_schema(masked.columns)   # 헤더 해석은 한 번만 (Step2 / 성별 분석 공용)
+
+    print("\n🔬 [2/5] 지망 선호도 및 지역 흐름 분석")
+    step2 = research_analytics.analyze_research(masked, cube, schema)
+    if step2 is None:
+        return results
+    results[research_analytics.STEP_NAME] = step2
+    df_school, flow = step2_inputs(step2)
+
+    print("\n📊 [3/5] 학교 유형화 및 통계 검증")
+    # Step3 / Step3-Sub는 유형화 코어(필터 / 군집 / 검정)를 한 번만 계산해 함께 만듦
+    typology = school_typology.typology_outputs(df_school, flow, permutations, bootstrap, workers, select_models)
+    if typology is None:
+        return results
+    results.update(typology)
+
+    print("\n🚀 [4/5] 고급 분석 엔진")
+    results[advanced_analytics_engine.STEP_NAME] = advanced_analytics_engine.run_all_analyses(df_school, flow, select_models, workers)
+
+    print("\n👫 [부가] 성별 분석")
+    gender = gender_analytics.analyze_gender(masked, cube, schema)
+    if gender is not None:
+        results[gender_analytics.STEP_NAME] = gender
+
+    return results
+
+@instrument()
+def write_reports(results, output_html=final_dashboard_generator.OUTPUT_HTML,
+                  plot_dir=advanced_visualization.OUTPUT_DIR, year=final_dashboard_generator.REPORT_YEAR):
+    """최종 보고물(HTML 대시보드, 그래프)만 파일로 기록합니다. (year: 대시보드 제목 연도)"""
+    print("\n🎨 [5/5] 대시보드 및 시각화")
+    step3 = results.get(statistical_deep_research.STEP_NAME)
+    if step3 is not None:
+        final_dashboard_generator.write_dashboard(
+            final_dashboard_generator.build_dashboard_html(step3, year), output_html
+        )
+    step4 = results.get(advanced_analytics_engine.STEP_NAME)
+    if step4 is not None:
+        advanced_visualization.plot_results(step4, plot_dir)
+
+@instrument()
+def run_pipeline(input_file=pii_masking.INPUT_FILE, save_intermediate=False, excel=False,
+                 bootstrap=0, workers=None, permutations=0, select_models=False):
+    """원본 파일 1개로 전체 파이프라인을 한 프로세스에서 실행합니다."""
+    print("🚀 [Pipeline] 고교 배정 분석 전체 파이프라인을 시작합니다.")
+
+    df_raw, _ = pii_masking.load_raw(input_file)
+    if df_raw is None:
+        return None
+
+    results = run_stages(df_raw, bootstrap, workers, permutations, select_models)
+    write_reports(results)
+
+    # 감사용 중간 산출물 (선택)
+    for step, frames in results.items():
+        if save_intermediate:
+            save_step(step, frames)
+        if excel:
+            export_step_excel(step, frames)
+
+    print(f"\n✅ 파이프라인 완료! 실행된 Step: {', '.join(results)}")
+    return results
+
+def shared_typology(select_models=False, workers=None):
+    """
+    증분 실행에서 Step3 / Step3-Sub가 같은 Step2 결과로 실행되면 유형화 코어를 한 번만 계산합니다.
+    (한쪽만 다시 실행되는 경우에는 그 Step을 위해서만 계산)
+    """
+    memo = {}
+
+    def get(step2):
+        if memo.get('step2') is not step2:
+            memo['step2'] = step2
+            memo['core'] = school_typology.compute_typology(*step2_inputs(step2), select_models, workers)
+        return memo['core']
+    return get
+
+def build_stage_graph(output_html=final_dashboard_generator.OUTPUT_HTML,
+                      plot_dir=advanced_visualization.OUTPUT_DIR, bootstrap=0, workers=None,
+                      permutations=0, select_models=False):
+    """증분 실행용 Step 그래프 (입력 / 파라미터 / 코드 / 최종 파일 선언)"""
+    def step1(x):
+        df_raw, schema = x['raw']   # load_raw 결과 (원본, 매니페스트)
+        return None if df_raw is None else pii_masking.mask_and_classify(df_raw, schema=schema)
+
+    def dashboard(x):
+        final_dashboard_generator.write_dashboard(
+            final_dashboard_generator.build_dashboard_html(x['step3']), output_html
+        )
+        return {}
+
+    def plots(x):
+        advanced_visualization.plot_results(x['step4'], plot_dir)
+        return {}
+
+    typology = shared_typology(select_models, workers)
+
+    def step3(x):
+        core = typology(x['step2'])
+        return None if core is None else statistical_deep_research.frames_from_typology(core, permutations, workers)
+
+    def step3_sub(x):
+        core = typology(x['step2'])
+        return None if core is None else stat_reliability.frames_from_typology(core, bootstrap, workers)
+
+    salt_hash = hashlib.sha256(pseudonymizer.load_salt(pii_masking.MASK_SALT_FILE)).hexdigest()
+    return [
+        stage(pii_masking.STEP_NAME, step1, inputs=['raw'],
+              params={'MASK_KEYWORDS': pii_masking.MASK_KEYWORDS,
+                      'MASK_TOKEN_LENGTH': pii_masking.MASK_TOKEN_LENGTH,
+                      'salt': salt_hash},
+              code=[pii_masking, schema_manifest, assignment_classifier, pseudonymizer, coded_table, aggregate_cube]),
+        stage(research_analytics.STEP_NAME,
+              lambda x: research_analytics.analyze_research(x['step1']['보안_RawData'], cube_frames(x['step1'])),
+              inputs=['step1'],
+              params={'FIELD_KEYWORDS': schema_manifest.FIELD_KEYWORDS},
+              code=[research_analytics, schema_manifest, aggregate_cube, flow_matrix]),
+        stage(statistical_deep_research.STEP_NAME,
+              step3,
+              inputs=['step2'],
+              params={'MIN_SAMPLE_SCHOOL': school_typology.MIN_SAMPLE_SCHOOL,
+                      'MIN_SAMPLE_DONG': school_typology.MIN_SAMPLE_DONG,
+                      'PERMUTATIONS': permutations,
+                      'PERMUTATION_SEED': permutation_test.PERMUTATION_SEED,
+                      'BATCH_ELEMENTS': permutation_test.BATCH_ELEMENTS,
+                      'SELECT_MODELS': select_models},
+              code=[statistical_deep_research, school_typology, flow_matrix, permutation_test, parallel_batches, model_selection]),
+        stage(stat_reliability.STEP_NAME,
+              step3_sub,
+              inputs=['step2'],
+              params={'MIN_SAMPLE_SCHOOL': school_typology.MIN_SAMPLE_SCHOOL,
+                      'MIN_SAMPLE_DONG': school_typology.MIN_SAMPLE_DONG,
+                      'BOOTSTRAP': bootstrap,   # 프로세스 수는 결과에 영향 없음 (묶음별 시드 고정)
+                      'BOOTSTRAP_SEED': bootstrap_reliability.BOOTSTRAP_SEED,
+                      'BOOTSTRAP_BATCH': bootstrap_reliability.BOOTSTRAP_BATCH,
+                      'SELECT_MODELS': select_models},
+              code=[stat_reliability, school_typology, flow_matrix, bootstrap_reliability, parallel_batches, model_selection]),
+        stage(advanced_analytics_engine.STEP_NAME,
+              lambda x: advanced_analytics_engine.run_all_analyses(*step2_inputs(x['step2']), select_models, workers),
+              inputs=['step2'],
+              params={'GMM_N_COMPONENTS': advanced_analytics_engine.GMM_N_COMPONENTS,
+                      'RANDOM_STATE': advanced_analytics_engine.RANDOM_STATE,
+                      'PAGERANK_ALPHA': network_centrality.PAGERANK_ALPHA,
+                      'CENTRALITY_TOL': network_centrality.CENTRALITY_TOL,
+                      'SELECT_MODELS': select_models},
+              code=[advanced_analytics_engine, analysis_scheduler, flow_matrix, network_centrality, model_selection, parallel_batches]),
+        stage(gender_analytics.STEP_NAME,
+              lambda x: gender_analytics.analyze_gender(x['step1']['보안_RawData'], cube_frames(x['step1'])),
+              inputs=['step1'], params={'FIELD_KEYWORDS': schema_manifest.FIELD_KEYWORDS},
+              code=[gender_analytics, schema_manifest, aggregate_cube, segment_preference]),
+        stage("dashboard", dashboard, inputs=['step3'],
+              code=[final_dashboard_generator], files=[output_html]),
+        stage("plots", plots, inputs=['step4'],
+              code=[advanced_visualization], files=[plot_dir]),
+    ]
+
+@instrument()
+def run_incremental(input_file=pii_masking.INPUT_FILE, force=False, excel=False,
+                    bootstrap=0, workers=None, permutations=0, select_models=False):
+    """
+    증분 실행: 입력 파일 / 파라미터 / 코드가 바뀐 Step과 그 하위 Step만 다시 실행합니다.
+    (결과는 저장소에 기록되어 다음 실행의 캐시로 사용됩니다.)
+    """
+    print("🚀 [Pipeline] 증분 실행 모드로 시작합니다.")
+    if not os.path.exists(input_file):
+        print(f"❌ 오류: '{input_file}' 파일이 없습니다.")
+        return None
+
+    sources = {'raw': (hash_file(input_file), lambda: pii_masking.load_raw(input_file))}
+    graph = build_stage_graph(bootstrap=bootstrap, workers=workers, permutations=permutations,
+                              select_models=select_models)
+    results = run_graph(graph, sources, force=force)
+
+    if excel:
+        for step, frames in results.items():
+            if step in EXCEL_OUTPUTS:
+                export_step_excel(step, frames)
+    return results
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="고교 배정 분석 전체 파이프라인 (단일 프로세스)")
+    parser.add_argument("--input", default=pii_masking.INPUT_FILE, help="원본 배정 엑셀 경로")
+    parser.add_argument("--save-intermediate", action="store_true",
+                        help="각 Step 결과를 저장소(Parquet)에 기록 (감사용)")
+    parser.add_argument("--excel", action="store_true", help="각 Step 결과를 엑셀 워크북으로 내보내기")
+    parser.add_argument("--incremental", action="store_true",
+                        help="입력/파라미터/코드가 바뀐 Step만 다시 실행 (결과는 저장소에 캐시)")
+    parser.add_argument("--force", action="store_true", help="증분 실행 캐시를 무시하고 전체 재실행")
+    parser.add_argument("--bootstrap", type=int, nargs="?", const=bootstrap_reliability.BOOTSTRAP_REPLICATES,
+                        default=0, metavar="N", help="Step3-Sub 학생 단위 부트스트랩 반복 수 (신뢰구간/군집 안정성)")
+    parser.add_argument("--permutations", type=int, nargs="?", const=permutation_test.PERMUTATIONS,
+                        default=0, metavar="N", help="Step3 거주지-배정학교 독립성 순열 검정 반복 수")
+    parser.add_argument(model_selection.SELECT_FLAG, dest="select_models", action="store_true",
+                        help="K-Means / GMM 군집 수를 후보 탐색으로 결정 (같은 입력이면 저장된 모델 재사용)")
+    parser.add_argument("--workers", type=int, help="부트스트랩 / 순열 검정 / 모델 탐색 프로세스 수 (기본: CPU 수)")
+    return add_instrumentation_args(parser)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.incremental:
+        return run_incremental(args.input, force=args.force, excel=args.excel,
+                               bootstrap=args.bootstrap, workers=args.workers, permutations=args.permutations,
+                               select_models=args.select_models)
+    return run_pipeline(args.input, save_intermediate=args.save_intermediate, excel=args.excel,
+                        bootstrap=args.bootstrap, workers=args.workers, permutations=args.permutations,
+                        select_models=args.select_models)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import hmac
+import os
+import secrets
+
+# ==========================================
+# [설정] 가명화 키 및 토큰 길이
+# ==========================================
+# 같은 키(salt)를 쓰면 같은 값은 항상 같은 토큰이 됩니다 (연도별/재실행 간 결합 가능).
+# 키 파일은 절대 외부에 공유하거나 git에 올리지 마십시오.
+SALT_FILE = os.path.join("data", "reference", "pseudonym_salt.key")
+TOKEN_LENGTH = 12      # 토큰 16진수 길이 (4자리는 충돌이 잦으므로 12자리 이상 권장)
+TOKEN_PREFIX = "MASK"
+# ==========================================
+
+def load_salt(path=SALT_FILE):
+    """가명화 키를 읽습니다. 파일이 없으면 새로 생성합니다."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            salt = f.read().strip()
+        if not salt:
+            raise ValueError(f"가명화 키 파일이 비어 있습니다: {path}")
+        return salt
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    salt = secrets.token_hex(32).encode("ascii")
+    with open(path, "wb") as f:
+        f.write(salt)
+    print(f"🔑 새 가명화 키를 생성했습니다: {path} (다음 실행부터 같은 키를 재사용)")
+    return salt
+
+def digest(value, salt):
+    """값 1개에 대한 HMAC-SHA256 16진수 다이제스트"""
+    return hmac.new(salt, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+
+def make_token(value, salt, length=TOKEN_LENGTH, prefix=TOKEN_PREFIX):
+    """값 1개에 대한 HMAC-SHA256 기반 토큰을 만듭니다."""
+    return f"{prefix}_{digest(value, salt)[:length].upper()}"
+
+def new_collision_tracker():
+    """
+    충돌 점검기: 컬럼별로 고유값 다이제스트 앞 64비트만 모아 둡니다. (값 1개당 8바이트)
+    청크 단위로 가명화할 때도 전체 파일 기준의 충돌을 확인할 수 있습니다.
+    """
+    return {}
+
+def collision_report(tracker, length=TOKEN_LENGTH):
+    """컬럼별 고유값 수 / 충돌 토큰 수 (서로 다른 값이 같은 토큰을 받은 경우)"""
+    report = []
+    for col, parts in tracker.items():
+        keys = np.unique(np.concatenate(parts)) if parts else np.array([], dtype=np.uint64)
+        if length < 16:
+            tokens, counts = np.unique(keys >> np.uint64(64 - 4 * length), return_counts=True)
+            n_collide = int((counts > 1).sum())
+        else:
+            n_collide = 0   # 64비트 이상 토큰은 충돌 확률이 무시할 수준
+        report.append({'컬럼': col, '고유값수': len(keys), '충돌토큰수': n_collide})
+        if n_collide > 0:
+            print(f"⚠ '{col}' 컬럼에서 토큰 충돌 {n_collide}건 발생 → TOKEN_LENGTH를 늘리세요.")
+    return pd.DataFrame(report, columns=['컬럼', '고유값수', '충돌토큰수'])
+
+def pseudonymize_column(series, salt, length=TOKEN_LENGTH, prefix=TOKEN_PREFIX):
+    """
+    컬럼 전체를 한 번에 가명화합니다.
+    고유값마다 한 번만 해시를 계산하고, 정수 코드로 원래 행에 다시 펼칩니다.
+    반환: (가명화된 Series, 고유값 다이제스트 앞 64비트 배열)
+    """
+    codes, uniques = pd.factorize(series)
+    digests = [digest(v, salt) for v in uniques]
+    tokens = np.array([f"{prefix}_{d[:length].upper()}" for d in digests], dtype=object)
+    keys = np.array([int(d[:16], 16) for d in digests], dtype=np.uint64)
+
+    masked = np.full(len(series), np.nan, dtype=object)  # 결측값은 결측 그대로 유지
+    valid = codes >= 0
+    masked[valid] = tokens[codes[valid]]
+    return pd.Series(masked, index=series.index, name=series.name), keys
+
+def pseudonymize_frame(df, columns, salt=None, length=TOKEN_LENGTH, prefix=TOKEN_PREFIX, tracker=None):
+    """
+    지정한 PII 컬럼들을 가명화하고, 컬럼별 충돌 현황을 보고합니다.
+    tracker를 넘기면 (청크 단위 처리) 다이제스트만 누적하고 보고서는 None을 반환합니다.
+    """
+    salt = salt if salt is not None else load_salt()
+    own_tracker = tracker is None
+    tracker = new_collision_tracker() if own_tracker else tracker
+    for col in columns:
+        df[col], keys = pseudonymize_column(df[col], salt, length, prefix)
+        tracker.setdefault(col, []).append(keys)
+    return df, (collision_report(tracker, length) if own_tracker else None)
@@ -0,0 +1,338 @@
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qsl, unquote
+import flow_matrix
+from artifact_store import load_frame, has_frame
+
+# ==========================================
+# [설정] 로컬 조회 서비스 (HTTP / JSON, 오프라인)
+# ==========================================
+# Step2 / Step4 결과(학교 통계, 동네 만족도, 동네 x 학교 흐름, 엔트로피, 중심성)를 시작할 때 한 번만 읽어
+# 학교 / 동네 이름으로 색인하고, 요청은 메모리에서만 답합니다. (요청마다 엑셀 / 저장소를 다시 읽지 않음)
+#   - 저장소(Parquet)를 우선 읽고, 없으면 Step2 / Step4 엑셀을 시작할 때 한 번 읽음
+#   - 같은 요청(경로 + 인자)의 응답 JSON은 LRU 캐시에 보관
+#   - asyncio 서버 1개 프로세스 (표준 라이브러리만 사용, 외부 네트워크 불필요)
+# 조회 예: /dongs/A동, /dongs/A동/schools?k=3, /schools/가고등학교/feeders?k=5,
+#          /top/schools?metric=실질경쟁률&k=5, /top/dongs?metric=1지망_성공률(%)&order=asc, /flow?dong=A동&school=가고등학교
+HOST = "127.0.0.1"              # 로컬 전용 (다른 PC에서 접속하려면 --host 0.0.0.0)
+PORT = 8765
+QUERY_CACHE_SIZE = 4096         # LRU 캐시에 보관할 응답 수
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 100
+KEEPALIVE_SEC = 15              # 연결 유지(keep-alive) 중 다음 요청을 기다리는 시간
+
+RESEARCH_STEP = "step2"
+ADVANCED_STEP = "step4"
+RESEARCH_EXCEL = os.path.join("data", "processed", "Step2_지망선호도_및_지역흐름.xlsx")
+ADVANCED_EXCEL = os.path.join("data", "processed", "Step4_대학원수준_심층분석.xlsx")
+CENTRALITY_COLS = ['중심성_지수', 'PageRank', 'HITS_허브', 'HITS_권위']
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+# ==========================================
+
+# ---------------------------------------------------------
+# 데이터 로드 / 색인 (시작할 때 한 번)
+# ---------------------------------------------------------
+def read_frame(step, name, excel, index_col=None):
+    """저장소에서 우선 읽고, 없으면 엑셀 시트 (둘 다 없으면 None, excel=None이면 저장소만)"""
+    if has_frame(step, name):
+        return load_frame(step, name)
+    if excel is not None and os.path.exists(excel):
+        try:
+            return pd.read_excel(excel, sheet_name=name, index_col=index_col)
+        except ValueError:   # 시트 없음
+            return None
+    return None
+
+def _keyed(df, key):
+    """key 컬럼(또는 인덱스)을 인덱스로"""
+    if df is None:
+        return None
+    return df.set_index(key) if key in df.columns else df.rename_axis(key)
+
+def _centrality(df, kind, key):
+    if df is None or '구분' not in df.columns:
+        return None
+    part = df[df['구분'] == kind].set_index('ID')
+    return part[[c for c in CENTRALITY_COLS if c in part.columns]].rename_axis(key)
+
+def _join(table, extra):
+    if extra is None:
+        return table
+    return table.join(extra[[c for c in extra.columns if c not in table.columns]], how='left')
+
+def load_index(partition=None):
+    """
+    Step2 / Step4 결과 -> 조회 색인 (Step2가 없으면 None)
+    partition: 연도별 파티션 (예: 'year=2025', multi_year 저장소. 이때는 기본 엑셀로 대신하지 않음)
+    """
+    step2 = os.path.join(partition, RESEARCH_STEP) if partition else RESEARCH_STEP
+    step4 = os.path.join(partition, ADVANCED_STEP) if partition else ADVANCED_STEP
+    research_excel = None if partition else RESEARCH_EXCEL
+    advanced_excel = None if partition else ADVANCED_EXCEL
+    research_where = f"저장소 {step2}" + (f" 또는 {research_excel}" if research_excel else "")
+    advanced_where = f"저장소 {step4}" + (f" 또는 {advanced_excel}" if advanced_excel else "")
+
+    schools = _keyed(read_frame(step2, '연구1_학교별_인기도', research_excel), '배정고등학교')
+    dongs = _keyed(read_frame(step2, '연구2_동네별_만족도', research_excel), '행정동')
+    if schools is None or dongs is None:
+        print(f"❌ Step2 결과가 없습니다: {research_where}")
+        return None
+    if flow_matrix.has_flow(step2):
+        flow = flow_matrix.load_flow(step2)
+    else:
+        dense = read_frame(step2, '부록_동네_학교_전체매트릭스', research_excel, index_col=0)
+        if dense is None:
+            print(f"❌ Step2 흐름표가 없습니다: {research_where}")
+            return None
+        flow = flow_matrix.from_dense(dense)
+
+    typology = _keyed(read_frame(step4, '1_학교_고급유형화', advanced_excel), '배정고등학교')
+    inclusion = _keyed(read_frame(step4, '2_학교_수용다양성', advanced_excel), '배정고등학교')
+    entropy = _keyed(read_frame(step4, '2_지역_배정다양성', advanced_excel), '행정동')
+    centrality = read_frame(step4, '3_네트워크_중심성', advanced_excel)
+    if centrality is None:
+        print(f"⚠ Step4 결과가 없어 엔트로피 / 중심성 없이 시작합니다: {advanced_where}")
+
+    for extra in [typology, inclusion, _centrality(centrality, '학교', '배정고등학교')]:
+        schools = _join(schools, extra)
+    for extra in [entropy, _centrality(centrality, '동네', '행정동')]:
+        dongs = _join(dongs, extra)
+
+    counts = flow['counts'].tocsr()
+    return {
+        'schools': schools,
+        'dongs': dongs,
+        'school_records': _records(schools),
+        'dong_records': _records(dongs),
+        'flow_dongs': {name: i for i, name in enumerate(flow['dongs'])},
+        'flow_schools': {name: j for j, name in enumerate(flow['schools'])},
+        'flow_labels': (list(flow['dongs']), list(flow['schools'])),
+        'by_dong': counts,             # 행(동네) 단위 조회
+        'by_school': counts.tocsc(),   # 열(학교) 단위 조회
+        'source': partition or "기본",
+        'loaded_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def _records(table):
+    """표 -> {이름: 레코드} (NaN은 null, numpy 값은 파이썬 값으로)"""
+    rows = json.loads(table.to_json(orient='index', force_ascii=False))
+    return {str(name): row for name, row in rows.items()}
+
+# ---------------------------------------------------------
+# 조회 (메모리 색인만 사용)
+# ---------------------------------------------------------
+_index = {}
+
+def not_found(message):
+    return 404, {'error': message}
+
+def _top_k(params):
+    """k 인자 (잘못된 값이면 ValueError -> 400 응답)"""
+    try:
+        k = int(params.get('k', DEFAULT_TOP_K))
+    except ValueError:
+        raise ValueError(f"k는 정수여야 합니다: {params.get('k')}")
+    if not 1 <= k <= MAX_TOP_K:
+        raise ValueError(f"k는 1~{MAX_TOP_K} 사이여야 합니다.")
+    return k
+
+def _flow_top(matrix, position, labels, key, k):
+    """희소 행(또는 열) 1개 -> 인원 상위 k개 [{key, 인원, 비율(%)}]"""
+    if position is None:
+        return []
+    part = matrix[position] if key == '배정고등학교' else matrix[:, position]
+    part = part.tocoo()
+    values, codes = part.data, (part.col if key == '배정고등학교' else part.row)
+    total = values.sum()
+    order = np.lexsort((codes, -values))[:k]   # 인원 많은 순 (같으면 이름 순서)
+    return [{key: labels[codes[i]], '인원': int(values[i]), '비율(%)': round(values[i] / total * 100, 1)}
+            for i in order]
+
+def dong_schools(name, k):
+    """동네 학생들이 배정된 학교 상위 k개"""
+    index = _index['flow_dongs'].get(name)
+    return _flow_top(_index['by_dong'], index, _index['flow_labels'][1], '배정고등학교', k)
+
+def school_feeders(name, k):
+    """학교에 학생을 보낸 동네 상위 k개"""
+    index = _index['flow_schools'].get(name)
+    return _flow_top(_index['by_school'], index, _index['flow_labels'][0], '행정동', k)
+
+def top_table(kind, params):
+    """지표 상위 / 하위 k개 (order=desc 기본, asc는 낮은 순)"""
+    table = _index['schools'] if kind == 'schools' else _index['dongs']
+    key = '배정고등학교' if kind == 'schools' else '행정동'
+    metric = params.get('metric')
+    numeric = [c for c in table.columns if pd.api.types.is_numeric_dtype(table[c])]
+    if metric not in numeric:
+        raise ValueError(f"metric은 다음 중 하나여야 합니다: {', '.join(numeric)}")
+    order = params.get('order', 'desc')
+    if order not in ('desc', 'asc'):
+        raise ValueError("order는 desc 또는 asc입니다.")
+    k = _top_k(params)
+    values = table[metric].dropna()
+    picked = values.nlargest(k) if order == 'desc' else values.nsmallest(k)
+    return {'metric': metric, 'order': order,
+            'items': [{key: str(name), metric: _index[f"{kind[:-1]}_records"][str(name)][metric]} for name in picked.index]}
+
+def health():
+    """서비스 상태 + 응답 캐시 통계 (캐시하지 않음)"""
+    return {'status': "ok", 'source': _index['source'], 'loaded_at': _index['loaded_at'],
+            'schools': len(_index['school_records']), 'dongs': len(_index['dong_records']),
+            'cache': cached_response.cache_info()._asdict()}
+
+def route(path, params):
+    """경로 + 인자 -> (상태 코드, 응답 dict). 잘못된 인자는 ValueError"""
+    parts = [unquote(p) for p in path.strip("/").split("/") if p]
+    if not parts:
+        return not_found(f"없는 경로입니다: {path}")
+
+    if parts[0] in ('schools', 'dongs'):
+        kind = parts[0]
+        records = _index['school_records'] if kind == 'schools' else _index['dong_records']
+        if len(parts) == 1:
+            return 200, {kind: sorted(records)}
+        name = parts[1]
+        if name not in records:
+            return not_found(f"없는 {'학교' if kind == 'schools' else '행정동'}입니다: {name}")
+        related = school_feeders if kind == 'schools' else dong_schools
+        label = 'feeders' if kind == 'schools' else 'schools'
+        if len(parts) == 2:
+            return 200, {'name': name, **records[name], label: related(name, _top_k(params))}
+        if len(parts) == 3 and parts[2] == label:
+            return 200, {'name': name, label: related(name, _top_k(params))}
+
+    if parts[0] == 'top' and len(parts) == 2 and parts[1] in ('schools', 'dongs'):
+        return 200, top_table(parts[1], params)
+
+    if parts == ['flow']:
+        dong, school = params.get('dong'), params.get('school')
+        if dong not in _index['flow_dongs'] or school not in _index['flow_schools']:
+            return not_found(f"흐름표에 없는 동네 / 학교입니다: {dong} / {school}")
+        count = _index['by_dong'][_index['flow_dongs'][dong], _index['flow_schools'][school]]
+        return 200, {'행정동': dong, '배정고등학교': school, '인원': int(count)}
+
+    return not_found(f"없는 경로입니다: {path}")
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def cached_response(path, query):
+    """(경로, 정렬된 인자 튜플) -> (상태 코드, JSON 바이트). 같은 요청은 캐시에서 바로 반환"""
+    try:
+        status, payload = route(path, dict(query))
+    except ValueError as e:
+        status, payload = 400, {'error': str(e)}
+    return status, _json(payload)
+
+def respond(target):
+    """요청 대상(URL) -> (상태 코드, JSON 바이트)"""
+    url = urlsplit(target)
+    if url.path.strip("/") in ('', 'health'):
+        return 200, _json(health())
+    return cached_response(url.path, tuple(sorted(parse_qsl(url.query))))
+
+def use_index(index):
+    """조회 색인 교체 (이전 응답 캐시는 비움)"""
+    _index.clear()
+    _index.update(index)
+    cached_response.cache_clear()
+
+# ---------------------------------------------------------
+# HTTP 서버 (asyncio)
+# ---------------------------------------------------------
+def http_response(status, body, keep_alive, head_only=False):
+    headers = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + (b"" if head_only else body)
+
+async def read_request(reader):
+    """요청 줄 + 헤더 -> (메서드, 대상, 버전, 헤더 dict) / 연결이 끝났으면 None"""
+    line = await asyncio.wait_for(reader.readline(), KEEPALIVE_SEC)
+    if not line:
+        return None
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        return "", "", "", headers
+    return parts[0], parts[1], parts[2], headers
+
+async def handle_client(reader, writer):
+    """연결 1개: keep-alive로 요청을 여러 개 처리 (요청 본문은 받지 않음 - GET / HEAD만 지원)"""
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            method, target, version, headers = request
+            keep_alive = version == "HTTP/1.1" and headers.get('connection', "").lower() != "close"
+            if method in ("GET", "HEAD"):
+                status, body = respond(target)
+            else:
+                status, body = (405, _json({'error': "GET / HEAD만 지원합니다."})) if method else \
+                               (400, _json({'error': "잘못된 요청입니다."}))
+                keep_alive = False   # 본문이 있을 수 있으므로 연결을 닫음
+            writer.write(http_response(status, body, keep_alive, method == "HEAD"))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass   # 유휴 연결 / 비정상 종료 / 너무 긴 줄
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve_forever(host, port):
+    server = await asyncio.start_server(handle_client, host, port)
+    print(f"🌐 조회 서비스 시작: http://{host}:{port}/health  (종료: Ctrl+C)")
+    async with server:
+        await server.serve_forever()
+
+def run_service(host=HOST, port=PORT, partition=None):
+    print("🔎 [Query Service] Step2 / Step4 결과를 읽어 조회 색인을 만듭니다.")
+    index = load_index(partition)
+    if index is None:
+        return None
+    use_index(index)
+    print(f"   - 학교 {len(index['school_records'])}개, 동네 {len(index['dong_records'])}개, "
+          f"흐름 {index['by_dong'].nnz}칸 (응답 캐시 {QUERY_CACHE_SIZE}개)")
+    try:
+        asyncio.run(serve_forever(host, port))
+    except KeyboardInterrupt:
+        print("\n✅ 조회 서비스를 종료했습니다.")
+    return index
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Step2 / Step4 결과 로컬 조회 서비스 (HTTP / JSON)")
+    parser.add_argument("--host", default=HOST, help="바인드 주소 (기본: 로컬 전용)")
+    parser.add_argument("--port", type=int, default=PORT, help="포트")
+    parser.add_argument("--partition", help="연도별 저장소 파티션 (예: year=2025)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run_service(args.host, args.port, args.partition)
+
+if __name__ == "__main__":
+    main()
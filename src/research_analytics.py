@@ -1,66 +1,96 @@
 import pandas as pd
 import os
+from artifact_store import load_frame, has_frame, save_step, export_excel, wants_excel_export
+from flow_matrix import to_long, from_long, to_dense, top_k_table, FLOW_FRAME
+from aggregate_cube import (
+    build_cube, load_cube, rollup, first_choice_table, flow_from_cube,
+    ASSIGN_CUBE, APPLY_CUBE, CHOICE_SCHOOL_COL, CHOICE_RANK_COL, RANK_COL,
+)
+from schema_manifest import (
+    load_schema, excel_schema, resolve_schema, field_columns, choice_columns,
+    FIELD_DONG, FIELD_ASSIGNED, FIELD_GENDER, FIELD_CHOICE,
+)
+from instrumentation import instrument
 
 # ==========================================
 # [설정] 파일명 (마스킹 등 전처리가 끝난 파일 권장하지만 원본도 가능)
 # ==========================================
 INPUT_FILE = os.path.join("data", "processed", "Step1_전처리_익명화_마스터.xlsx") # 또는 마스킹된 파일
-OUTPUT_FILE = os.path.join("data", "processed", "Step2_지망선호도_및_지역흐름.xlsx")
-
-# 분석용 핵심 컬럼 키워드
-KEY_DONG = "행정동"       # 주소(동)
-KEY_DISTRICT = "자치구"   # 주소(구)
-KEY_ASSIGNED = "배정"     # 배정 학교
-KEY_CHOICE_1 = "1지망"    # 1지망
-KEY_CHOICE_2 = "2지망"    # 2지망
-# ==========================================
-
-def find_col(df, keyword):
-    """키워드가 포함된 첫 번째 컬럼명을 반환"""
-    cols = [c for c in df.columns if keyword in str(c)]
-    return cols[0] if cols else None
-
-def find_all_cols(df, keyword):
-    """키워드가 포함된 모든 컬럼명을 반환"""
-    return [c for c in df.columns if keyword in str(c)]
+OUTPUT_FILE = os.path.join("data", "processed", "Step2_지망선호도_및_지역흐름.xlsx") # 엑셀 내보내기(--excel) 시
+INPUT_STEP = "step1"   # 저장소에 Step1 산출물이 있으면 엑셀 대신 사용
+STEP_NAME = "step2"
 
-def run_research():
-    print("🔬 고교 배정 영향 요인 심층 연구를 시작합니다...")
+# 분석용 핵심 컬럼 (스키마 매니페스트의 논리 필드) - 보안_RawData에서 이 컬럼만 읽음
+# (성별 / 배정순위는 Step1 큐브가 없을 때 여기서 큐브를 다시 만들기 위해 필요)
+LOAD_FIELDS = [FIELD_DONG, FIELD_ASSIGNED, FIELD_GENDER, FIELD_CHOICE]
+LOAD_EXTRA = [RANK_COL]
 
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ 파일 없음: {INPUT_FILE}")
-        return
+# 엑셀 내보내기 시 희소 흐름표를 펼쳐서 기록할 시트명 (저장소에는 희소 형태로만 보관)
+DENSE_MATRIX_SHEET = "부록_동네_학교_전체매트릭스"
+# ==========================================
 
+@instrument()
+def load_masked():
+    """Step1 마스킹 데이터(보안_RawData)를 읽습니다. (실패 시 None)"""
     try:
-        # PII masking 결과 파일의 '보안_RawData' 시트를 읽어야 함
-        # 시트 이름이 없을 경우(원본 파일 사용 시)를 대비해 try-except 또는 기본값 처리
-        try:
-            df = pd.read_excel(INPUT_FILE, sheet_name='보안_RawData')
-        except:
-            print("⚠ '보안_RawData' 시트가 없어 첫 번째 시트를 읽습니다.")
-            df = pd.read_excel(INPUT_FILE)
+        # Step1 저장소 산출물(Parquet)을 우선 사용하고, 없을 때만 엑셀을 읽음
+        if has_frame(INPUT_STEP, '보안_RawData'):
+            schema = load_schema(INPUT_STEP, '보안_RawData')   # 필요한 컬럼만 읽음
+            df = load_frame(INPUT_STEP, '보안_RawData', columns=field_columns(schema, LOAD_FIELDS, LOAD_EXTRA))
+        elif not os.path.exists(INPUT_FILE):
+            print(f"❌ 파일 없음: {INPUT_FILE}")
+            return None
+        else:
+            # PII masking 결과 파일의 '보안_RawData' 시트를 읽어야 함
+            # 시트 이름이 없을 경우(원본 파일 사용 시)를 대비해 try-except 또는 기본값 처리
+            try:
+                schema = excel_schema(INPUT_FILE, '보안_RawData')
+                df = pd.read_excel(INPUT_FILE, sheet_name='보안_RawData',
+                                   usecols=field_columns(schema, LOAD_FIELDS, LOAD_EXTRA))
+            except:
+                print("⚠ '보안_RawData' 시트가 없어 첫 번째 시트를 읽습니다.")
+                df = pd.read_excel(INPUT_FILE)
             
     except Exception as e:
         print(f"❌ 로드 실패: {e}")
-        return
-
-    # 공백 제거
-    # for col in df.select_dtypes(include=['object']).columns: (Old way)
-    # New way compatible with future pandas:
-    object_cols = df.select_dtypes(include=['object']).columns
-    if len(object_cols) > 0:
-         df[object_cols] = df[object_cols].astype(str).apply(lambda x: x.str.strip())
+        return None
+    return df
+
+@instrument()
+def analyze_research(df, cube=None, schema=None):
+    """
+    마스킹된 학생 DataFrame -> Step2 산출물 {시트명: DataFrame} (파일 입출력 없음, 실패 시 None)
+    cube: Step1 집계 큐브 (있으면 학생 테이블은 컬럼명 확인에만 사용, 없으면 여기서 생성)
+    schema: 스키마 매니페스트 (없으면 컬럼명으로 해석)
+    입력 DataFrame은 변경하지 않습니다. (얕은 복사 후 컬럼 단위로만 교체)
+    """
+    if cube is None:
+        df = df.copy(deep=False)
+
+        # 공백 제거
+        # for col in df.select_dtypes(include=['object']).columns: (Old way)
+        # New way compatible with future pandas:
+        object_cols = df.select_dtypes(include=['object']).columns
+        if len(object_cols) > 0:
+             df[object_cols] = df[object_cols].astype(str).apply(lambda x: x.str.strip())
+
+        # 학교/동네 컬럼을 정수 코드(Categorical)로 바꾼 뒤 집계 큐브 생성 (학생 단위 스캔은 여기서 한 번만)
+        cube = build_cube(df)
+        if cube is None:
+            return None
+    assigned, applied = cube[ASSIGN_CUBE], cube[APPLY_CUBE]
 
     print(f"DEBUG: Loaded Columns: {list(df.columns)}") # Debug print
 
-    # 컬럼 매핑
-    col_dong = find_col(df, KEY_DONG)
-    col_assigned = find_col(df, KEY_ASSIGNED)
-    cols_1st = find_all_cols(df, KEY_CHOICE_1)
+    # 컬럼 매핑 (매니페스트의 논리 필드 -> 실제 컬럼)
+    schema = schema or resolve_schema(df.columns)
+    col_dong = schema['fields'][FIELD_DONG]
+    col_assigned = schema['fields'][FIELD_ASSIGNED]
+    cols_1st = choice_columns(schema, ranks=[1]).get(1, [])
     
     if not (col_dong and col_assigned and cols_1st):
         print("⚠ 필수 컬럼(행정동, 배정학교, 1지망)을 찾을 수 없습니다.")
-        return
+        return None
 
     print(f"   - 행정동 기준: {col_dong}")
     print(f"   - 배정학교 기준: {col_assigned}")
@@ -70,28 +100,11 @@ def run_research():
     # ---------------------------------------------------------
     print("📊 1. 학교별 선호도 및 배정 성격 분석 중...")
     
-    # 1지망 지원 건수 계산 (단일/일반 등 모든 1지망 합산)
-    choice_counts = pd.Series(dtype=int)
-    for col in cols_1st:
-        counts = df[col].value_counts()
-        choice_counts = choice_counts.add(counts, fill_value=0)
-    
-    # 배정 유형 판별 (1지망/2지망/미지망) 로직 재사용
-    def get_assign_type(row):
-        school = row[col_assigned]
-        # 1지망 군에 있는가?
-        for c in cols_1st:
-            if row[c] == school: return "1지망"
-        # (2지망 생략하고 미지망 여부만 판단)
-        return "기타(2지망/미지망)"
-
-    df['배정_성격'] = df.apply(get_assign_type, axis=1)
+    # 1지망 지원 건수 계산 (단일/일반 등 모든 1지망 합산) - 지원 큐브의 1지망 조각을 학교별로 합산
+    choice_counts = rollup(applied, [CHOICE_SCHOOL_COL], where={CHOICE_RANK_COL: 1}).astype(float)  # 기존 보고서 표기(실수) 유지
     
-    # 학교별 통계 집계
-    school_stats = df.groupby(col_assigned).agg(
-        실제배정인원=(col_assigned, 'count'),
-        일지망_배정된_사람=('배정_성격', lambda x: (x == '1지망').sum())
-    )
+    # 학교별 통계 집계 - 배정 큐브를 학교별로 합산 (1지망 배정 = 배정순위 1인 조각)
+    school_stats = first_choice_table(assigned, [col_assigned], '실제배정인원', '일지망_배정된_사람')
     
     # 지표 계산
     school_stats['총_1지망_지원자수'] = choice_counts
@@ -109,10 +122,7 @@ def run_research():
     # ---------------------------------------------------------
     print("📊 2. 동네별 배정 만족도(1지망 성공률) 분석 중...")
     
-    dong_stats = df.groupby(col_dong).agg(
-        거주학생수=(col_dong, 'count'),
-        일지망_성공수=('배정_성격', lambda x: (x == '1지망').sum())
-    )
+    dong_stats = first_choice_table(assigned, [col_dong], '거주학생수', '일지망_성공수')
     
     dong_stats['1지망_성공률(%)'] = (dong_stats['일지망_성공수'] / dong_stats['거주학생수'] * 100).round(1)
     
@@ -125,32 +135,48 @@ def run_research():
     # ---------------------------------------------------------
     print("📊 3. 거주지-학교 배정 흐름 매트릭스 생성 중...")
     
-    # 행: 행정동, 열: 학교, 값: 인원수
-    flow_matrix = pd.crosstab(df[col_dong], df[col_assigned])
+    # 행: 행정동, 열: 학교, 값: 인원수 (대부분 0이므로 희소 CSR 행렬로, 배정 큐브를 동네 x 학교로 합산)
+    flow = flow_from_cube(cube, col_dong, col_assigned)
     
     # 보기 좋게: 특정 동네에서 가장 많이 간 학교 TOP 3 찾기
-    dong_top_schools = []
-    for dong in flow_matrix.index:
-        top_schools = flow_matrix.loc[dong].nlargest(3)
-        row_data = {"행정동": dong}
-        for i, (school, count) in enumerate(top_schools.items(), 1):
-            row_data[f"Top{i}_학교"] = school
-            row_data[f"Top{i}_인원"] = count
-        dong_top_schools.append(row_data)
-        
-    dong_flow_summary = pd.DataFrame(dong_top_schools)
+    dong_flow_summary = top_k_table(flow, k=3)
 
 
     # ---------------------------------------------------------
-    # 결과 저장
+    # 결과 묶기 (저장은 호출하는 쪽에서 결정)
     # ---------------------------------------------------------
-    with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-        school_stats.to_excel(writer, sheet_name='연구1_학교별_인기도')
-        dong_stats.to_excel(writer, sheet_name='연구2_동네별_만족도')
-        dong_flow_summary.to_excel(writer, sheet_name='연구3_동네별_주요배정학교')
-        flow_matrix.to_excel(writer, sheet_name='부록_동네_학교_전체매트릭스')
+    frames = {
+        '연구1_학교별_인기도': school_stats,
+        '연구2_동네별_만족도': dong_stats,
+        '연구3_동네별_주요배정학교': dong_flow_summary,
+        FLOW_FRAME: to_long(flow),
+    }
+    return frames
+
+def excel_frames(frames):
+    """엑셀 보고용: 희소 흐름표를 기존 '동네 x 학교' 전체 매트릭스 시트로 펼칩니다."""
+    frames = dict(frames)
+    if FLOW_FRAME in frames:
+        frames[DENSE_MATRIX_SHEET] = to_dense(from_long(frames.pop(FLOW_FRAME)))
+    return frames
+
+@instrument()
+def run_research():
+    print("🔬 고교 배정 영향 요인 심층 연구를 시작합니다...")
+
+    df = load_masked()
+    if df is None:
+        return
+
+    frames = analyze_research(df, cube=load_cube(INPUT_STEP))
+    if frames is None:
+        return
+
+    save_step(STEP_NAME, frames)
+    if wants_excel_export():
+        export_excel(excel_frames(frames), OUTPUT_FILE)
 
-    print(f"\n✅ 연구 완료! 파일 생성됨: {OUTPUT_FILE}")
+    print(f"\n✅ 연구 완료! 결과 저장소: {STEP_NAME}")
     print("1. [학교별_인기도]: 어떤 학교가 'Wannabe'인지, 어디가 '기피'인지 확인하세요.")
     print("2. [동네별_만족도]: 배정이 유독 안 되는 '불운의 동네'가 어디인지 확인하세요.")
     print("3. [동네별_주요배정]: 우리 동네 애들은 주로 어디로 가는지 확인하세요.")
@@ -0,0 +1,151 @@
+import pandas as pd
+import json
+import os
+from artifact_store import STORE_DIR, step_dir, frame_columns
+from assignment_classifier import CHOICE_PATTERN, find_choice_columns
+from stage_graph import hash_file
+
+# ==========================================
+# [설정] 헤더 스키마 (논리 필드 -> 실제 컬럼) 매니페스트
+# ==========================================
+# 원본 파일마다 헤더를 한 번만 해석해(서브헤더 재구성 + 키워드 탐색) 매니페스트(JSON)로 남기고,
+# 이후 Step은 키워드를 다시 찾지 않고 매니페스트에서 필요한 컬럼만 골라 읽습니다.
+#   - 원본 파일: SCHEMA_DIR/<파일 해시 앞 16자리>.json (같은 내용의 파일이면 헤더도 다시 읽지 않음)
+#   - Step1 저장소: store/step1/_schema.json (마스킹 후에도 컬럼명은 같음)
+# 필드: dong / district / assigned / gender (컬럼 1개), choice ({순위: {학교군: 컬럼}}), pii ([컬럼들])
+SCHEMA_DIR = os.path.join(STORE_DIR, "_schema")
+SCHEMA_FILE = "_schema.json"
+HASH_PREFIX = 16
+
+FIELD_DONG = "dong"
+FIELD_DISTRICT = "district"
+FIELD_ASSIGNED = "assigned"
+FIELD_GENDER = "gender"
+FIELD_CHOICE = "choice"
+FIELD_PII = "pii"
+
+# 단일 컬럼 필드 -> 헤더 키워드 (키워드가 포함된 첫 컬럼)
+FIELD_KEYWORDS = {
+    FIELD_DONG: "행정동",
+    FIELD_DISTRICT: "자치구",
+    FIELD_ASSIGNED: "배정고등학교",
+    FIELD_GENDER: "성별",
+}
+# 마스킹 대상 키워드 (헤더에 이 글자가 포함되면 개인정보 컬럼)
+PII_KEYWORDS = ['성명', '이름', '생년월일', '접수번호', '전화', '연락처', '☎']
+SUBHEADER_MARK = "1지망"   # 첫 데이터 행에 이 값이 있으면 서브헤더 행
+# ==========================================
+
+def rebuild_columns(columns, sub_row):
+    """상위 헤더 + 서브헤더 행('1지망', '2지망') -> '상위헤더_서브헤더' 컬럼명 목록"""
+    new_cols = []
+    last_valid_col = ""
+    for col, sub in zip(columns, sub_row):
+        col_str = str(col)
+        sub_str = str(sub) if pd.notna(sub) else ""
+
+        if 'Unnamed' not in col_str:
+            last_valid_col = col_str
+
+        if sub_str:
+            new_cols.append(f"{last_valid_col}_{sub_str}")
+        else:
+            new_cols.append(last_valid_col)
+    return new_cols
+
+def is_subheader(row):
+    """첫 데이터 행이 서브헤더('1지망', '2지망')인지"""
+    return SUBHEADER_MARK in list(row)
+
+def choice_group(col):
+    """지망 컬럼명 -> 학교군 이름 (예: '단일학교군_1지망' -> '단일학교군', 학교군이 없으면 컬럼명 그대로)"""
+    group = CHOICE_PATTERN.sub("", str(col)).strip("_ ")
+    return group or str(col)
+
+def resolve_schema(columns, header_rows=1):
+    """
+    (재구성된) 컬럼 목록 -> 스키마 매니페스트 dict
+    header_rows: 원본 헤더 행 수 (서브헤더가 있으면 2)
+    """
+    columns = list(columns)
+    first = lambda keyword: next((c for c in columns if keyword in str(c)), None)
+    choice = {str(rank): {choice_group(c): c for c in cols}
+              for rank, cols in find_choice_columns(columns).items()}
+    return {
+        'header_rows': header_rows,
+        'columns': columns,
+        'fields': {
+            **{field: first(keyword) for field, keyword in FIELD_KEYWORDS.items()},
+            FIELD_CHOICE: choice,
+            FIELD_PII: [c for c in columns if any(k in str(c) for k in PII_KEYWORDS)],
+        },
+    }
+
+def choice_columns(schema, ranks=None):
+    """매니페스트 -> {순위: [지망 컬럼들]} (find_choice_columns와 같은 형태, ranks로 순위 제한)"""
+    choice = {int(rank): list(groups.values()) for rank, groups in schema['fields'][FIELD_CHOICE].items()}
+    return {rank: cols for rank, cols in sorted(choice.items()) if ranks is None or rank in ranks}
+
+def field_columns(schema, fields, extra=()):
+    """논리 필드 목록 -> 실제 컬럼 목록 (원본 컬럼 순서, 없는 필드는 제외). extra: 추가로 읽을 컬럼명"""
+    wanted = set(extra)
+    for field in fields:
+        if field == FIELD_CHOICE:
+            wanted.update(c for cols in choice_columns(schema).values() for c in cols)
+        elif field == FIELD_PII:
+            wanted.update(schema['fields'][FIELD_PII])
+        elif schema['fields'].get(field) is not None:
+            wanted.add(schema['fields'][field])
+    return [c for c in schema['columns'] if c in wanted] + [c for c in extra if c not in schema['columns']]
+
+# ---------------------------------------------------------
+# 매니페스트 읽기 / 쓰기
+# ---------------------------------------------------------
+def _write_json(path, schema):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def read_schema(input_file):
+    """
+    원본 엑셀 -> 스키마 매니페스트 (파일 내용 해시별로 캐시, 처음 한 번만 헤더 2행을 읽음)
+    매니페스트에는 원본 파일명 / 해시가 함께 기록됩니다.
+    """
+    sha = hash_file(input_file)   # 증분 실행과 같은 파일 해시
+    path = os.path.join(SCHEMA_DIR, f"{sha[:HASH_PREFIX]}.json")
+    if os.path.exists(path):
+        return _read_json(path)
+
+    head = pd.read_excel(input_file, nrows=1)
+    if len(head) and is_subheader(head.iloc[0].values):
+        schema = resolve_schema(rebuild_columns(head.columns, head.iloc[0]), header_rows=2)
+    else:
+        schema = resolve_schema(head.columns)
+    schema = {'source': os.path.basename(input_file), 'sha256': sha, **schema}
+    _write_json(path, schema)
+    return schema
+
+def save_schema(step, schema):
+    """Step 저장소에 매니페스트를 함께 기록합니다. (이후 Step이 컬럼 탐색 없이 필요한 컬럼만 읽음)"""
+    _write_json(os.path.join(step_dir(step), SCHEMA_FILE), schema)
+
+def load_schema(step, frame):
+    """
+    Step 저장소의 매니페스트. 없거나 저장된 표와 컬럼이 맞지 않으면(다른 원본으로 다시 기록된 경우 등)
+    저장된 표의 컬럼명(파일 메타데이터)으로 바로 해석합니다. (데이터는 읽지 않음)
+    """
+    stored = frame_columns(step, frame)
+    path = os.path.join(step_dir(step), SCHEMA_FILE)
+    if os.path.exists(path):
+        schema = _read_json(path)
+        if set(schema['columns']) <= set(stored):
+            return schema
+    return resolve_schema(stored)
+
+def excel_schema(path, sheet_name=0):
+    """엑셀 시트 헤더만 읽어 해석한 매니페스트 (Step1 엑셀 산출물처럼 서브헤더가 없는 표)"""
+    return resolve_schema(pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns)
@@ -0,0 +1,265 @@
+import pandas as pd
+from scipy.stats import pearsonr
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+import os
+from artifact_store import load_frame, has_frame, save_step, export_excel, wants_excel_export
+from flow_matrix import load_flow, from_dense, row_totals, subset, drop_empty, is_empty, chi_square
+from instrumentation import instrument
+from model_selection import select_kmeans, wants_model_selection
+from permutation_test import permutation_columns
+
+# ==========================================
+# [설정] 학교 유형화 / 통계 검증 공용 엔진 (Step3 + Step3-Sub)
+# ==========================================
+# Step3(유형화 및 통계검증)와 Step3-Sub(신뢰도 검증 상세)는 같은 필터 / 군집 / 검정을 사용합니다.
+# 유형화 코어를 한 번만 계산하고, 두 산출물은 이 결과에서 시트만 따로 만듭니다.
+SCHOOL_SHEET = '연구1_학교별_인기도'
+MATRIX_SHEET = '부록_동네_학교_전체매트릭스'
+
+# [중요] 최소 표본 기준 (이 숫자보다 적으면 통계 분석에서 제외)
+MIN_SAMPLE_SCHOOL = 10  # 학교별 최소 배정 인원
+MIN_SAMPLE_DONG = 10    # 동네별 최소 거주 학생 수
+
+FEATURES = ['실질경쟁률', '배정만족도(%)']
+KMEANS_N_INIT = 10
+KMEANS_RANDOM_STATE = 42
+SIGNIFICANCE = 0.05      # 종속성 검정 유의수준
+STRONG_NEGATIVE_R = -0.5 # 이보다 작으면 '강한 음의 상관관계'
+HIGH_SATISFACTION = 90   # 유형C(고만족) 기준 배정만족도(%)
+# ==========================================
+
+@instrument()
+def load_step2(input_step="step2", input_excel=None):
+    """Step2 결과(학교별 인기도, 동네x학교 매트릭스)를 읽습니다. (실패 시 None, None)"""
+    try:
+        # Step2 저장소 산출물(Parquet)을 우선 사용하고, 없을 때만 엑셀을 읽음
+        if has_frame(input_step, SCHOOL_SHEET):
+            df_school = load_frame(input_step, SCHOOL_SHEET).reset_index()
+            flow = load_flow(input_step)   # 희소 동네x학교 흐름표
+        else:
+            if input_excel is None or not os.path.exists(input_excel):
+                print(f"❌ 오류: '{input_excel}' 파일이 폴더에 없습니다.")
+                return None, None
+            # 엑셀 파일의 시트 이름이 정확해야 합니다. (Step2에서 생성한 이름)
+            df_school = pd.read_excel(input_excel, sheet_name=SCHOOL_SHEET)
+            flow = from_dense(pd.read_excel(input_excel, sheet_name=MATRIX_SHEET, index_col=0))
+        print("✔ 데이터 로드 성공!")
+    except Exception as e:
+        print(f"❌ 데이터 로드 실패: {e}")
+        print("   -> 엑셀 파일이 열려있다면 닫고 다시 실행해주세요.")
+        return None, None
+    return df_school, flow
+
+@instrument()
+def compute_typology(df_school, flow, select_models=False, workers=None):
+    """
+    Step2 결과 -> 유형화 코어 (필터 / 군집 / 종속성 / 상관 검정 결과, 실패 시 None)
+    반환 dict:
+      - schools: 유효 학교 표 ('군집_Label' 포함) / cluster_means: 군집별 평균 / kmeans_scores: 모델 탐색 점수표
+      - n_clusters / valid_dongs / common_schools / flow: 원래 흐름표 / chi_flow: 검정에 쓴 흐름표(빈 행/열 제거)
+      - chi: (chi2, p, cramer_v) 또는 None / corr: (r, p) 또는 None / excluded: 제외된 학교 표
+    """
+    # ---------------------------------------------------------
+    # [Pre-Step] 데이터 신뢰도 필터링
+    # ---------------------------------------------------------
+    print(f"\n🔍 데이터 충분성 검사 (기준: 학교 {MIN_SAMPLE_SCHOOL}명, 동네 {MIN_SAMPLE_DONG}명 이상)")
+
+    # 학교 필터링
+    valid_schools = df_school[df_school['실제배정인원'] >= MIN_SAMPLE_SCHOOL].copy()
+    dropped_schools = len(df_school) - len(valid_schools)
+    print(f"   - 학교: 전체 {len(df_school)}개 중 {len(valid_schools)}개 분석 포함 ({dropped_schools}개 제외됨)")
+
+    # 행정동 필터링 (매트릭스에서 행 합계 계산)
+    dong_counts = row_totals(flow)
+    valid_dongs_idx = dong_counts[dong_counts >= MIN_SAMPLE_DONG].index
+
+    # 매트릭스 재구성 (유효한 동네 x 유효한 학교 - 매트릭스에 있는 학교만 교집합으로 선택)
+    valid_school_names = valid_schools['배정고등학교'].unique()
+    common_schools = [s for s in valid_school_names if s in flow['schools']]
+
+    filtered_flow = subset(flow, valid_dongs_idx, common_schools)
+    print(f"   - 행정동: 전체 {len(flow['dongs'])}개 중 {len(valid_dongs_idx)}개 분석 포함")
+
+    if len(valid_schools) < 3 or is_empty(filtered_flow):
+        print("⚠ 경고: 분석할 수 있는 유효 데이터가 너무 적습니다. 기준(MIN_SAMPLE)을 낮춰보세요.")
+        return None
+
+    # ---------------------------------------------------------
+    # [연구 1] K-Means 군집 분석 (유효 학교 대상)
+    # ---------------------------------------------------------
+    print("\n📊 1. 학교 유형화 (Clustering) - 유효 데이터만")
+
+    scaled_features = StandardScaler().fit_transform(valid_schools[FEATURES].fillna(0))
+
+    # 데이터가 적으면 클러스터 수도 줄임 (모델 탐색 사용 시 후보 중 점수가 가장 좋은 군집 수, 같은 입력이면 저장된 모델 재사용)
+    kmeans, kmeans_scores = select_kmeans(scaled_features, workers=workers) if select_models else (None, None)
+    if kmeans is not None:
+        n_clusters = kmeans.n_clusters
+        valid_schools['군집_Label'] = kmeans.labels_
+    else:
+        n_clusters = 3 if len(valid_schools) > 10 else 2
+        kmeans = KMeans(n_clusters=n_clusters, random_state=KMEANS_RANDOM_STATE, n_init=KMEANS_N_INIT)
+        valid_schools['군집_Label'] = kmeans.fit_predict(scaled_features)
+
+    cluster_means = valid_schools.groupby('군집_Label')[FEATURES].mean().reset_index()
+
+    # ---------------------------------------------------------
+    # [연구 2] 카이제곱 검정 (유효 동네 x 유효 학교)
+    # ---------------------------------------------------------
+    print("📊 2. 거주지-배정학교 종속성 검정 (Filtered)")
+
+    chi_flow = drop_empty(filtered_flow)   # 학생이 없는 학교(열) 제외
+    chi = None
+    if not is_empty(chi_flow):
+        # 희소 행렬에서 바로 계산 (0이 아닌 칸만 사용)
+        chi2, p, dof, cramer_v = chi_square(chi_flow)
+        chi = (chi2, p, cramer_v)
+
+    # ---------------------------------------------------------
+    # [연구 3] 상관관계 분석 (가중치 고려 없이 유효 데이터만)
+    # ---------------------------------------------------------
+    print("📊 3. 경쟁률-만족도 상관관계 (Filtered)")
+
+    corr = tuple(pearsonr(valid_schools[FEATURES[0]], valid_schools[FEATURES[1]])) if len(valid_schools) > 2 else None
+
+    return {
+        'schools': valid_schools,
+        'cluster_means': cluster_means,
+        'kmeans_scores': kmeans_scores,
+        'n_clusters': n_clusters,
+        'valid_dongs': valid_dongs_idx,
+        'common_schools': common_schools,
+        'flow': flow,
+        'chi_flow': chi_flow,
+        'chi': chi,
+        'corr': corr,
+        # 제외된 학교 목록 (참고용)
+        'excluded': df_school[~df_school.index.isin(valid_schools.index)],
+    }
+
+def name_clusters(cluster_means, names):
+    """
+    군집별 평균 -> '유형_특성' 컬럼이 붙은 군집 요약
+    names: {'A': 고경쟁_아쉬움, 'B': 안정_만족, 'C': 고만족_적정, 'D': 복합형} 유형 이름
+    """
+    summary = cluster_means.copy()
+    mean_comp = summary['실질경쟁률'].mean()
+    mean_sat = summary['배정만족도(%)'].mean()
+
+    def name_cluster(row):
+        comp = row['실질경쟁률']
+        sat = row['배정만족도(%)']
+        if comp > mean_comp and sat < mean_sat: return names['A']
+        elif comp < mean_comp and sat > mean_sat: return names['B']
+        elif sat > HIGH_SATISFACTION: return names['C']
+        else: return names['D']
+
+    summary['유형_특성'] = summary.apply(name_cluster, axis=1)
+    return summary
+
+def label_schools(core, names):
+    """유형화 코어 -> (유효 학교 표 + '분석_학교유형', 군집 요약 + '유형_특성')"""
+    cluster_summary = name_clusters(core['cluster_means'], names)
+    label_map = dict(zip(cluster_summary['군집_Label'], cluster_summary['유형_특성']))
+    schools = core['schools'].copy()
+    schools['분석_학교유형'] = schools['군집_Label'].map(label_map)
+    return schools, cluster_summary
+
+def typology_frames(core, names, messages, perm=None):
+    """
+    유형화 코어 -> 공통 산출물 {시트명: DataFrame} (1_유형화 / 1_군집요약 / 2_종속성검정 / 3_상관관계)
+    names: 군집 유형 이름 (name_clusters 참고)
+    messages: 결론 문구 {'chi_significant', 'chi_random', 'chi_empty', 'corr_strong', 'corr_weak', 'corr_empty'}
+    perm: 순열 검정 결과 (있으면 결론은 순열 p-value 기준, 통계량/순열 p-value 컬럼 추가)
+    """
+    schools, cluster_summary = label_schools(core, names)
+
+    if core['chi'] is not None:
+        chi2, p, cramer_v = core['chi']
+        p_judge = perm['p_chi2'] if perm else p
+        chi_msg = messages['chi_significant'] if p_judge < SIGNIFICANCE else messages['chi_random']
+    else:
+        chi2, p, cramer_v, chi_msg = 0, 1, 0, messages['chi_empty']
+
+    chi_result = pd.DataFrame({
+        "분석 대상": [f"동네 {len(core['valid_dongs'])}개 x 학교 {len(core['common_schools'])}개"],
+        "P-value": [p],
+        "결론": [chi_msg],
+        "연관성 강도(V)": [cramer_v],
+        **(permutation_columns(perm) if perm else {}),
+    })
+
+    if core['corr'] is not None:
+        corr, p_val = core['corr']
+        corr_msg = messages['corr_strong'] if corr < STRONG_NEGATIVE_R else messages['corr_weak']
+    else:
+        corr, p_val, corr_msg = 0, 1, messages['corr_empty']
+
+    corr_result = pd.DataFrame({
+        "분석 학교 수": [len(schools)],
+        "상관계수(r)": [corr],
+        "P-value": [p_val],
+        "해석": [corr_msg]
+    })
+
+    frames = {
+        '1_유형화(신뢰데이터)': schools.sort_values('군집_Label').reset_index(drop=True),
+        '1_군집요약': cluster_summary,
+        '2_종속성검정_결과': chi_result,
+        '3_상관관계_결과': corr_result,
+    }
+    if core['kmeans_scores'] is not None:
+        frames['1_KMeans_모델선택'] = core['kmeans_scores']
+    return frames
+
+@instrument()
+def typology_outputs(df_school, flow, permutations=0, bootstrap=0, workers=None, select_models=False):
+    """
+    Step2 결과 -> {step3: 산출물, step3_sub: 산출물} (유형화 코어는 한 번만 계산, 실패 시 None)
+    permutations / bootstrap: Step3 순열 검정 / Step3-Sub 부트스트랩 반복 수 (0이면 생략)
+    """
+    # 두 Step 모듈이 이 엔진을 가져다 쓰므로 실행 시점에 가져옴 (순환 import 방지)
+    import statistical_deep_research
+    import stat_reliability
+
+    core = compute_typology(df_school, flow, select_models, workers)
+    if core is None:
+        return None
+    return {
+        statistical_deep_research.STEP_NAME: statistical_deep_research.frames_from_typology(core, permutations, workers),
+        stat_reliability.STEP_NAME: stat_reliability.frames_from_typology(core, bootstrap, workers),
+    }
+
+@instrument()
+def run_typology():
+    """Step3 + Step3-Sub를 한 번에 실행합니다. (--permutations / --bootstrap / --workers / --select-models)"""
+    import statistical_deep_research
+    import stat_reliability
+    from permutation_test import permutation_options
+    from bootstrap_reliability import bootstrap_options
+
+    print("🔬 학교 유형화 및 통계 검증(Step3 + 신뢰도 상세)을 시작합니다...")
+    df_school, flow = load_step2(statistical_deep_research.INPUT_STEP, statistical_deep_research.INPUT_EXCEL)
+    if df_school is None:
+        return
+
+    n_perm, workers = permutation_options()
+    n_reps, _ = bootstrap_options()
+    outputs = typology_outputs(df_school, flow, n_perm, n_reps, workers, wants_model_selection())
+    if outputs is None:
+        return
+
+    excel_files = {
+        statistical_deep_research.STEP_NAME: statistical_deep_research.OUTPUT_FILE,
+        stat_reliability.STEP_NAME: stat_reliability.OUTPUT_FILE,
+    }
+    for step, frames in outputs.items():
+        save_step(step, frames)
+        if wants_excel_export():
+            export_excel(frames, excel_files[step])
+
+    print(f"\n✅ 분석 완료! 결과 저장소: {', '.join(outputs)}")
+
+if __name__ == "__main__":
+    run_typology()
@@ -0,0 +1,126 @@
+import pandas as pd
+import numpy as np
+from itertools import combinations
+from assignment_classifier import find_choice_columns
+from coded_table import ensure_coded
+from aggregate_cube import rollup, APPLY_CUBE, CHOICE_SCHOOL_COL, CHOICE_RANK_COL, DENSE_KEY_LIMIT
+
+# ==========================================
+# [설정] 세그먼트별 지망 선호도 (성별 / 자치구 / 성별 x 자치구 ...)
+# ==========================================
+# 세그먼트 컬럼 조합 x 지망학교별 지원 건수를 한 번의 집계로 구한 뒤,
+# 비교할 세그먼트 쌍마다 격차(a-b)와 비율(a/b) 컬럼을 붙입니다.
+#   - 세그먼트가 모두 집계 큐브의 차원(성별, 행정동)이면 지원 큐브를 합산 (학생 테이블 스캔 없음)
+#   - 그 밖의 컬럼(자치구 등)이 섞이면 학생 테이블의 지망 컬럼을 코드 단위로 한 번만 집계
+COUNT_FORMAT = "{segment}_{ranks}_지원수"
+GAP_FORMAT = "선호도_격차({a}-{b})"
+RATIO_FORMAT = "선호도_비율({a}/{b})"
+RATIO_DECIMALS = 2
+# ==========================================
+
+def rank_tag(ranks):
+    """지망 순위 목록 -> 컬럼명용 표기 (예: [1] -> '1지망', [1, 2, 3] -> '1-3지망')"""
+    ranks = sorted(ranks)
+    if len(ranks) == 1:
+        return f"{ranks[0]}지망"
+    if ranks == list(range(ranks[0], ranks[-1] + 1)):
+        return f"{ranks[0]}-{ranks[-1]}지망"
+    return ",".join(str(r) for r in ranks) + "지망"
+
+def _codes(series):
+    """컬럼 -> (코드 배열, 라벨 Index). 범주형이 아니면 값 순서로 코드화 (결측은 -1)"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(), series.cat.categories
+
+def _counts_from_table(df, segments, ranks):
+    """학생 테이블의 지망 컬럼(ranks)을 (세그먼트..., 지망학교) 코드 조합으로 한 번에 집계"""
+    df = ensure_coded(df)
+    choice_cols = find_choice_columns(df.columns)
+    cols = [c for r in ranks for c in choice_cols.get(r, [])]
+    if not cols:
+        return None
+    pairs = [_codes(df[s]) for s in segments]
+    school_labels = df[cols[0]].cat.categories   # 지망 컬럼은 모두 같은 학교 사전
+
+    # 세그먼트 코드를 혼합 진법 키 하나로 합친 뒤, 지망 컬럼 수만큼 반복해 학교 코드와 결합
+    seg_key = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    for codes, labels in pairs:
+        seg_key = seg_key * len(labels) + codes
+        valid &= codes >= 0
+    schools = np.concatenate([df[c].cat.codes.to_numpy() for c in cols]).astype(np.int64)
+    key = np.tile(seg_key, len(cols)) * len(school_labels) + schools
+    key = key[np.tile(valid, len(cols)) & (schools >= 0)]
+
+    sizes = [len(labels) for _, labels in pairs] + [len(school_labels)]
+    n_keys = int(np.prod(sizes, dtype=np.int64))
+    if n_keys <= DENSE_KEY_LIMIT:
+        dense = np.bincount(key, minlength=n_keys)
+        keys = np.flatnonzero(dense)
+        sums = dense[keys]
+    else:
+        keys, sums = np.unique(key, return_counts=True)
+
+    level_codes = []
+    for size in reversed(sizes):
+        keys, code = np.divmod(keys, size)
+        level_codes.insert(0, code)
+    levels = [labels for _, labels in pairs] + [school_labels]
+    index = pd.MultiIndex(levels=levels, codes=level_codes, names=list(segments) + [CHOICE_SCHOOL_COL])
+    return pd.Series(sums.astype(np.int64), index=index.remove_unused_levels())
+
+def segment_counts(df, segments, ranks=(1,), cube=None):
+    """
+    (세그먼트..., 지망학교)별 지원 건수 Series (0건 제외, 결측 제외). 실패 시 None
+    segments: 세그먼트 컬럼 목록 (예: ['성별'], ['자치구', '성별'])
+    cube: Step1 집계 큐브 (세그먼트가 모두 지원 큐브 차원이면 큐브 합산으로 대체)
+    """
+    segments = list(segments)
+    missing = [s for s in segments if s not in df.columns]
+    if missing:
+        print(f"❌ 세그먼트 컬럼을 찾을 수 없습니다: {missing}")
+        return None
+    if cube is not None and all(s in cube[APPLY_CUBE].columns for s in segments):
+        counts = rollup(cube[APPLY_CUBE], segments + [CHOICE_SCHOOL_COL], where={CHOICE_RANK_COL: list(ranks)})
+        return counts.rename(None)
+    return _counts_from_table(df, segments, ranks)
+
+def add_pair_metrics(table, pairs):
+    """pairs: [(a 컬럼, b 컬럼, a 이름, b 이름)] -> 쌍마다 격차(a-b) / 비율(a/b, b가 0이면 결측) 컬럼 추가"""
+    for col_a, col_b, a, b in pairs:
+        table[GAP_FORMAT.format(a=a, b=b)] = table[col_a] - table[col_b]
+        table[RATIO_FORMAT.format(a=a, b=b)] = (table[col_a] / table[col_b].replace(0, np.nan)).round(RATIO_DECIMALS)
+    return table
+
+def preference_table(counts, compare, ranks=(1,), pairs=None, labels=None):
+    """
+    segment_counts 결과 -> compare 세그먼트 값별 지원 건수 열 + 쌍별 격차/비율 열
+    행: (나머지 세그먼트..., 지망학교) / pairs 생략 시 compare 값의 모든 쌍 (라벨 순)
+    labels: 격차/비율 컬럼명에 쓸 짧은 이름 (예: {'남자': '남'} -> '선호도_격차(남-여)'), 없으면 값 그대로
+    첫 번째 쌍의 격차가 큰 순서로 정렬합니다. (나머지 세그먼트가 있으면 그 값별로 묶은 뒤 정렬)
+    """
+    table = counts.unstack(compare, fill_value=0).astype(float)
+    values = list(table.columns)
+    pairs = list(combinations(values, 2)) if pairs is None else [p for p in pairs if p[0] in values and p[1] in values]
+
+    tag = rank_tag(ranks)
+    names = {v: COUNT_FORMAT.format(segment=v, ranks=tag) for v in values}
+    table.columns = [names[v] for v in values]
+    short = {v: (labels or {}).get(v, v) for v in values}
+    table = add_pair_metrics(table, [(names[a], names[b], short[a], short[b]) for a, b in pairs])
+    if pairs:
+        groups = list(table.index.names[:-1]) if table.index.nlevels > 1 else []
+        gap = GAP_FORMAT.format(a=short[pairs[0][0]], b=short[pairs[0][1]])
+        table = table.sort_values(groups + [gap], ascending=[True] * len(groups) + [False])
+    return table
+
+def segment_preferences(df, segments, compare=None, ranks=(1,), pairs=None, cube=None, labels=None):
+    """
+    세그먼트별 선호도 표를 한 번에 만듭니다. (segment_counts + preference_table, 실패 시 None)
+    compare: 격차/비율을 비교할 세그먼트 컬럼 (생략 시 마지막 세그먼트)
+    """
+    counts = segment_counts(df, segments, ranks, cube)
+    if counts is None or counts.empty:
+        return None
+    return preference_table(counts, compare or list(segments)[-1], ranks, pairs, labels)
@@ -0,0 +1,169 @@
+import pandas as pd
+import ast
+import hashlib
+import inspect
+import json
+import os
+from artifact_store import STORE_DIR, save_step, load_step, list_frames
+
+# ==========================================
+# [설정] 증분 실행(Incremental) 캐시
+# ==========================================
+# Step마다 (코드 + 파라미터 + 입력 내용)의 해시를 기록해 두고,
+# 다음 실행 때 해시가 같으면 Step을 건너뛰고 저장소 결과를 재사용합니다.
+MANIFEST_FILE = os.path.join(STORE_DIR, "_stage_manifest.json")
+HASH_CHUNK = 1 << 20   # 파일 해시 계산 시 읽기 단위 (1MB)
+# ==========================================
+
+def stage(name, run, inputs=(), params=None, code=(), files=()):
+    """
+    Step 1개를 선언합니다.
+    - run: {입력이름: 입력값} -> {시트명: DataFrame} (또는 파일만 기록하는 경우 {})
+    - inputs: 앞 Step 이름 또는 소스 이름 목록
+    - params: 결과에 영향을 주는 설정값 (MIN_SAMPLE_*, GMM 군집 수 등)
+    - code: 결과에 영향을 주는 모듈 (이 모듈이 import 하는 src/ 모듈까지 포함해 소스가 바뀌면 재실행)
+    - files: 이 Step이 직접 기록하는 최종 파일 (없어지면 재실행)
+    """
+    return {
+        'name': name, 'run': run, 'inputs': list(inputs),
+        'params': params or {}, 'code': list(code), 'files': list(files),
+    }
+
+def hash_file(path):
+    """파일 내용을 SHA-256으로 해시합니다."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def hash_frame(df):
+    """DataFrame 내용(값, 인덱스, 컬럼명, dtype)을 해시합니다."""
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns], ensure_ascii=False).encode("utf-8"))
+    h.update(json.dumps([str(t) for t in df.dtypes], ensure_ascii=False).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def hash_frames(frames):
+    """{시트명: DataFrame} 전체를 하나의 해시로 요약합니다."""
+    h = hashlib.sha256()
+    for name in sorted(frames):
+        h.update(name.encode("utf-8"))
+        h.update(hash_frame(frames[name]).encode("ascii"))
+    return h.hexdigest()
+
+def local_imports(path):
+    """소스 파일이 import 하는 같은 폴더(src/)의 모듈 파일 경로 목록 (함수 안의 import 포함)"""
+    folder = os.path.dirname(path)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    found = [os.path.join(folder, name.split(".")[0] + ".py") for name in names]
+    return sorted({p for p in found if os.path.exists(p)})
+
+def code_closure(modules):
+    """선언된 모듈 + 그 모듈들이 (간접적으로) import 하는 src/ 모듈 전체의 소스 파일 경로"""
+    pending = [os.path.abspath(inspect.getsourcefile(m)) for m in modules]
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        pending += [p for p in local_imports(path) if p not in seen]
+    return sorted(seen)
+
+def hash_code(modules):
+    """모듈 소스 파일들(import 하는 src/ 모듈 포함)의 내용을 해시합니다."""
+    h = hashlib.sha256()
+    for path in code_closure(modules):
+        h.update(os.path.basename(path).encode("utf-8"))
+        h.update(hash_file(path).encode("ascii"))
+    return h.hexdigest()
+
+def stage_key(st, input_hashes):
+    """Step의 지문(fingerprint) = 코드 + 파라미터 + 입력 내용 해시"""
+    payload = {
+        'code': hash_code(st['code']),
+        'params': st['params'],
+        'inputs': [input_hashes[name] for name in st['inputs']],
+    }
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def _is_fresh(st, entry, key):
+    if not entry or entry.get('key') != key:
+        return False
+    if entry.get('has_frames') and not list_frames(st['name']):
+        return False
+    return all(os.path.exists(p) for p in st['files'])
+
+def run_graph(stages, sources, force=False):
+    """
+    Step 그래프를 선언 순서대로 실행합니다. (stages는 의존 순서대로 나열)
+    sources: {소스이름: (내용해시, 값을 반환하는 함수)} - 예: 원본 엑셀 파일
+    바뀐 것이 없는 Step은 건너뛰고, 필요한 경우에만 저장소에서 결과를 읽어옵니다.
+    반환: {step: {시트명: DataFrame}} (이번 실행에서 메모리에 올라온 결과만)
+    """
+    manifest = {} if force else load_manifest()
+    hashes = {name: h for name, (h, _) in sources.items()}
+    loaders = {name: loader for name, (_, loader) in sources.items()}
+    values = {}
+    status = {}
+
+    def get_value(name):
+        if name not in values:
+            values[name] = loaders[name]()
+        return values[name]
+
+    for st in stages:
+        name = st['name']
+        if any(i not in hashes for i in st['inputs']):
+            print(f"⏭ [{name}] 앞 단계 실패로 건너뜀")
+            status[name] = "중단"
+            continue
+
+        key = stage_key(st, hashes)
+        entry = manifest.get(name)
+        if _is_fresh(st, entry, key):
+            print(f"⏩ [{name}] 변경 없음 → 이전 결과 재사용")
+            hashes[name] = entry['output']
+            loaders[name] = lambda n=name: load_step(n)
+            status[name] = "재사용"
+            continue
+
+        print(f"▶ [{name}] 실행")
+        frames = st['run']({i: get_value(i) for i in st['inputs']})
+        if frames is None:
+            print(f"❌ [{name}] 실행 실패 → 이후 의존 Step 중단")
+            manifest.pop(name, None)
+            status[name] = "실패"
+            continue
+
+        if frames:
+            save_step(name, frames)
+        values[name] = frames
+        hashes[name] = hash_frames(frames)
+        manifest[name] = {'key': key, 'output': hashes[name], 'has_frames': bool(frames)}
+        save_manifest(manifest)
+        status[name] = "실행"
+
+    print("\n📋 Step 실행 요약: " + ", ".join(f"{n}={s}" for n, s in status.items()))
+    return {name: v for name, v in values.items() if name not in sources}
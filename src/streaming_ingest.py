@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from openpyxl import load_workbook
+from artifact_store import frame_writer, save_step
+from assignment_classifier import classify_assignment
+from pseudonymizer import pseudonymize_frame, new_collision_tracker, collision_report, load_salt
+from coded_table import encode, merge_dictionaries, dictionary_frame, DICTIONARY_FRAME
+from aggregate_cube import build_cube, merge_cubes, CUBE_FRAMES
+from pii_masking import INPUT_FILE, STEP_NAME, MASK_SALT_FILE, MASK_TOKEN_LENGTH, resolve_columns, build_reports
+from schema_manifest import rebuild_columns, is_subheader, read_schema, save_schema
+from instrumentation import instrument, add_instrumentation_args
+
+# ==========================================
+# [설정] 스트리밍 수집 (대용량 원본 파일용)
+# ==========================================
+# 원본 엑셀을 읽기 전용 모드로 한 행씩 읽어 청크 단위로 마스킹/분류한 뒤
+# 저장소(Parquet)에 이어 씁니다. 메모리에는 청크 1개 + 집계 큐브만 유지됩니다.
+CHUNK_ROWS = 50_000
+# ==========================================
+
+def iter_raw_chunks(input_file=INPUT_FILE, chunk_rows=CHUNK_ROWS):
+    """
+    원본 엑셀 첫 시트를 청크(DataFrame) 단위로 읽습니다.
+    첫 데이터 행이 서브헤더('1지망', '2지망')이면 즉석에서 컬럼명을 재구성합니다.
+    """
+    wb = load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # pd.read_excel과 같은 규칙으로 빈 헤더에 'Unnamed: n' 부여
+        columns = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+
+        buffer = []
+        first = True
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            if first:
+                first = False
+                if is_subheader(row):
+                    print("   - 서브헤더 탐색됨. 컬럼명 재구성 중...")
+                    columns = rebuild_columns(columns, row)
+                    print(f"   - 재구성된 컬럼: {columns[:10]} ...")
+                    continue
+            buffer.append(row)
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        wb.close()
+
+def clean_chunk(chunk):
+    """모든 컬럼을 문자열로 통일하고 공백을 제거합니다. (청크마다 스키마가 달라지지 않도록)"""
+    chunk = chunk.where(chunk.notna(), np.nan)
+    for col in chunk.columns:
+        chunk[col] = chunk[col].astype(str).str.strip()
+    return chunk
+
+@instrument()
+def stream_ingest(input_file=INPUT_FILE, chunk_rows=CHUNK_ROWS):
+    """
+    원본 파일 -> Step1 저장소 (보안_RawData는 청크 단위로 이어 쓰기)
+    반환: 요약 산출물 {시트명: DataFrame} (RawData 제외) / 실패 시 None
+    """
+    if not os.path.exists(input_file):
+        print(f"❌ 오류: '{input_file}' 파일이 없습니다.")
+        return None
+
+    schema = read_schema(input_file)   # 원본 파일의 매니페스트 (출처 / 해시 / 서브헤더 여부 포함)
+    salt = load_salt(MASK_SALT_FILE)
+    tracker = new_collision_tracker()
+    resolved = None
+    total_count = 0
+    cube = dictionaries = None
+
+    with frame_writer(STEP_NAME, '보안_RawData') as write:
+        for i, chunk in enumerate(iter_raw_chunks(input_file, chunk_rows)):
+            chunk = clean_chunk(chunk)
+            if resolved is None:
+                resolved = resolve_columns(chunk.columns, schema)   # 핵심 컬럼은 첫 청크에서 한 번만 확인
+                if resolved is None:
+                    return None
+                main_assigned_col, main_gender_col, choice_cols, pii_cols = resolved
+
+            # 마스킹 (결정적 HMAC 토큰이므로 청크를 나눠도 같은 값 = 같은 토큰)
+            chunk, _ = pseudonymize_frame(chunk, pii_cols, salt=salt,
+                                          length=MASK_TOKEN_LENGTH, tracker=tracker)
+            chunk['분석_배정유형'], chunk['분석_배정순위'] = classify_assignment(
+                chunk, main_assigned_col, choice_cols
+            )
+
+            # 집계 큐브 / 코드 사전은 청크별 결과를 누적
+            # (RawData는 청크마다 코드표가 달라지지 않도록 문자열로 기록)
+            total_count += len(chunk)
+            coded, chunk_dictionaries = encode(chunk)
+            dictionaries = merge_dictionaries(dictionaries, chunk_dictionaries)
+            cube = merge_cubes(cube, build_cube(coded))
+            write(chunk)
+            print(f"   - 청크 {i + 1}: 누적 {total_count}명 처리")
+
+    if total_count == 0:
+        print("❌ 원본 파일에 데이터 행이 없습니다.")
+        return None
+
+    summary_df, school_stats, school_quality = build_reports(
+        cube, total_count, main_assigned_col, main_gender_col
+    )
+    frames = {
+        '종합_요약': summary_df,
+        '학교별_성비': school_stats,
+        '학교별_배정유형': school_quality,
+        '가명화_점검': collision_report(tracker, MASK_TOKEN_LENGTH),
+        DICTIONARY_FRAME: dictionary_frame(dictionaries),
+        **cube,
+    }
+    order = ['종합_요약', '학교별_성비', '학교별_배정유형', '보안_RawData', '가명화_점검', DICTIONARY_FRAME,
+             *CUBE_FRAMES]
+    save_step(STEP_NAME, frames, order=order)
+    save_schema(STEP_NAME, schema)
+    return frames
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="대용량 원본 배정 파일 스트리밍 수집 (Step1)")
+    parser.add_argument("--input", default=INPUT_FILE, help="원본 배정 엑셀 경로")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="청크당 학생 수")
+    return add_instrumentation_args(parser)
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    print("🚀 스트리밍 모드로 원본 데이터를 수집합니다...")
+    if stream_ingest(args.input, args.chunk_rows) is not None:
+        print(f"\n✅ 수집 완료! 결과 저장소: {STEP_NAME}")
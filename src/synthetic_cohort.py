@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+# ==========================================
+# [설정] 가상(합성) 배정 데이터 생성기
+# ==========================================
+# 실제 원본(data/input)은 개인정보라 공유할 수 없으므로, pii_masking이 읽는 원본과
+# 같은 양식(서브헤더 행 포함)의 가상 학생 데이터를 만들어 성능 측정/검증에 사용합니다.
+# - 학교 인기도: Zipf 분포 (소수 인기 학교에 지원 쏠림)
+# - 동네 인구: 로그정규 분포, 지망은 인기도 x 거리 감쇠로 결정 (가까운 학교 선호)
+# - 배정: 지망 순서대로 정원 대비 추첨, 끝까지 떨어지면 남은 정원에 임의 배정
+SYNTH_DIR = os.path.join("data", "synthetic")
+RANDOM_SEED = 42
+EXCEL_MAX_ROWS = 1_048_576 - 2   # 헤더 + 서브헤더 행 제외
+
+SCHOOL_ZIPF = 1.1        # 학교 인기도 쏠림 정도 (클수록 소수 학교 집중)
+DONG_SIGMA = 0.8         # 동네 인구 편차 (로그정규 sigma)
+DISTANCE_SCALE = 0.15    # 거리 감쇠 (작을수록 가까운 학교만 지원)
+CAPACITY_SLACK = 1.02    # 전체 정원 / 전체 학생 수
+
+# 원본 엑셀 컬럼 (지망 컬럼은 2칸씩 병합된 상위 헤더 + 서브헤더 행 구조)
+RAW_COLUMNS = ["접수번호", "성명", "생년월일", "성별", "자치구", "행정동",
+               "단일학교군", "Unnamed: 7", "일반학교군", "Unnamed: 9", "배정고등학교"]
+SUB_HEADER = [np.nan] * 6 + ["1지망", "2지망", "1지망", "2지망", np.nan]
+CHOICE_ORDER = ["단일학교군", "Unnamed: 7", "일반학교군", "Unnamed: 9"]   # 배정 추첨 순서
+
+SURNAMES = list("김이박최정강조윤장임한오서신권황안송류홍")
+NAME_SYLLABLES = list("민서준지현우예도하윤은수연시유진주원채건아영")
+# ==========================================
+
+def default_scale(n_students):
+    """학생 수에 맞춘 학교 / 동네 / 자치구 수 (서울 후기고 규모 비율 기준)"""
+    n_schools = int(np.clip(n_students // 400, 10, 2000))
+    n_dongs = int(np.clip(n_students // 150, 20, 5000))
+    n_districts = int(np.clip(n_dongs // 17, 3, 300))
+    return n_schools, n_dongs, n_districts
+
+def make_catalog(n_schools, n_dongs, n_districts, rng):
+    """학교/동네/자치구 이름과 위치, 학교 인기도, 동네 인구 비중을 만듭니다."""
+    schools = np.array([f"가상{i + 1:04d}고등학교" for i in range(n_schools)], dtype=object)
+    dongs = np.array([f"가상{i + 1:04d}동" for i in range(n_dongs)], dtype=object)
+    districts = np.array([f"가상{i + 1:03d}구" for i in range(n_districts)], dtype=object)
+
+    school_xy = rng.random((n_schools, 2))
+    dong_xy = rng.random((n_dongs, 2))
+    district_xy = rng.random((n_districts, 2))
+    # 동네는 가장 가까운 자치구 중심에 소속
+    dong_district = np.argmin(((dong_xy[:, None, :] - district_xy[None, :, :]) ** 2).sum(-1), axis=1)
+
+    popularity = 1.0 / np.arange(1, n_schools + 1) ** SCHOOL_ZIPF
+    popularity = rng.permutation(popularity)
+    dong_weight = rng.lognormal(0.0, DONG_SIGMA, n_dongs)
+
+    # 동네별 지망 확률 = 인기도 x exp(-거리 / 감쇠)
+    distance = np.sqrt(((dong_xy[:, None, :] - school_xy[None, :, :]) ** 2).sum(-1))
+    preference = popularity[None, :] * np.exp(-distance / DISTANCE_SCALE)
+    preference /= preference.sum(axis=1, keepdims=True)
+
+    return {
+        'schools': schools, 'dongs': dongs, 'districts': districts,
+        'dong_district': dong_district, 'popularity': popularity,
+        'dong_weight': dong_weight / dong_weight.sum(), 'preference': preference,
+    }
+
+def draw_choices(catalog, dong_codes, rng):
+    """학생별 지망 4개(단일 1/2지망, 일반 1/2지망)를 거주 동네의 선호 분포에서 뽑습니다."""
+    n_choices = len(CHOICE_ORDER)
+    choices = np.empty((len(dong_codes), n_choices), dtype=np.int32)
+    order = np.argsort(dong_codes, kind='stable')
+    bounds = np.searchsorted(dong_codes[order], np.arange(len(catalog['dongs']) + 1))
+    cdf = np.cumsum(catalog['preference'], axis=1)
+    for d in range(len(catalog['dongs'])):
+        idx = order[bounds[d]:bounds[d + 1]]
+        if len(idx) == 0:
+            continue
+        u = rng.random((len(idx), n_choices))
+        choices[idx] = np.minimum(np.searchsorted(cdf[d], u), cdf.shape[1] - 1)
+    return choices
+
+def run_lottery(choices, capacity, rng):
+    """
+    지망 순서대로 정원 대비 추첨합니다. (지원자 > 잔여 정원이면 잔여 정원/지원자 확률로 합격)
+    끝까지 떨어진 학생은 남은 정원 비율로 임의 배정합니다.
+    """
+    n_students, n_schools = choices.shape[0], len(capacity)
+    remaining = capacity.astype(np.int64).copy()
+    assigned = np.full(n_students, -1, dtype=np.int64)
+
+    for k in range(choices.shape[1]):
+        pending = np.flatnonzero(assigned < 0)
+        if len(pending) == 0:
+            break
+        want = choices[pending, k]
+        demand = np.bincount(want, minlength=n_schools)
+        accept_prob = np.divide(remaining, demand, out=np.zeros(n_schools), where=demand > 0)
+        won = rng.random(len(pending)) < np.minimum(accept_prob, 1.0)[want]
+        assigned[pending[won]] = want[won]
+        remaining -= np.bincount(want[won], minlength=n_schools)
+        np.maximum(remaining, 0, out=remaining)
+
+    leftover = np.flatnonzero(assigned < 0)
+    if len(leftover):
+        weight = remaining + 1e-9
+        assigned[leftover] = rng.choice(n_schools, size=len(leftover), p=weight / weight.sum())
+    return assigned
+
+def make_names(n, rng):
+    surname = np.array(SURNAMES, dtype=object)[rng.integers(0, len(SURNAMES), n)]
+    first = np.array(NAME_SYLLABLES, dtype=object)[rng.integers(0, len(NAME_SYLLABLES), (n, 2))]
+    return surname + first[:, 0] + first[:, 1]
+
+def generate_cohort(n_students, seed=RANDOM_SEED, n_schools=None, n_dongs=None, n_districts=None):
+    """
+    가상 학생 n명의 원본 DataFrame을 만듭니다.
+    pd.read_excel로 원본 엑셀을 읽은 직후와 같은 모양입니다. (첫 행 = 서브헤더)
+    """
+    rng = np.random.default_rng(seed)
+    d_schools, d_dongs, d_districts = default_scale(n_students)
+    catalog = make_catalog(n_schools or d_schools, n_dongs or d_dongs, n_districts or d_districts, rng)
+
+    dong_codes = rng.choice(len(catalog['dongs']), size=n_students, p=catalog['dong_weight'])
+    choices = draw_choices(catalog, dong_codes, rng)
+
+    capacity_share = catalog['popularity'] ** 0.3
+    capacity = np.ceil(capacity_share / capacity_share.sum() * n_students * CAPACITY_SLACK)
+    assigned = run_lottery(choices, capacity, rng)
+
+    schools = catalog['schools']
+    birth = pd.Timestamp("2010-03-01") + pd.to_timedelta(rng.integers(0, 365, n_students), unit="D")
+    df = pd.DataFrame({
+        "접수번호": pd.Series(np.arange(1, n_students + 1)).map("R{:08d}".format).to_numpy(dtype=object),
+        "성명": make_names(n_students, rng),
+        "생년월일": birth.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "성별": np.where(rng.random(n_students) < 0.5, "남자", "여자").astype(object),
+        "자치구": catalog['districts'][catalog['dong_district'][dong_codes]],
+        "행정동": catalog['dongs'][dong_codes],
+    })
+    for k, col in enumerate(CHOICE_ORDER):
+        df[col] = schools[choices[:, k]]
+    df["배정고등학교"] = schools[assigned]
+
+    sub_header = pd.DataFrame([SUB_HEADER], columns=RAW_COLUMNS, dtype=object)
+    return pd.concat([sub_header, df[RAW_COLUMNS]], ignore_index=True)
+
+def write_cohort(df, path):
+    """
+    원본 양식으로 저장합니다. 엑셀 행 제한(약 104만 행)을 넘으면 Parquet으로 저장합니다.
+    반환: 실제로 저장한 경로
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".xlsx") and len(df) > EXCEL_MAX_ROWS:
+        path = os.path.splitext(path)[0] + ".parquet"
+        print(f"⚠ 엑셀 최대 행 수를 넘어 Parquet으로 저장합니다: {path}")
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    print(f"💾 가상 데이터 저장 완료: {path} ({len(df) - 1}명)")
+    return path
+
+def load_cohort(path):
+    """write_cohort 결과를 원본 DataFrame으로 읽습니다. (엑셀이면 pii_masking과 같은 방식)"""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="원본 양식의 가상 고교 배정 데이터 생성")
+    parser.add_argument("--students", type=int, default=10_000, help="학생 수 (1만 ~ 1000만)")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED, help="난수 시드 (같은 시드 = 같은 데이터)")
+    parser.add_argument("--output", default=None, help="저장 경로 (.xlsx 또는 .parquet)")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    output = args.output or os.path.join(SYNTH_DIR, f"synthetic_cohort_{args.students}.xlsx")
+    print(f"🧪 가상 학생 {args.students}명 생성 중... (seed={args.seed})")
+    write_cohort(generate_cohort(args.students, seed=args.seed), output)
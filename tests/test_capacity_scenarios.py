@@ -0,0 +1,51 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import capacity_scenarios
+import lottery_simulator
+
+
+def small_model(n=60, seed=0):
+    """학교 4개, 지망 컬럼 2개(1지망 / 2지망), 동네 3개인 작은 모델"""
+    rng = np.random.default_rng(seed)
+    schools = pd.Index(["가고", "나고", "다고", "라고"])
+    model = {
+        'n': n,
+        'schools': schools,
+        'columns': ["지망_1지망", "지망_2지망"],
+        'ranks': np.array([1, 2], dtype=np.int16),
+        'choices': rng.integers(0, len(schools), size=(n, 2)).astype(np.int32),
+        'capacity': np.array([10, 15, 20, 15], dtype=np.int64),
+        'dong': "행정동",
+    }
+    students = pd.DataFrame({"행정동": rng.choice(["A동", "B동", "C동"], size=n)})
+    return model, students
+
+
+def test_duplicate_scenarios_share_one_result(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # 캐시 / 실행 지표는 임시 폴더에 기록
+    model, students = small_model()
+    scenarios = [
+        capacity_scenarios.make_scenario("이름1", capacity={"가고": 5}),
+        capacity_scenarios.make_scenario("다른", exclude={"A동": ["나고"]}),
+        capacity_scenarios.make_scenario("이름2", capacity={"가고": 5}),
+    ]
+    for use_cache in (False, True):
+        _, _, results = capacity_scenarios.run_variants(model, students, scenarios, 50, 1, 7, use_cache)
+        assert all(r is not None for r in results)
+        np.testing.assert_array_equal(results[0]['student'], results[2]['student'])
+        assert results[2]['cached']
+
+
+def test_incremental_matches_full_simulation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model, students = small_model()
+    scenario = capacity_scenarios.make_scenario("혼합", capacity={"다고": -8}, exclude={"B동": ["가고"]})
+    variant = capacity_scenarios.apply_scenario(model, students, scenario)
+    _, (result,) = capacity_scenarios.simulate_variants(model, [variant], 50, 1, 7)
+    full = lottery_simulator.simulate(dict(model, capacity=variant['capacity'], choices=variant['choices']), 50, 1, 7)
+    np.testing.assert_array_equal(result['student'], full['student'])
+    np.testing.assert_array_equal(result['school'], full['school'])
@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import cli
+import lottery_simulator
+
+
+def test_argv_commands_receive_rest_and_reject_typos(monkeypatch):
+    seen = []
+    monkeypatch.setattr(lottery_simulator, "run_simulation", lambda *args: seen.append(args))
+
+    assert cli.main(["lottery", "--reps", "7", "--workers", "2"]) == 0
+    assert seen[-1][:2] == (7, 2)
+
+    with pytest.raises(SystemExit):
+        cli.main(["lottery", "--wrokers", "4"])
@@ -0,0 +1,36 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import gender_analytics
+
+
+def small_students():
+    """남자/여자 외에 '기타'와 결측 성별이 섞인 7명"""
+    return pd.DataFrame({
+        '접수번호': range(7),
+        '성별': ['남자', '여자', '남자', '여자', '기타', np.nan, '남자'],
+        '자치구': ['A', 'A', 'B', 'B', 'A', 'B', 'A'],
+        '행정동': ['x', 'x', 'y', 'y', 'x', 'y', 'x'],
+        '단일학교군_1지망': ['가고', '나고', '가고', '가고', '나고', '가고', '나고'],
+        '단일학교군_2지망': ['나고'] * 7,
+        '일반학교군_1지망': ['가고'] * 7,
+        '일반학교군_2지망': ['나고'] * 7,
+        '배정고등학교': ['가고', '나고', '가고', '가고', '나고', '가고', '나고'],
+    })
+
+
+def test_third_gender_value_keeps_male_female_gap(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    frames = gender_analytics.analyze_gender(small_students())
+
+    for sheet in ['1_성별_선호학교_순위', '5_자치구별_성별_선호도']:
+        table = frames[sheet]
+        gaps = [c for c in table.columns if c.startswith('선호도_')]
+        assert gaps == ['선호도_격차(남-여)', '선호도_비율(남/여)'], sheet
+        assert '기타_1지망_지원수' in table.columns   # 다른 값은 지원수 열로만 표시
+
+    pref = frames['1_성별_선호학교_순위']
+    assert pref['선호도_격차(남-여)'].is_monotonic_decreasing
@@ -0,0 +1,40 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import instrumentation
+
+
+def last_record():
+    return instrumentation._state['records'][-1]
+
+
+def test_rows_count_primary_table_not_sheet_total(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    students = pd.DataFrame({'학생': range(100)})
+    cube = {'집계': pd.DataFrame({'x': range(40)})}
+
+    @instrumentation.instrument("test.analyze")
+    def analyze(df, cube):
+        return {'요약': pd.DataFrame({'a': range(3)}), '원본': df}
+
+    analyze(students, cube)
+    record = last_record()
+    assert record['rows_in'] == 100        # 학생 테이블만 (큐브 행은 더하지 않음)
+    assert record['rows_out'] is None      # 여러 시트 반환 -> 주 테이블 없음
+    assert record['sheet_rows'] == 103     # 시트 행 합계는 별도 필드
+    assert record['rows_per_s'] is not None
+
+
+def test_row_selectors(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    @instrumentation.instrument("test.select", rows_in=lambda a: a['flow']['counts'],
+                                rows_out=lambda frames: frames['원본'])
+    def step(flow):
+        return {'요약': pd.DataFrame({'a': range(3)}), '원본': pd.DataFrame({'b': range(7)})}
+
+    step({'counts': pd.DataFrame({'c': range(5)})})
+    record = last_record()
+    assert (record['rows_in'], record['rows_out'], record['sheet_rows']) == (5, 7, 10)
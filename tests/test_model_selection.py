@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import model_selection
+
+
+def small_sample(seed=2):
+    """Step4 학교 단위 입력과 같은 크기: PCA 2차원, 학교 25개 (세 덩어리)"""
+    rng = np.random.default_rng(seed)
+    centers = np.array([[0, 0], [4, 4], [0, 4]], dtype=float)
+    return np.concatenate([c + rng.normal(0, 0.6, (n, 2)) for c, n in zip(centers, [8, 8, 9])])
+
+
+def test_gmm_small_sample_skips_degenerate_models(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    x = small_sample()
+    gmm, scores = model_selection.select_gmm(x, workers=1)
+
+    # BIC만 보면 파라미터가 표본보다 많은 모델이 가장 좋아 보이지만 선택되면 안 됨
+    assert scores.loc[scores['BIC'].idxmin(), '제외사유'] != ''
+    assert gmm is not None and gmm.n_components == 3
+    assert gmm._n_parameters() < len(x)
+    assert np.bincount(gmm.predict(x), minlength=gmm.n_components).min() >= model_selection.MIN_CLUSTER_SIZE
+    assert scores.loc[scores['선택'], '제외사유'].iloc[0] == ''
+
+
+def test_kmeans_singleton_outlier_falls_back(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    x = np.vstack([small_sample(), [[40.0, -40.0]]])
+    km, scores = model_selection.select_kmeans(x, workers=1)
+
+    # 실루엣은 외딴 학교 1개짜리 군집(k=2)이 가장 높지만, 모든 후보에 1개짜리 군집이 생기므로 기본 군집 수 사용
+    assert scores['실루엣'].idxmax() == 0
+    assert km is None
+    assert not scores['선택'].any()
+    assert scores['제외사유'].str.startswith("최소 군집").all()
+
+
+def test_exclusion_rule_is_shared():
+    labels = np.array([0, 0, 1, 1, 2])
+    assert model_selection.exclusion_reason(10, labels, 3, 5).startswith("파라미터")
+    assert model_selection.exclusion_reason(4, labels, 3, 5).startswith("최소 군집")
+    assert model_selection.exclusion_reason(4, np.array([0, 0, 1, 1, 1]), 2, 5) == ""
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import gender_analytics
+import stage_graph
+
+
+def test_code_hash_covers_indirect_imports():
+    """gender Step 코드 해시에는 직접 선언하지 않은 공용 모듈(coded_table 등)도 포함되어야 함"""
+    names = {os.path.basename(p) for p in stage_graph.code_closure([gender_analytics])}
+    assert {"gender_analytics.py", "coded_table.py", "assignment_classifier.py", "artifact_store.py"} <= names
+
+
+def test_local_imports_include_function_level_imports(tmp_path):
+    (tmp_path / "helper.py").write_text("X = 1\n", encoding="utf-8")
+    (tmp_path / "main.py").write_text("import os\n\ndef f():\n    from helper import X\n    return X\n",
+                                      encoding="utf-8")
+    assert stage_graph.local_imports(str(tmp_path / "main.py")) == [str(tmp_path / "helper.py")]